@@ -1 +1,2 @@
 from .patient import PatientFilter
+from .search import PatientSearchTokenFilter
@@ -1,4 +1,4 @@
-from django.db.models import Count, Case, When, F
+from django.db.models import Exists, OuterRef
 from django_filters import FilterSet, ChoiceFilter, BooleanFilter
 
 from ..models import Patient
@@ -9,6 +9,8 @@ class PatientFilter(FilterSet):
     race = ChoiceFilter(choices=RaceEnum.CHOICES)
     sex = ChoiceFilter(choices=SexEnum.CHOICES)
     path_pending = BooleanFilter(method='filter_path_pending')
+    clinical_pending = BooleanFilter(method='filter_clinical_pending')
+    approve_pending = BooleanFilter(method='filter_approve_pending')
 
     class Meta:
         model = Patient
@@ -18,5 +20,39 @@ class PatientFilter(FilterSet):
         """
         Filters list of patient which have `biopsy` and empty `path_diagnosis`
         """
-        return qs.filter(
-            moles_images_with_pathological_diagnosis_required__gt=0)
+        from apps.moles.models import MoleImage
+
+        return self.filter_pending_images(
+            qs, name, value, MoleImage.objects.path_diagnosis_required())
+
+    def filter_clinical_pending(self, qs, name, value):
+        """
+        Filters list of patient which have empty `clinical_diagnosis`
+        """
+        from apps.moles.models import MoleImage
+
+        return self.filter_pending_images(
+            qs, name, value, MoleImage.objects.clinical_diagnosis_required())
+
+    def filter_approve_pending(self, qs, name, value):
+        """
+        Filters list of patient which have not approved images
+        """
+        from apps.moles.models import MoleImage
+
+        return self.filter_pending_images(
+            qs, name, value, MoleImage.objects.approve_required())
+
+    def filter_pending_images(self, qs, name, value, images):
+        """
+        Uses EXISTS subquery backed by the partial index instead of
+        the aggregated counter, images are taken from the requested study
+        like the counters
+        """
+        study_pk = self.request.GET.get('study') if self.request else None
+        annotation = '{0}_exists'.format(name)
+
+        qs = qs.annotate(**{annotation: Exists(images.filter(
+            mole__patient=OuterRef('pk'),
+            study_id=study_pk))})
+        return qs.filter(**{annotation: value})
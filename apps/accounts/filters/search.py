@@ -0,0 +1,24 @@
+from rest_framework.filters import BaseFilterBackend
+
+from ..models import PatientSearchToken
+
+
+class PatientSearchTokenFilter(BaseFilterBackend):
+    """
+    Filters patients by blind index tokens (see `PatientSearchToken`).
+    `search` query param contains space or comma separated tokens,
+    patient should match all of them
+    """
+    search_param = 'search'
+
+    def get_search_tokens(self, request):
+        value = request.query_params.get(self.search_param, '')
+        return set(value.replace(',', ' ').split())
+
+    def filter_queryset(self, request, queryset, view):
+        for token in self.get_search_tokens(request):
+            queryset = queryset.filter(
+                pk__in=PatientSearchToken.objects.filter(
+                    token=token).values('patient_id'))
+
+        return queryset
@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand, CommandError
+
+from ...models import DoctorToPatient, PatientVisibility
+from ...models.patient_visibility import (
+    collect_patient_visibility, rebuild_patient_visibility, )
+
+
+class Command(BaseCommand):
+    help = 'Checks that patient visibility matches doctors relations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            dest='fix',
+            default=False,
+            help='Rebuild patient visibility if it is inconsistent')
+
+    def handle(self, **options):
+        expected = collect_patient_visibility(DoctorToPatient.objects.all())
+        actual = set(PatientVisibility.objects.values_list(
+            'viewer_doctor_id', 'patient_id'))
+
+        missing = expected - actual
+        extra = actual - expected
+        for doctor_pk, patient_pk in sorted(missing):
+            self.stdout.write('Missing: doctor {0} -> patient {1}'.format(
+                doctor_pk, patient_pk))
+        for doctor_pk, patient_pk in sorted(extra):
+            self.stdout.write('Extra: doctor {0} -> patient {1}'.format(
+                doctor_pk, patient_pk))
+
+        if not missing and not extra:
+            self.stdout.write('Patient visibility is consistent')
+            return
+
+        if not options['fix']:
+            raise CommandError(
+                'Patient visibility is inconsistent: {0} missing, '
+                '{1} extra rows'.format(len(missing), len(extra)))
+
+        rebuild_patient_visibility()
+        self.stdout.write('Patient visibility is rebuilt')
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 10:05
+from __future__ import unicode_literals
+
+from django.core.management import call_command
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def forwards_func(apps, schema_editor):
+    call_command('check_patient_visibility', fix=True)
+
+
+def reverse_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_participant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientVisibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='accounts.Patient', verbose_name='Patient')),
+                ('viewer_doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visible_patients', to='accounts.Doctor', verbose_name='Viewer doctor')),
+            ],
+            options={
+                'verbose_name': 'Patient visibility',
+                'verbose_name_plural': 'Patient visibility',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='patientvisibility',
+            unique_together=set([('viewer_doctor', 'patient')]),
+        ),
+        migrations.RunPython(forwards_func, reverse_func),
+    ]
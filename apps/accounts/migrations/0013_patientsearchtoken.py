@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 10:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_patientvisibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64, verbose_name='Token')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='accounts.Patient', verbose_name='Patient')),
+            ],
+            options={
+                'verbose_name': 'Patient search token',
+                'verbose_name_plural': 'Patient search tokens',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='patientsearchtoken',
+            unique_together=set([('patient', 'token')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-19 10:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_patientsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patientconsent',
+            name='date_expired',
+            field=models.DateTimeField(blank=True, db_index=True, verbose_name='Valid until'),
+        ),
+    ]
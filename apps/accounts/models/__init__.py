@@ -3,6 +3,8 @@ from .doctor import Doctor
 from .coordinator import Coordinator
 from .site import Site
 from .patient import Patient, DoctorToPatient
+from .patient_visibility import PatientVisibility
+from .patient_search_token import PatientSearchToken
 from .participant import Participant
 from .patient_consent import PatientConsent
 from .enums import SexEnum, RaceEnum, UnitsOfLengthEnum
@@ -1,11 +1,11 @@
 from django.db import models
-from django.db.models import Case, When
+from django.db.models import Case, Exists, OuterRef, When
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from versatileimagefield.fields import VersatileImageField
 
 from apps.main.storages import public_storage
-from apps.main.models.mixins import DelayedSaveFilesMixin
+from apps.main.models.mixins import DelayedSaveFilesMixin, RenditionsMixin
 from apps.main.models.aggregates import ArrayRemove, ArrayAgg
 from .user import User
 from .upload_paths import doctor_photo_path
@@ -29,8 +29,22 @@ class DoctorQuerySet(models.QuerySet):
             )
         )
 
+    def with_roles(self):
+        """
+        Annotates `is_coordinator` and `is_participant`,
+        they are read by `DoctorSerializer` instead of queries per doctor
+        """
+        from .coordinator import Coordinator
+        from .participant import Participant
 
-class Doctor(DelayedSaveFilesMixin, User):
+        return self.annotate(
+            is_coordinator=Exists(
+                Coordinator.objects.filter(doctor_ptr=OuterRef('pk'))),
+            is_participant=Exists(
+                Participant.objects.filter(doctor_ptr=OuterRef('pk'))))
+
+
+class Doctor(RenditionsMixin, DelayedSaveFilesMixin, User):
     user_ptr = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
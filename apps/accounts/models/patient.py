@@ -1,114 +1,86 @@
 from django.db import models
-from django.db.models import Count, Max, Case, When, Q, F
+from django.db.models import OuterRef, Subquery, Prefetch
+from django.db.models.functions import Coalesce
 from versatileimagefield.fields import VersatileImageField
 
 from apps.main.storages import private_storage
-from apps.main.models.mixins import DelayedSaveFilesMixin
+from apps.main.models.aggregates import Counters, CountersQuerySetMixin
+from apps.main.models.mixins import DelayedSaveFilesMixin, RenditionsMixin
 from .doctor import Doctor
 from .upload_paths import patient_photo_path
 from .enums import SexEnum, RaceEnum
 
 
-class PatientQuerySet(DelayedSaveFilesMixin, models.QuerySet):
-    def annotate_moles_count(self, study_pk):
-        return self.annotate(
-            moles_count=Count(
-                Case(
-                    When(moles__images__study_id=study_pk,
-                         then=F('moles__pk')),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_moles_images_count(self, study_pk):
-        return self.annotate(
-            moles_images_count=Count(
-                Case(
-                    When(moles__images__study_id=study_pk,
-                         then=F('moles__images__pk')),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_last_upload(self):
-        return self.annotate(
-            last_upload=Max('moles__images__date_created'))
-
-    def annotate_clinical_diagnosis_required(self, study_pk):
-        when = {
-            'moles__images__clinical_diagnosis__exact': '',
-            'moles__images__study_id': study_pk,
-            'then': F('moles__images__pk')
-        }
-
-        return self.annotate(
-            moles_images_with_clinical_diagnosis_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_pathological_diagnosis_required(self, study_pk):
-        when = {
-            'moles__images__biopsy': True,
-            'moles__images__path_diagnosis__exact': '',
-            'moles__images__study_id': study_pk,
-            'then': F('moles__images__pk')
-        }
+class PatientQuerySet(DelayedSaveFilesMixin, CountersQuerySetMixin,
+                      models.QuerySet):
+    def annotate_stats(self, study_pk):
+        """
+        Annotates counters from the denormalized `PatientStudyStats` table.
+        It's a cheap replacement for `annotate_image_counters`
+        """
+        from apps.moles.models import PatientStudyStats
 
-        return self.annotate(
-            moles_images_with_pathological_diagnosis_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_biopsy_count(self, study_pk):
-        when = {
-            'moles__images__biopsy': True,
-            'moles__images__study_id': study_pk,
-            'then': F('moles__images__pk')
-        }
+        stats = PatientStudyStats.objects.filter(patient=OuterRef('pk'))
+        study_stats = stats.filter(study_id=study_pk)
 
-        return self.annotate(
-            moles_images_biopsy_count=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_approve_required(self, study_pk):
-        when = {
-            'moles__images__approved__exact': False,
-            'moles__images__study_id': study_pk,
-            'then': F('moles__images__pk')
+        annotations = {
+            # The last upload is calculated through all studies
+            'last_upload': Subquery(
+                stats.order_by('-last_upload').values('last_upload')[:1],
+                output_field=models.DateTimeField()),
         }
-
-        return self.annotate(
-            moles_images_approve_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-
-class Patient(models.Model):
+        for counter in PatientStudyStats.COUNTERS:
+            annotations[counter] = Coalesce(
+                Subquery(study_stats.values(counter)[:1],
+                         output_field=models.IntegerField()),
+                0,
+                output_field=models.IntegerField())
+
+        return self.annotate(**annotations)
+
+    def for_serialization(self, doctor):
+        """
+        Prefetches relations used by `PatientSerializer`, so serialization
+        of the list takes constant number of queries
+        """
+        from apps.moles.models import Study
+        from .patient_consent import PatientConsent
+
+        return self.prefetch_related(
+            Prefetch(
+                'doctortopatient_set',
+                queryset=DoctorToPatient.objects.filter(
+                    doctor=doctor),
+                to_attr='prefetched_own_doctor_to_patients'),
+            Prefetch(
+                'doctortopatient_set',
+                queryset=DoctorToPatient.objects.only(
+                    'pk', 'patient', 'doctor').order_by('pk'),
+                to_attr='prefetched_doctor_to_patients'),
+            Prefetch(
+                'consents',
+                queryset=PatientConsent.objects.valid(),
+                to_attr='prefetched_valid_consents'),
+            Prefetch(
+                'studies',
+                queryset=Study.objects.prefetch_related('consent_docs')))
+
+    def annotate_image_counters(self, study_pk):
+        """
+        Calculates the same counters as `annotate_stats` on the fly,
+        all of them are calculated by one correlated subquery
+        """
+        from apps.moles.models import MoleImage
+        from apps.moles.models.patient_study_stats import get_patient_counters
+
+        return self.annotate_counters(image_counters=Counters(
+            MoleImage.objects.filter(
+                mole__patient=OuterRef('pk'), study_id=study_pk),
+            'mole__patient',
+            **get_patient_counters()))
+
+
+class Patient(RenditionsMixin, models.Model):
     first_name = models.TextField(
         verbose_name='Encrypted first name'
     )
@@ -163,6 +135,9 @@ class Patient(models.Model):
 
     @property
     def valid_consent(self):
+        if hasattr(self, 'prefetched_valid_consents'):
+            return next(iter(self.prefetched_valid_consents), None)
+
         return self.consents.valid().first()
 
     def __str__(self):
@@ -24,6 +24,7 @@ class PatientConsent(DelayedSaveFilesMixin, models.Model):
     )
     date_expired = models.DateTimeField(
         blank=True,
+        db_index=True,
         verbose_name='Valid until'
     )
     patient = models.ForeignKey(
@@ -54,8 +55,11 @@ class PatientConsent(DelayedSaveFilesMixin, models.Model):
         return self.date_expired > timezone.now()
 
 
+def get_consent_date_expired():
+    return timezone.now() + timedelta(days=config.CONSENT_VALID_DAYS)
+
+
 @receiver(pre_save, sender=PatientConsent)
 def set_up_date_expired(sender, instance, **kwargs):
     if not instance.pk:
-        instance.date_expired = timezone.now() + timedelta(
-            days=config.CONSENT_VALID_DAYS)
+        instance.date_expired = get_consent_date_expired()
@@ -0,0 +1,31 @@
+from django.db import models
+
+from .patient import Patient
+
+
+class PatientSearchToken(models.Model):
+    """
+    Blind index of encrypted patient fields.
+    Tokens are keyed hashes of the full values and their prefixes which are
+    calculated on the client, so the server can match them without knowing
+    the plain values
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name='Patient'
+    )
+    token = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name='Token'
+    )
+
+    class Meta:
+        verbose_name = 'Patient search token'
+        verbose_name_plural = 'Patient search tokens'
+        unique_together = ('patient', 'token', )
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.patient, self.token)
@@ -0,0 +1,126 @@
+from django.db import models, transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.main.models.change_log import ChangeLogAction, log_changes
+from .doctor import Doctor
+from .patient import Patient, DoctorToPatient
+
+
+class PatientVisibility(models.Model):
+    """
+    Precomputed list of patients the doctor can see: own patients and
+    patients of doctors coordinated by the doctor.
+    Rows are kept up to date by `refresh_patient_visibility`
+    """
+    viewer_doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='visible_patients',
+        verbose_name='Viewer doctor'
+    )
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='visibility',
+        verbose_name='Patient'
+    )
+
+    class Meta:
+        verbose_name = 'Patient visibility'
+        verbose_name_plural = 'Patient visibility'
+        unique_together = ('viewer_doctor', 'patient', )
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.viewer_doctor, self.patient)
+
+
+def collect_patient_visibility(doctor_to_patients):
+    """
+    Returns set of (viewer doctor pk, patient pk) for DoctorToPatient queryset
+    """
+    result = set()
+    for doctor_pk, patient_pk, coordinator_pk in doctor_to_patients.values_list(
+            'doctor_id', 'patient_id', 'doctor__my_coordinator_id'):
+        result.add((doctor_pk, patient_pk))
+        if coordinator_pk:
+            result.add((coordinator_pk, patient_pk))
+
+    return result
+
+
+def save_patient_visibility(queryset, visibility):
+    """
+    Replaces rows of the queryset by `visibility` pairs and logs
+    the difference as created and deleted rows with the viewer doctor pk
+    as the object pk
+    """
+    current = {
+        (doctor_pk, patient_pk): pk
+        for pk, doctor_pk, patient_pk in queryset.values_list(
+            'pk', 'viewer_doctor_id', 'patient_id')
+    }
+    removed = set(current) - visibility
+    added = visibility - set(current)
+
+    PatientVisibility.objects.filter(
+        pk__in=[current[pair] for pair in removed]).delete()
+    PatientVisibility.objects.bulk_create([
+        PatientVisibility(viewer_doctor_id=doctor_pk, patient_id=patient_pk)
+        for doctor_pk, patient_pk in added
+    ], batch_size=1000)
+
+    log_changes(PatientVisibility, removed, ChangeLogAction.DELETED)
+    log_changes(PatientVisibility, added, ChangeLogAction.CREATED)
+
+
+def refresh_patient_visibility(patient_pks):
+    """
+    Recalculates visibility of the patients.
+    Patient rows are locked to serialize concurrent refreshes
+    """
+    patient_pks = list(patient_pks)
+    if not patient_pks:
+        return
+
+    with transaction.atomic():
+        list(Patient.objects.select_for_update().filter(
+            pk__in=patient_pks).values_list('pk', flat=True))
+
+        save_patient_visibility(
+            PatientVisibility.objects.filter(patient_id__in=patient_pks),
+            collect_patient_visibility(
+                DoctorToPatient.objects.filter(patient_id__in=patient_pks)))
+
+
+def rebuild_patient_visibility():
+    with transaction.atomic():
+        save_patient_visibility(
+            PatientVisibility.objects.all(),
+            collect_patient_visibility(DoctorToPatient.objects.all()))
+
+
+@receiver(post_save, sender=DoctorToPatient)
+@receiver(post_delete, sender=DoctorToPatient)
+def refresh_visibility_on_doctor_to_patient_change(sender, instance,
+                                                   **kwargs):
+    refresh_patient_visibility([instance.patient_id])
+
+
+@receiver(post_init, sender=Doctor)
+def remember_my_coordinator(sender, instance, **kwargs):
+    # Don't touch the deferred field to avoid extra query
+    instance._original_my_coordinator_id = instance.__dict__.get(
+        'my_coordinator_id')
+
+
+@receiver(post_save, sender=Doctor)
+def refresh_visibility_on_my_coordinator_change(sender, instance, created,
+                                                **kwargs):
+    if created or 'my_coordinator_id' not in instance.__dict__:
+        return
+
+    if instance.my_coordinator_id != instance._original_my_coordinator_id:
+        instance._original_my_coordinator_id = instance.my_coordinator_id
+        refresh_patient_visibility(
+            instance.doctortopatient_set.values_list('patient_id', flat=True))
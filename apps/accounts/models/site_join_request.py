@@ -12,8 +12,10 @@ from rest_framework import serializers
 
 from templated_mail.mail import BaseEmailMessage
 
+from apps.main.models.change_log import ChangeLogAction, log_changes
 from .coordinator import is_coordinator
-from .patient import DoctorToPatient
+from .patient import Patient, DoctorToPatient
+from .patient_visibility import refresh_patient_visibility
 from .doctor import Doctor
 
 
@@ -156,6 +158,11 @@ class SiteJoinRequest(models.Model):
                 encrypted_key=encrypted_key)
             for patient_id, encrypted_key in encrypted_keys.items()
         ])
+        # bulk_create doesn't send signals
+        refresh_patient_visibility(patients_ids)
+        log_changes(
+            Patient, [(patient_id, patient_id) for patient_id in patients_ids],
+            ChangeLogAction.UPDATED)
 
         self.doctor.my_coordinator_id = self.site.site_coordinator_id
         self.doctor.save()
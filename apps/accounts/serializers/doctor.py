@@ -57,10 +57,15 @@ class DoctorSerializer(UserSerializer):
     is_coordinator = serializers.SerializerMethodField()
     is_participant = serializers.SerializerMethodField()
 
+    # Doctors of `Doctor.objects.with_roles()` have the flags annotated
     def get_is_coordinator(self, doctor):
+        if hasattr(doctor, 'is_coordinator'):
+            return doctor.is_coordinator
         return Coordinator.objects.filter(doctor_ptr=doctor).exists()
 
     def get_is_participant(self, doctor):
+        if hasattr(doctor, 'is_participant'):
+            return doctor.is_participant
         return Participant.objects.filter(doctor_ptr=doctor).exists()
 
     class Meta:
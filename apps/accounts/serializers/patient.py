@@ -1,27 +1,49 @@
 import json
+import re
+
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
 from versatileimagefield.serializers import VersatileImageFieldSerializer
 
+from apps.main.models.bulk import bulk_update, save_files
+from apps.main.models.change_log import ChangeLogAction, log_changes
 from apps.moles.serializers import StudyBaseSerializer
-from apps.moles.models import StudyInvitation, StudyToPatient
+from apps.moles.models import Study, StudyInvitation, StudyToPatient
 
-from ..models import Patient, DoctorToPatient
+from ..models import (
+    Patient, DoctorToPatient, PatientSearchToken, PatientConsent)
+from ..models.patient_consent import get_consent_date_expired
+from ..models.patient_visibility import refresh_patient_visibility
+from ..versions import bump_global_version, bump_patient_viewers_versions
 from .patient_consent import PatientConsentSerializer
 
 
 class IntDict(serializers.DictField):
     def to_internal_value(self, data):
-        dict = super(IntDict, self).to_internal_value(json.loads(data))
+        if isinstance(data, str):
+            data = json.loads(data)
+        dict = super(IntDict, self).to_internal_value(data)
         return {int(k): v for k, v in dict.items()}
 
 
+class JSONList(serializers.ListField):
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = json.loads(data)
+        return super(JSONList, self).to_internal_value(data)
+
+
 class PatientSerializer(serializers.ModelSerializer):
     photo = VersatileImageFieldSerializer(sizes='main_set', required=False)
     valid_consent = PatientConsentSerializer(allow_null=True, read_only=True)
     encrypted_key = serializers.SerializerMethodField()
     doctors = serializers.SerializerMethodField()
     encryption_keys = IntDict(child=serializers.CharField(), write_only=True)
+    # Keyed hashes of the plain values, see `PatientSearchToken`
+    search_tokens = JSONList(
+        child=serializers.RegexField(re.compile(r'^[0-9a-f]{16,64}$')),
+        write_only=True,
+        required=False)
 
     # Fields from aggregation
     moles_count = serializers.IntegerField(read_only=True)
@@ -41,7 +63,8 @@ class PatientSerializer(serializers.ModelSerializer):
         fields = ('pk', 'first_name', 'last_name', 'mrn',
                   'date_of_birth', 'mrn_hash', 'valid_consent',
                   'sex', 'race', 'photo', 'studies',
-                  'encrypted_key', 'encryption_keys', 'doctors',
+                  'encrypted_key', 'encryption_keys', 'search_tokens',
+                  'doctors',
                   'moles_count',
                   'moles_images_count', 'last_upload',
                   'moles_images_with_clinical_diagnosis_required',
@@ -77,6 +100,12 @@ class PatientSerializer(serializers.ModelSerializer):
         return data
 
     def get_encrypted_key(self, patient):
+        # See `PatientQuerySet.for_serialization`
+        if hasattr(patient, 'prefetched_own_doctor_to_patients'):
+            return next((
+                doctor_to_patient.encrypted_key for doctor_to_patient
+                in patient.prefetched_own_doctor_to_patients), None)
+
         doctor = self.context['request'].user.doctor_role
         return DoctorToPatient.objects.filter(
             doctor=doctor,
@@ -84,21 +113,29 @@ class PatientSerializer(serializers.ModelSerializer):
                 'encrypted_key', flat=True).first()
 
     def get_doctors(self, patient):
+        if hasattr(patient, 'prefetched_doctor_to_patients'):
+            return [doctor_to_patient.doctor_id for doctor_to_patient
+                    in patient.prefetched_doctor_to_patients]
+
         return DoctorToPatient.objects.filter(patient=patient).values_list(
             'doctor_id',
             flat=True)
 
     def create(self, validated_data):
         encryption_keys = validated_data.pop('encryption_keys')
+        search_tokens = validated_data.pop('search_tokens', None)
         patient = super(PatientSerializer, self).create(validated_data)
         self.update_relations(patient, encryption_keys)
+        self.update_search_tokens(patient, search_tokens)
         return patient
 
     def update(self, instance, validated_data):
         encryption_keys = validated_data.pop('encryption_keys')
+        search_tokens = validated_data.pop('search_tokens', None)
         patient = super(PatientSerializer, self).update(instance,
                                                         validated_data)
         self.update_relations(patient, encryption_keys)
+        self.update_search_tokens(patient, search_tokens)
         return patient
 
     def update_relations(self, patient, encryption_keys):
@@ -108,12 +145,127 @@ class PatientSerializer(serializers.ModelSerializer):
                 patient=patient,
                 defaults={'encrypted_key': encrypted_key})
 
+        # Drop relations prefetched by `PatientQuerySet.for_serialization`
+        patient.__dict__.pop('prefetched_own_doctor_to_patients', None)
+        patient.__dict__.pop('prefetched_doctor_to_patients', None)
+
+    def update_search_tokens(self, patient, search_tokens):
+        if search_tokens is None:
+            return
+
+        PatientSearchToken.objects.filter(patient=patient).delete()
+        PatientSearchToken.objects.bulk_create([
+            PatientSearchToken(patient=patient, token=token)
+            for token in set(search_tokens)
+        ])
+
+
+class BulkCreatePatientListSerializer(serializers.ListSerializer):
+    """
+    Creates all patients with their relations by a few bulk queries.
+    `bulk_create` doesn't send signals, so their side effects
+    (visibility, change log, versions) are applied explicitly
+    """
+    max_items = 500
+
+    def validate(self, data):
+        if len(data) > self.max_items:
+            raise serializers.ValidationError(
+                "Ensure this list has no more than {0} items".format(
+                    self.max_items))
+
+        mrn_hashes = [item['mrn_hash'] for item in data
+                      if item.get('mrn_hash')]
+        if len(mrn_hashes) != len(set(mrn_hashes)):
+            raise serializers.ValidationError("mrn_hash must be unique")
+
+        study_pks = {item['study'] for item in data if item.get('study')}
+        if len(study_pks) != Study.objects.filter(pk__in=study_pks).count():
+            raise serializers.ValidationError("Study does not exist")
+
+        return data
+
+    def create(self, validated_data):
+        doctor = self.context['request'].user.doctor_role
+        items = [dict(item) for item in validated_data]
+
+        patients = Patient.objects.bulk_create([
+            Patient(**{key: value for key, value in item.items()
+                       if key not in CreatePatientSerializer.extra_fields})
+            for item in items
+        ])
+        patient_pks = [patient.pk for patient in patients]
+
+        consents = PatientConsent.objects.bulk_create([
+            PatientConsent(
+                patient=patient, date_expired=get_consent_date_expired())
+            for patient in patients
+        ])
+        save_files(consents, 'signature',
+                   [item['signature'] for item in items])
+        bulk_update(consents, ['signature'])
+
+        DoctorToPatient.objects.bulk_create([
+            DoctorToPatient(
+                doctor_id=doctor_id,
+                patient=patient,
+                encrypted_key=encrypted_key)
+            for patient, item in zip(patients, items)
+            for doctor_id, encrypted_key in item['encryption_keys'].items()
+        ])
+        PatientSearchToken.objects.bulk_create([
+            PatientSearchToken(patient=patient, token=token)
+            for patient, item in zip(patients, items)
+            for token in set(item.get('search_tokens') or [])
+        ])
+
+        enrollments = [
+            (patient, consent, item)
+            for patient, consent, item in zip(patients, consents, items)
+            if item.get('email') and item.get('study')
+        ]
+        StudyInvitation.objects.bulk_create([
+            StudyInvitation(
+                email=item['email'],
+                study_id=item['study'],
+                doctor=doctor,
+                patient=patient)
+            for patient, consent, item in enrollments
+        ])
+        study_to_patients = StudyToPatient.objects.bulk_create([
+            StudyToPatient(
+                study_id=item['study'],
+                patient=patient,
+                patient_consent=consent)
+            for patient, consent, item in enrollments
+        ])
+
+        refresh_patient_visibility(patient_pks)
+        log_changes(Patient, [(pk, pk) for pk in patient_pks],
+                    ChangeLogAction.CREATED)
+        log_changes(PatientConsent,
+                    [(consent.pk, consent.patient_id) for consent in consents],
+                    ChangeLogAction.CREATED)
+        log_changes(StudyToPatient,
+                    [(study_to_patient.pk, study_to_patient.patient_id)
+                     for study_to_patient in study_to_patients],
+                    ChangeLogAction.CREATED)
+        bump_patient_viewers_versions(patient_pks)
+        if enrollments:
+            bump_global_version()
+
+        return patients
+
 
 class CreatePatientSerializer(PatientSerializer):
     signature = Base64ImageField(required=True)
     email = serializers.EmailField(required=False)
     study = serializers.IntegerField(required=False)
 
+    # Fields which aren't stored in the patient
+    extra_fields = ('encryption_keys', 'search_tokens', 'signature',
+                    'email', 'study', )
+
     def create(self, validated_data):
         signature = validated_data.pop('signature')
         email = validated_data.pop('email', None)
@@ -140,3 +292,4 @@ class CreatePatientSerializer(PatientSerializer):
     class Meta:
         model = Patient
         fields = PatientSerializer.Meta.fields + ('signature', 'email', 'study')
+        list_serializer_class = BulkCreatePatientListSerializer
@@ -1,16 +1,45 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from versatileimagefield.image_warmer import VersatileImageFieldWarmer
 
-from .models import Patient, Doctor
+from apps.main.models import ChangeLog
+from .models import (
+    Patient, Doctor, DoctorToPatient, Coordinator, Participant, Site,
+    SiteJoinRequest)
+from .versions import (
+    bump_global_version, bump_viewer_versions, bump_patient_viewers_versions)
+
+
+@receiver(post_save, sender=ChangeLog)
+def bump_versions_on_patient_change(sender, instance, **kwargs):
+    bump_patient_viewers_versions([instance.patient_id])
+
+
+@receiver(pre_delete, sender=Patient)
+def bump_versions_on_patient_delete(sender, instance, **kwargs):
+    # Visibility is deleted with the patient
+    bump_patient_viewers_versions([instance.pk])
+
+
+@receiver(post_save, sender=DoctorToPatient)
+@receiver(post_delete, sender=DoctorToPatient)
+def bump_versions_on_doctor_to_patient_change(sender, instance, **kwargs):
+    # The doctor might lose the patient, so the visibility doesn't
+    # contain the doctor anymore
+    bump_viewer_versions(
+        [instance.doctor_id] + list(Doctor.objects.filter(
+            pk=instance.doctor_id, my_coordinator__isnull=False
+        ).values_list('my_coordinator_id', flat=True)))
 
 
-@receiver(post_save, sender=Patient)
 @receiver(post_save, sender=Doctor)
-def warm_patient_photo(sender, instance, **kwargs):
-    """Prepare photos"""
-    if instance.photo:
-        VersatileImageFieldWarmer(
-            instance_or_queryset=instance,
-            rendition_key_set='main_set',
-            image_attr='photo').warm()
+@receiver(post_save, sender=Coordinator)
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=Site)
+@receiver(post_save, sender=SiteJoinRequest)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Coordinator)
+@receiver(post_delete, sender=Participant)
+@receiver(post_delete, sender=Site)
+@receiver(post_delete, sender=SiteJoinRequest)
+def bump_global_version_on_change(sender, **kwargs):
+    bump_global_version()
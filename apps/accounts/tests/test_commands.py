@@ -0,0 +1,21 @@
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from ..factories import PatientFactory
+from ..models import PatientVisibility
+
+
+class CommandsTest(TestCase):
+    def test_check_patient_visibility(self):
+        patient = PatientFactory.create()
+        call_command('check_patient_visibility', stdout=StringIO())
+
+        PatientVisibility.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('check_patient_visibility', stdout=StringIO())
+
+        call_command('check_patient_visibility', fix=True, stdout=StringIO())
+        self.assertTrue(PatientVisibility.objects.filter(
+            patient=patient).exists())
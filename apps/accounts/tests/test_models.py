@@ -4,7 +4,8 @@ from django.test import TestCase
 from django.utils import timezone
 
 from apps.main.tests.mixins import FileTestMixin
-from ..models import User, Doctor, Patient, RaceEnum, SexEnum
+from ..models import User, Doctor, Patient, RaceEnum, SexEnum, \
+    DoctorToPatient, PatientVisibility
 from ..factories import DoctorFactory, PatientFactory, PatientConsentFactory
 
 
@@ -68,3 +69,38 @@ class ModelsTestCase(FileTestMixin, TestCase):
         consent.date_expired = timezone.now() - datetime.timedelta(hours=1)
         consent.save()
         self.assertIsNone(patient.valid_consent)
+
+
+class PatientVisibilityTestCase(TestCase):
+    def setUp(self):
+        self.coordinator = DoctorFactory.create(coordinator=True)
+        self.doctor = DoctorFactory.create()
+        self.patient = PatientFactory.create(doctor=self.doctor)
+
+    def get_visible_patients(self, doctor):
+        return list(PatientVisibility.objects.filter(
+            viewer_doctor=doctor).values_list('patient_id', flat=True))
+
+    def test_doctor_sees_own_patients(self):
+        self.assertListEqual(
+            self.get_visible_patients(self.doctor), [self.patient.pk])
+        self.assertListEqual(self.get_visible_patients(self.coordinator), [])
+
+        DoctorToPatient.objects.filter(doctor=self.doctor).delete()
+        self.assertListEqual(self.get_visible_patients(self.doctor), [])
+
+    def test_coordinator_sees_patients_of_coordinated_doctors(self):
+        self.doctor.my_coordinator = self.coordinator.coordinator_role
+        self.doctor.save()
+        self.assertListEqual(
+            self.get_visible_patients(self.coordinator), [self.patient.pk])
+
+        another_patient = PatientFactory.create(doctor=self.doctor)
+        self.assertSetEqual(
+            set(self.get_visible_patients(self.coordinator)),
+            {self.patient.pk, another_patient.pk})
+
+        doctor = Doctor.objects.get(pk=self.doctor.pk)
+        doctor.my_coordinator = None
+        doctor.save()
+        self.assertListEqual(self.get_visible_patients(self.coordinator), [])
@@ -1,3 +1,6 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from apps.accounts.factories import DoctorFactory, CoordinatorFactory, \
     SiteFactory, PatientFactory
 from apps.accounts.models import SiteJoinRequest, JoinStateEnum
@@ -33,6 +36,29 @@ class DoctorViewSetTest(APITestCase):
             {self.doctor.pk, self.other_doctor.pk, self.coordinator.pk}
         )
 
+    def test_list_roles(self):
+        self.authenticate_as_doctor(self.coordinator)
+
+        def get_queries_count():
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get('/api/v1/doctor/')
+            self.assertSuccessResponse(resp)
+            return resp, len(queries)
+
+        resp, queries_count = get_queries_count()
+        roles = {item['pk']: item['is_coordinator'] for item in resp.data}
+        self.assertDictEqual(roles, {
+            self.doctor.pk: False,
+            self.other_doctor.pk: False,
+            self.coordinator.pk: True,
+        })
+        self.assertFalse(any(item['is_participant'] for item in resp.data))
+
+        DoctorFactory.create_batch(5)
+        resp, more_doctors_queries_count = get_queries_count()
+        self.assertEqual(len(resp.data), 8)
+        self.assertEqual(queries_count, more_doctors_queries_count)
+
     def test_public_keys(self):
         self.other_doctor.public_key = 'public_key_value'
         self.other_doctor.save()
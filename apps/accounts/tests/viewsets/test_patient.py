@@ -1,12 +1,21 @@
 import json
+import os
+from datetime import timedelta
 
-from apps.accounts.factories import ParticipantFactory
+from constance import config
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.factories import ParticipantFactory, PatientConsentFactory
 from apps.main.tests import APITestCase, patch
-from apps.moles.factories.study import StudyFactory
+from apps.moles.factories.study import StudyFactory, ConsentDocFactory
 from apps.moles.models import StudyToPatient, StudyInvitation
 
 from ...factories import PatientFactory, DoctorFactory
-from ...models import Patient, RaceEnum, SexEnum, DoctorToPatient
+from ...models import Patient, RaceEnum, SexEnum, DoctorToPatient, \
+    PatientSearchToken, PatientVisibility
 
 
 class PatientViewSetTest(APITestCase):
@@ -29,8 +38,8 @@ class PatientViewSetTest(APITestCase):
 
         self.assertEqual(len(resp.data), 2)
 
-    @patch('apps.moles.tasks.requests')
-    def test_get_patients_with_path_pending(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_get_patients_with_path_pending(self, mock_schedule):
         from apps.moles.factories import MoleFactory, MoleImageFactory
 
         self.authenticate_as_doctor()
@@ -72,6 +81,34 @@ class PatientViewSetTest(APITestCase):
         self.assertSuccessResponse(resp)
         self.assertEqual(len(resp.data), 0)
 
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_get_patients_with_clinical_and_approve_pending(
+            self, mock_schedule):
+        from apps.moles.factories import MoleFactory, MoleImageFactory
+
+        self.authenticate_as_doctor()
+
+        first_patient_mole = MoleFactory.create(patient=self.first_patient)
+        second_patient_mole = MoleFactory.create(patient=self.second_patient)
+        MoleImageFactory(mole=first_patient_mole, clinical_diagnosis='')
+        MoleImageFactory(mole=second_patient_mole, clinical_diagnosis='clin',
+                         approved=True)
+
+        resp = self.client.get('/api/v1/patient/', {'clinical_pending': True})
+        self.assertSuccessResponse(resp)
+        self.assertEqual([data['pk'] for data in resp.data],
+                         [self.first_patient.pk])
+
+        resp = self.client.get('/api/v1/patient/', {'approve_pending': True})
+        self.assertSuccessResponse(resp)
+        self.assertEqual([data['pk'] for data in resp.data],
+                         [self.first_patient.pk])
+
+        resp = self.client.get('/api/v1/patient/', {'approve_pending': False})
+        self.assertSuccessResponse(resp)
+        self.assertEqual([data['pk'] for data in resp.data],
+                         [self.second_patient.pk])
+
     def test_list_with_study(self):
         self.authenticate_as_doctor()
         study = StudyFactory.create()
@@ -117,6 +154,183 @@ class PatientViewSetTest(APITestCase):
         self.assertEqual(data['moles_count'], 1)
         self.assertEqual(data['moles_images_count'], 1)
 
+    def test_list_queries_count_does_not_depend_on_page_size(self):
+        study = StudyFactory.create()
+        study.consent_docs.add(ConsentDocFactory.create())
+        for _ in range(10):
+            patient = PatientFactory.create(doctor=self.doctor)
+            StudyToPatient.objects.create(
+                study=study,
+                patient=patient,
+                patient_consent=PatientConsentFactory.create(patient=patient))
+
+        self.authenticate_as_doctor()
+        # Warm up the data versions, see `apps.accounts.versions`
+        self.client.get('/api/v1/patient/', {'study': study.pk})
+
+        queries_counts = []
+        for limit in (2, 10):
+            with CaptureQueriesContext(connection) as context:
+                resp = self.client.get('/api/v1/patient/', {
+                    'study': study.pk,
+                    'limit': limit,
+                })
+            self.assertSuccessResponse(resp)
+            self.assertEqual(len(resp.data['results']), limit)
+            for data in resp.data['results']:
+                self.assertIsNotNone(data['encrypted_key'])
+                self.assertIsNotNone(data['valid_consent'])
+                self.assertListEqual(list(data['doctors']), [self.doctor.pk])
+                self.assertEqual(data['studies'][0]['pk'], study.pk)
+            queries_counts.append(len(context))
+
+        self.assertEqual(queries_counts[0], queries_counts[1])
+
+    def test_list_not_modified(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/')
+        self.assertSuccessResponse(resp)
+        etag = resp['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            resp = self.client.get(
+                '/api/v1/patient/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        self.assertFalse(any(
+            '"accounts_patient"' in query['sql']
+            for query in context.captured_queries))
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_list_modified_after_patient_change(self, mock_on_commit):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/')
+        etag = resp['ETag']
+
+        PatientConsentFactory.create(patient=self.first_patient)
+
+        resp = self.client.get('/api/v1/patient/', HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccessResponse(resp)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_list_not_modified_by_another_doctor_patient_change(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/')
+        etag = resp['ETag']
+
+        with patch('django.db.transaction.on_commit',
+                   side_effect=lambda func: func()):
+            PatientConsentFactory.create(patient=self.another_patient)
+
+        resp = self.client.get('/api/v1/patient/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_list_modified_after_consent_expiry(self):
+        PatientConsentFactory.create(patient=self.first_patient)
+        self.authenticate_as_doctor()
+
+        def get_valid_consents(resp):
+            return {item['pk']: item['valid_consent'] for item in resp.data}
+
+        resp = self.client.get('/api/v1/patient/')
+        self.assertSuccessResponse(resp)
+        self.assertIsNotNone(get_valid_consents(resp)[self.first_patient.pk])
+        etag = resp['ETag']
+
+        # No signals are sent when the consent expires
+        after_expiry = timezone.now() + timedelta(
+            days=config.CONSENT_VALID_DAYS + 1)
+        with patch('django.utils.timezone.now', return_value=after_expiry):
+            resp = self.client.get(
+                '/api/v1/patient/', HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccessResponse(resp)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertIsNone(get_valid_consents(resp)[self.first_patient.pk])
+
+    def test_list_with_cursor_pagination(self):
+        from apps.moles.factories import MoleFactory, MoleImageFactory
+
+        MoleImageFactory.create(
+            mole=MoleFactory.create(patient=self.first_patient))
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/', {'cursor': '', 'limit': 1})
+        self.assertSuccessResponse(resp)
+        self.assertNotIn('count', resp.data)
+        self.assertEqual(len(resp.data['results']), 1)
+        self.assertEqual(resp.data['results'][0]['pk'], self.first_patient.pk)
+        self.assertIsNotNone(resp.data['next'])
+
+        resp = self.client.get(resp.data['next'])
+        self.assertSuccessResponse(resp)
+        self.assertEqual(len(resp.data['results']), 1)
+        self.assertEqual(
+            resp.data['results'][0]['pk'], self.second_patient.pk)
+        self.assertIsNone(resp.data['next'])
+
+    def test_list_with_invalid_cursor(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/', {'cursor': 'invalid'})
+        self.assertNotFound(resp)
+
+    def test_list_with_limit_offset_pagination(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/', {'limit': 1, 'offset': 1})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(resp.data['count'], 2)
+        self.assertEqual(len(resp.data['results']), 1)
+
+    def test_list_with_search_tokens(self):
+        PatientSearchToken.objects.create(
+            patient=self.first_patient, token='a' * 64)
+        PatientSearchToken.objects.create(
+            patient=self.first_patient, token='b' * 16)
+        PatientSearchToken.objects.create(
+            patient=self.second_patient, token='a' * 64)
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/patient/', {'search': 'a' * 64})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(len(resp.data), 2)
+
+        resp = self.client.get('/api/v1/patient/', {
+            'search': '{0} {1}'.format('a' * 64, 'b' * 16)})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(len(resp.data), 1)
+        self.assertEqual(resp.data[0]['pk'], self.first_patient.pk)
+
+        resp = self.client.get('/api/v1/patient/', {'search': 'c' * 64})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(len(resp.data), 0)
+
+    def test_update_patient_search_tokens(self):
+        self.authenticate_as_doctor()
+        PatientSearchToken.objects.create(
+            patient=self.first_patient, token='a' * 64)
+
+        resp = self.client.patch(
+            '/api/v1/patient/{0}/'.format(self.first_patient.pk), {
+                'encryption_keys': json.dumps({self.doctor.pk: 'key'}),
+                'search_tokens': json.dumps(['b' * 64, 'c' * 16]),
+            })
+        self.assertSuccessResponse(resp)
+        self.assertSetEqual(
+            set(self.first_patient.search_tokens.values_list(
+                'token', flat=True)),
+            {'b' * 64, 'c' * 16})
+
+        resp = self.client.patch(
+            '/api/v1/patient/{0}/'.format(self.first_patient.pk), {
+                'encryption_keys': json.dumps({self.doctor.pk: 'key'}),
+                'search_tokens': json.dumps(['plain value']),
+            })
+        self.assertBadRequest(resp)
+
     def test_get_own_patient_success(self):
         self.authenticate_as_doctor()
 
@@ -219,6 +433,106 @@ class PatientViewSetTest(APITestCase):
             resp = self.client.post('/api/v1/patient/', patient_data)
         self.assertSuccessResponse(resp)
 
+    def get_bulk_patient_data(self, **kwargs):
+        data = {
+            'first_name': 'first name',
+            'last_name': 'last name',
+            'sex': SexEnum.MALE,
+            'race': RaceEnum.ASIAN,
+            'signature': 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAAD0l'
+                         'EQVQIHQEEAPv/AP///wX+Av4DfRnGAAAAAElFTkSuQmCC',
+            'encryption_keys': {self.doctor.pk: 'qwertyuiop'},
+        }
+        data.update(kwargs)
+        return data
+
+    def test_bulk_create_patients_success(self):
+        study = StudyFactory.create()
+        self.authenticate_as_doctor()
+
+        with self.fake_media():
+            resp = self.client.post('/api/v1/patient/bulk/', [
+                self.get_bulk_patient_data(mrn_hash='first'),
+                self.get_bulk_patient_data(
+                    mrn_hash='second',
+                    email='patient@example.com',
+                    study=study.pk,
+                    search_tokens=['0123456789abcdef']),
+            ], format='json')
+        self.assertEqual(resp.status_code, 201)
+
+        self.assertEqual(len(resp.data), 2)
+        first, second = [Patient.objects.get(pk=data['pk'])
+                         for data in resp.data]
+        self.assertEqual(first.mrn_hash, 'first')
+        self.assertEqual(second.mrn_hash, 'second')
+
+        for patient, data in zip((first, second), resp.data):
+            consent = patient.consents.get()
+            self.assertTrue(consent.is_valid())
+            self.assertTrue(consent.signature.name.startswith(
+                'patients/{0}/consent/{1}_signature'.format(
+                    patient.pk, consent.pk)))
+            self.assertEqual(data['encrypted_key'], 'qwertyuiop')
+            self.assertEqual(data['valid_consent']['pk'], consent.pk)
+            self.assertTrue(PatientVisibility.objects.filter(
+                viewer_doctor=self.doctor, patient=patient).exists())
+
+        self.assertFalse(StudyToPatient.objects.filter(
+            patient=first).exists())
+        self.assertTrue(StudyToPatient.objects.filter(
+            patient=second, study=study,
+            patient_consent=second.consents.get()).exists())
+        self.assertTrue(StudyInvitation.objects.filter(
+            patient=second, study=study, email='patient@example.com',
+            doctor=self.doctor).exists())
+        self.assertListEqual(
+            list(second.search_tokens.values_list('token', flat=True)),
+            ['0123456789abcdef'])
+
+    def test_bulk_create_patients_deletes_files_on_error(self):
+        self.authenticate_as_doctor()
+
+        with self.fake_media(), patch(
+                'apps.accounts.serializers.patient.bulk_update',
+                side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.client.post('/api/v1/patient/bulk/', [
+                    self.get_bulk_patient_data(mrn_hash='first'),
+                    self.get_bulk_patient_data(mrn_hash='second'),
+                ], format='json')
+
+            self.assertListEqual(
+                [files for _, _, files in os.walk(settings.MEDIA_ROOT)
+                 if files],
+                [])
+        self.assertFalse(Patient.objects.filter(
+            mrn_hash__in=['first', 'second']).exists())
+
+    def test_bulk_create_patients_validates_all_items(self):
+        self.authenticate_as_doctor()
+
+        with self.fake_media():
+            resp = self.client.post('/api/v1/patient/bulk/', [
+                self.get_bulk_patient_data(),
+                self.get_bulk_patient_data(encryption_keys={}),
+            ], format='json')
+        self.assertBadRequest(resp)
+
+        self.assertEqual(resp.data[0], {})
+        self.assertIn('non_field_errors', resp.data[1])
+        self.assertEqual(Patient.objects.count(), 3)
+
+    def test_bulk_create_patients_with_duplicated_mrn_hash(self):
+        self.authenticate_as_doctor()
+
+        with self.fake_media():
+            resp = self.client.post('/api/v1/patient/bulk/', [
+                self.get_bulk_patient_data(mrn_hash='same'),
+                self.get_bulk_patient_data(mrn_hash='same'),
+            ], format='json')
+        self.assertBadRequest(resp)
+
     def test_update_patient_success(self):
         self.authenticate_as_doctor()
 
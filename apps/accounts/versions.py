@@ -0,0 +1,75 @@
+"""
+Versions of the data visible to doctors, used to build ETags without
+running the heavy queries.
+
+A version is a random token stored in the cache, it's replaced by a new
+one when anything the doctor can see is changed. The global version
+covers rarely changed data shared between doctors (studies, sites, etc.)
+Lost or evicted tokens are regenerated, so the only cost of eviction
+is a cache miss on the client side.
+
+Consents expire without any change, so data showing the validity of
+consents is additionally versioned by the last expiry moment.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import PatientConsent, PatientVisibility
+
+
+GLOBAL_VERSION_KEY = 'versions:global'
+VIEWER_VERSION_KEY = 'versions:viewer:{0}'
+
+
+def get_viewer_version(doctor_pk):
+    keys = [GLOBAL_VERSION_KEY, VIEWER_VERSION_KEY.format(doctor_pk)]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            # Another request may set the token concurrently
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+
+    return ':'.join(versions[key] for key in keys)
+
+
+def get_consents_expiry_version():
+    """
+    Changes every time any consent expires, it's an index lookup
+    """
+    date_expired = PatientConsent.objects.filter(
+        date_expired__lte=timezone.now()
+    ).aggregate(date_expired=Max('date_expired'))['date_expired']
+
+    return date_expired.isoformat() if date_expired else ''
+
+
+def bump_versions(keys):
+    """
+    Replaces the tokens after commit, otherwise a concurrent request
+    could read the old data with the new token
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    transaction.on_commit(lambda: cache.set_many(
+        {key: uuid.uuid4().hex for key in keys}, None))
+
+
+def bump_global_version():
+    bump_versions([GLOBAL_VERSION_KEY])
+
+
+def bump_viewer_versions(doctor_pks):
+    bump_versions([VIEWER_VERSION_KEY.format(pk) for pk in doctor_pks])
+
+
+def bump_patient_viewers_versions(patient_pks):
+    bump_viewer_versions(PatientVisibility.objects.filter(
+        patient_id__in=patient_pks).values_list('viewer_doctor_id', flat=True))
@@ -2,9 +2,10 @@ from rest_framework import generics, response, status
 
 from ..serializers import DoctorFullSerializer
 from ..permissions import IsDoctor
+from ..viewsets.mixins import ConditionalGetMixin
 
 
-class CurrentUserView(generics.GenericAPIView):
+class CurrentUserView(ConditionalGetMixin, generics.GenericAPIView):
     permission_classes = (IsDoctor, )
 
     def get_serializer_class(self):
@@ -21,7 +21,8 @@ class DoctorViewSet(viewsets.GenericViewSet,
     def get_queryset(self):
         return super(DoctorViewSet, self)\
             .get_queryset()\
-            .annotate_sites()
+            .annotate_sites()\
+            .with_roles()
 
     @list_route(methods=['GET'], permission_classes=(IsDoctor,))
     def public_keys(self, request, *args, **kwargs):
@@ -40,5 +41,5 @@ class DoctorViewSet(viewsets.GenericViewSet,
                 email=email,
                 patient__isnull=False).exists():
             raise ValidationError('email_used_by_the_patient')
-        doctor = Doctor.objects.filter(email=email).first()
+        doctor = Doctor.objects.with_roles().filter(email=email).first()
         return Response(DoctorSerializer(doctor).data if doctor else {})
@@ -1 +1,2 @@
 from .patient_info import PatientInfoMixin
+from .conditional_get import ConditionalGetMixin
@@ -0,0 +1,79 @@
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from ...versions import get_consents_expiry_version, get_viewer_version
+
+
+class NotModified(Exception):
+    pass
+
+
+class ConditionalGetMixin(object):
+    """
+    Adds ETag to GET responses and returns 304 Not Modified if the ETag
+    from If-None-Match is still actual.
+    The ETag is built from the user's data version, so it's checked
+    before the queryset is evaluated, see `apps.accounts.versions`.
+    Views showing the validity of consents set `depends_on_consents_expiry`
+    """
+    depends_on_consents_expiry = False
+
+    def initial(self, request, *args, **kwargs):
+        super(ConditionalGetMixin, self).initial(request, *args, **kwargs)
+
+        self.etag = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+
+        # The version must be read before the data
+        self.etag = self.get_etag(request)
+        if self.etag and self.etag in self.get_if_none_match(request):
+            raise NotModified()
+
+    def get_version(self, request):
+        """
+        Returns the version of the data or None to skip the ETag
+        """
+        if not hasattr(request.user, 'doctor_role'):
+            return None
+
+        version = get_viewer_version(request.user.pk)
+        if self.depends_on_consents_expiry:
+            version = ':'.join([version, get_consents_expiry_version()])
+
+        return version
+
+    def get_etag(self, request):
+        version = self.get_version(request)
+        if version is None:
+            return None
+
+        key = ':'.join([
+            version,
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ])
+        return '"{0}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def get_if_none_match(self, request):
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        return [etag.strip().replace('W/', '', 1)
+                for etag in header.split(',')]
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        return super(ConditionalGetMixin, self).handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(ConditionalGetMixin, self).finalize_response(
+            request, response, *args, **kwargs)
+
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+        return response
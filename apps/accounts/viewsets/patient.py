@@ -1,59 +1,62 @@
 from django.db import transaction
-from django.db.models import Q
-from rest_framework import (viewsets, mixins, pagination,
+from rest_framework import (viewsets, mixins,
                             filters, response, status, )
+from rest_framework.decorators import list_route
 
-from apps.accounts.models import Doctor
-from apps.accounts.models.coordinator import is_coordinator
+from apps.accounts.models import PatientVisibility
 from apps.accounts.models.participant import is_participant
+from apps.main.models.bulk import atomic_with_files
+from apps.main.pagination import OptionalKeysetPagination
+from apps.moles.models import StudyToPatient
 from ..serializers import PatientSerializer, CreatePatientSerializer
 from ..models import Patient
 from ..permissions import IsDoctor
-from ..filters import PatientFilter
+from ..filters import PatientFilter, PatientSearchTokenFilter
+from .mixins import ConditionalGetMixin
 
 
-class PatientViewSet(viewsets.GenericViewSet,
+class PatientPagination(OptionalKeysetPagination):
+    """
+    Pass `cursor` query param (empty for the first page) to switch
+    to keyset pagination, old clients still use limit/offset
+    """
+    ordering = '-last_upload'
+
+
+class PatientViewSet(ConditionalGetMixin, viewsets.GenericViewSet,
                      mixins.ListModelMixin, mixins.RetrieveModelMixin,
                      mixins.CreateModelMixin, mixins.UpdateModelMixin):
     serializer_class = PatientSerializer
     queryset = Patient.objects.all()
     permission_classes = (IsDoctor, )
-    filter_backends = (filters.SearchFilter, filters.DjangoFilterBackend, )
+    filter_backends = (PatientSearchTokenFilter, filters.DjangoFilterBackend, )
     filter_class = PatientFilter
-    pagination_class = pagination.LimitOffsetPagination
-    search_fields = ('first_name', 'last_name', 'mrn', )
+    pagination_class = PatientPagination
+    depends_on_consents_expiry = True
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ['create', 'bulk']:
             return CreatePatientSerializer
         return self.serializer_class
 
     def get_queryset(self):
         study_pk = self.get_study_pk()
 
+        user_doctor = self.request.user.doctor_role
         result = super(PatientViewSet, self)\
             .get_queryset()\
-            .annotate_last_upload()\
-            .annotate_moles_count(study_pk)\
-            .annotate_moles_images_count(study_pk)\
-            .annotate_clinical_diagnosis_required(study_pk)\
-            .annotate_pathological_diagnosis_required(study_pk)\
-            .annotate_biopsy_count(study_pk)\
-            .annotate_approve_required(study_pk)
+            .annotate_stats(study_pk)\
+            .for_serialization(user_doctor)
 
-        user_doctor = self.request.user.doctor_role
-        if is_coordinator(user_doctor):
-
-            result = result.filter(
-                Q(doctors__pk__in=Doctor.objects.filter(
-                    my_coordinator=user_doctor.coordinator_role
-                ).values_list('pk', flat=True)) |
-                Q(doctors=user_doctor))
-        else:
-            result = result.filter(doctors=user_doctor)
+        # Counters aren't aggregated anymore, so relations are filtered
+        # through subqueries to avoid duplicated rows.
+        # Visibility includes patients of doctors coordinated by the user
+        result = result.filter(pk__in=PatientVisibility.objects.filter(
+            viewer_doctor=user_doctor).values('patient_id'))
 
         if study_pk:
-            result = result.filter(studies__pk=study_pk)
+            result = result.filter(pk__in=StudyToPatient.objects.filter(
+                study_id=study_pk).values('patient_id'))
         elif not is_participant(user_doctor):
             # for participant return all patients, because it will be single
             result = result.filter(studies__isnull=True)
@@ -84,3 +87,25 @@ class PatientViewSet(viewsets.GenericViewSet,
             status=status.HTTP_201_CREATED,
             headers=headers
         )
+
+    @list_route(methods=['POST'])
+    @atomic_with_files()
+    def bulk(self, request, *args, **kwargs):
+        """
+        Creates patients from the list all together: either all items
+        are valid and created, or errors are returned for every item
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        patients = serializer.save()
+
+        # Fetch again to serialize the relations without extra queries
+        created = Patient.objects.for_serialization(
+            request.user.doctor_role).in_bulk(
+                [patient.pk for patient in patients])
+        data = PatientSerializer(
+            [created[patient.pk] for patient in patients],
+            many=True,
+            context=self.get_serializer_context()).data
+
+        return response.Response(data, status=status.HTTP_201_CREATED)
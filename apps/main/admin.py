@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import FlatBlock
+from .models import FlatBlock, Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'progress', 'total', 'date_created',
+                    'date_finished', )
+    list_filter = ('name', 'status', )
+    readonly_fields = ('name', 'status', 'progress', 'total', 'result',
+                       'error', 'date_created', 'date_finished', )
 
 
 admin.site.register(FlatBlock)
+admin.site.register(Job, JobAdmin)
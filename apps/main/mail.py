@@ -0,0 +1,96 @@
+"""
+Sending of one templated email to many recipients.
+
+The template is rendered once by `render_email`, the result is JSON
+serializable, so it can be passed to tasks. Personal fields are rendered
+as placeholders and substituted for every recipient by
+`send_rendered_email`, which sends all messages over one connection.
+"""
+from django.core import mail
+from django.utils.html import conditional_escape
+
+
+PLACEHOLDER = '\x00{0}\x00'
+
+
+def render_email(message_class, context, personal_fields=()):
+    context = dict(context)
+    for field in personal_fields:
+        context[field] = PLACEHOLDER.format(field)
+
+    message = message_class(context=context)
+    message.render()
+
+    return {
+        'from_email': message.from_email,
+        'subject': message.subject,
+        'body': message.body,
+        'content_subtype': message.content_subtype,
+        'alternatives': [list(item) for item in message.alternatives],
+        'personal_fields': list(personal_fields),
+    }
+
+
+def personalize(text, replacements):
+    for placeholder, value in replacements.items():
+        text = text.replace(placeholder, value)
+    return text
+
+
+def build_messages(rendered, recipients):
+    """
+    `recipients` are (email, personal context) pairs, every recipient
+    gets a separate message
+    """
+    messages = []
+    for email, personal_context in recipients:
+        # Values are escaped like the template does it
+        replacements = {
+            PLACEHOLDER.format(field): conditional_escape(
+                personal_context.get(field, ''))
+            for field in rendered['personal_fields']
+        }
+
+        message = mail.EmailMultiAlternatives(
+            subject=personalize(rendered['subject'], replacements),
+            body=personalize(rendered['body'], replacements),
+            from_email=rendered['from_email'],
+            to=[email])
+        message.content_subtype = rendered['content_subtype']
+        for content, mimetype in rendered['alternatives']:
+            message.attach_alternative(
+                personalize(content, replacements), mimetype)
+        messages.append(message)
+
+    return messages
+
+
+def send_rendered_email(rendered, recipients):
+    """
+    Sends all messages with one call of the backend.
+    Returns the number of sent messages
+    """
+    messages = build_messages(rendered, recipients)
+    if not messages:
+        return 0
+
+    return mail.get_connection().send_messages(messages)
+
+
+def deliver_rendered_email(rendered, recipients):
+    """
+    Sends messages one by one over one opened connection, so a failed
+    message doesn't stop others. Returns errors by email, None for
+    delivered messages
+    """
+    results = {}
+    with mail.get_connection() as connection:
+        for message in build_messages(rendered, recipients):
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                results[message.to[0]] = str(e)
+            else:
+                results[message.to[0]] = None
+
+    return results
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from ...models.change_log import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'Removes old changes from the change log, clients with older ' \
+           'sync tokens have to download everything again'
+
+    def handle(self, **options):
+        count = prune_change_log()
+
+        self.stdout.write('Removed {0} changes'.format(count))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_create_default_consent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('txid', models.BigIntegerField(verbose_name='Transaction id')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Created on')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_pk', models.PositiveIntegerField(verbose_name='Object pk')),
+                ('patient_id', models.PositiveIntegerField(verbose_name='Patient id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10, verbose_name='Action')),
+            ],
+            options={
+                'verbose_name': 'Change log',
+                'verbose_name_plural': 'Change log',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='changelog',
+            index_together=set([('patient_id', 'txid')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 19:00
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_create_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='Name')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total items')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='Processed items')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, verbose_name='Result')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Created on')),
+                ('date_finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished on')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ('-date_created',),
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-19 10:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_job_user'),
+    ]
+
+    # Visibility changes are read by the viewer doctor, the pruning
+    # boundary is read by every sync request
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX main_changelog_viewer '
+            'ON main_changelog (model, object_pk, txid) '
+            "WHERE model IN ('accounts.patientvisibility', 'main.changelog')",
+            'DROP INDEX main_changelog_viewer'),
+    ]
@@ -1 +1,3 @@
 from .flatblock import FlatBlock
+from .change_log import ChangeLog, ChangeLogAction
+from .job import Job, JobStatus
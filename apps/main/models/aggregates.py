@@ -1,5 +1,7 @@
-from django.db.models import Func
+from django.db.models import Count, Func, Subquery, Value
+from django.db.models.query import ModelIterable
 from django.contrib.postgres.aggregates import ArrayAgg as ArrayAggBase
+from django.contrib.postgres.fields import JSONField
 
 
 # NOTE: remove after update to django 2.0.4 and upper
@@ -13,3 +15,96 @@ class ArrayAgg(ArrayAggBase):
 
 class ArrayRemove(Func):
     function = 'ARRAY_REMOVE'
+
+
+# NOTE: replace with Count(filter=...) after update to django 2.0 and upper
+class FilteredCount(Count):
+    """
+    COUNT(...) FILTER (WHERE ...), the condition is a Q object
+    """
+    template = '%(function)s(%(distinct)s%(expressions)s) ' \
+               'FILTER (WHERE %(condition)s)'
+
+    def __init__(self, expression, condition, **extra):
+        self.condition = condition
+        super().__init__(expression, **extra)
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None,
+                           summarize=False, for_save=False):
+        clone = super().resolve_expression(
+            query, allow_joins, reuse, summarize, for_save)
+        clone.condition = self.condition.resolve_expression(
+            query, allow_joins, reuse, summarize, False)
+        return clone
+
+    def relabeled_clone(self, change_map):
+        # The condition isn't a source expression, relabel it explicitly
+        # (e.g. when the aggregate is moved into a subquery)
+        clone = super().relabeled_clone(change_map)
+        clone.condition = self.condition.relabeled_clone(change_map)
+        return clone
+
+    def as_sql(self, compiler, connection, **extra_context):
+        condition, condition_params = compiler.compile(self.condition)
+        sql, params = super().as_sql(
+            compiler, connection, condition=condition, **extra_context)
+        return sql, list(params) + list(condition_params)
+
+
+class JSONBuildObject(Func):
+    function = 'JSON_BUILD_OBJECT'
+
+    def __init__(self, **fields):
+        expressions = []
+        for name, expression in sorted(fields.items()):
+            expressions.extend([Value(name), expression])
+
+        super().__init__(*expressions, output_field=JSONField())
+
+
+class Counters(Subquery):
+    """
+    Correlated subquery which calculates all `counters` (name -> aggregate)
+    over rows of `queryset` in one pass and returns them as a json object.
+    `queryset` should be filtered by OuterRef on the `group_by` field.
+
+    Use `CountersQuerySetMixin.annotate_counters` to get counters
+    as attributes of the instances
+    """
+
+    def __init__(self, queryset, group_by, **counters):
+        self.counters = list(counters)
+
+        super().__init__(
+            queryset.order_by().values(group_by).annotate(
+                counters=JSONBuildObject(**counters)
+            ).values('counters'),
+            output_field=JSONField())
+
+
+class CountersIterable(ModelIterable):
+    """
+    Sets values of `Counters` annotations as attributes of the instances,
+    missing counters (there are no rows to aggregate) are zero
+    """
+
+    def __iter__(self):
+        counters = [
+            (alias, annotation.counters)
+            for alias, annotation in self.queryset.query.annotations.items()
+            if isinstance(annotation, Counters)
+        ]
+
+        for obj in super().__iter__():
+            for alias, names in counters:
+                values = getattr(obj, alias) or {}
+                for name in names:
+                    setattr(obj, name, values.get(name, 0))
+            yield obj
+
+
+class CountersQuerySetMixin(object):
+    def annotate_counters(self, **annotations):
+        clone = self.annotate(**annotations)
+        clone._iterable_class = CountersIterable
+        return clone
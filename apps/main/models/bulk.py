@@ -0,0 +1,114 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, When, Value
+
+from apps.main.storages import clone_storage
+
+
+logger = logging.getLogger(__name__)
+
+# Files written by `save_files` in the current `atomic_with_files` blocks
+_written_files = threading.local()
+
+
+def bulk_update(instances, field_names):
+    """
+    Updates fields of the saved instances with a single query.
+    Like `bulk_create` it doesn't call `save` and doesn't send signals
+    """
+    if not instances:
+        return
+
+    model = type(instances[0])
+    updates = {}
+    for field_name in field_names:
+        field = model._meta.get_field(field_name)
+        updates[field.attname] = Case(
+            *[When(pk=instance.pk,
+                   then=Value(getattr(instance, field.attname),
+                              output_field=field))
+              for instance in instances],
+            output_field=field)
+
+    model.objects.filter(
+        pk__in=[instance.pk for instance in instances]).update(**updates)
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            # The error which caused the cleanup is more important
+            logger.exception('Failed to delete %s', name)
+
+
+@contextmanager
+def atomic_with_files(using=None):
+    """
+    `transaction.atomic` which deletes files written by `save_files`
+    inside the block if the block fails. It must be the outermost atomic
+    block, otherwise the files are kept even if the outer one fails
+    """
+    stack = _written_files.__dict__.setdefault('stack', [])
+    written = []
+    stack.append(written)
+    try:
+        with transaction.atomic(using=using):
+            yield
+    except Exception:
+        for storage, names in written:
+            delete_files(storage, names)
+        raise
+    else:
+        if len(stack) > 1:
+            stack[-2].extend(written)
+    finally:
+        stack.pop()
+
+
+def save_files(instances, field_name, files, max_workers=8):
+    """
+    Writes files of the saved instances to the field storage in parallel
+    and assigns them to the instances without saving the instances.
+    Storage writes are network bound (S3), so threads are enough, every
+    thread has its own storage instance.
+    Written files are deleted if any write fails or the surrounding
+    `atomic_with_files` block fails
+    """
+    if not instances:
+        return
+
+    field = instances[0]._meta.get_field(field_name)
+    local = threading.local()
+
+    def save(instance, content):
+        if not hasattr(local, 'storage'):
+            local.storage = clone_storage(field.storage)
+
+        name = field.generate_filename(instance, content.name)
+        return local.storage.save(
+            name, content, max_length=field.max_length)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(save, instance, content)
+                   for instance, content in zip(instances, files)]
+
+    errors = [future.exception() for future in futures
+              if future.exception() is not None]
+    names = [future.result() for future in futures
+             if future.exception() is None]
+    if errors:
+        delete_files(field.storage, names)
+        raise errors[0]
+
+    stack = getattr(_written_files, 'stack', None)
+    if stack:
+        stack[-1].append((field.storage, names))
+
+    for instance, name in zip(instances, names):
+        setattr(instance, field.attname, name)
@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+
+# Changes are kept at least that long, see `prune_change_log`
+CHANGE_LOG_RETENTION = timedelta(days=30)
+
+
+class TxidCurrent(models.Func):
+    """
+    Id of the current transaction (64 bit, doesn't wrap around)
+    """
+    template = 'txid_current()'
+
+    def __init__(self, **extra):
+        super(TxidCurrent, self).__init__(
+            output_field=models.BigIntegerField(), **extra)
+
+
+class ChangeLogAction(object):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+
+    CHOICES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of changes of the patient related objects.
+    Deleted objects are kept here as tombstones.
+
+    Ids of the rows aren't ordered by commit time, so readers use
+    the id of the writing transaction (`txid`) to find changes they
+    haven't seen yet, see `get_sync_token`
+
+    Old rows are deleted by `prune_change_log`, the boundary is kept
+    as a row of the change log model itself
+    """
+    id = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField(
+        verbose_name='Transaction id'
+    )
+    date_created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created on'
+    )
+    model = models.CharField(
+        max_length=100,
+        verbose_name='Model'
+    )
+    object_pk = models.PositiveIntegerField(
+        verbose_name='Object pk'
+    )
+    # Not a foreign key: tombstones must survive the patient
+    patient_id = models.PositiveIntegerField(
+        verbose_name='Patient id'
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ChangeLogAction.CHOICES,
+        verbose_name='Action'
+    )
+
+    class Meta:
+        verbose_name = 'Change log'
+        verbose_name_plural = 'Change log'
+        index_together = ('patient_id', 'txid', )
+
+    def __str__(self):
+        return '{0} {1}: {2}'.format(self.model, self.object_pk, self.action)
+
+
+def log_change(model, object_pk, patient_pk, action):
+    ChangeLog.objects.create(
+        txid=TxidCurrent(),
+        model=model._meta.label_lower,
+        object_pk=object_pk,
+        patient_id=patient_pk,
+        action=action)
+
+
+def log_changes(model, pks, action):
+    """
+    Bulk version of `log_change` for changes which don't send signals.
+    `pks` is an iterable of (object pk, patient pk)
+    """
+    ChangeLog.objects.bulk_create([
+        ChangeLog(
+            txid=TxidCurrent(),
+            model=model._meta.label_lower,
+            object_pk=object_pk,
+            patient_id=patient_pk,
+            action=action)
+        for object_pk, patient_pk in pks
+    ])
+
+
+def get_sync_token():
+    """
+    Returns the oldest transaction id which may be still in progress.
+    Every change which isn't visible yet will be written with txid
+    greater than or equal to the returned value, so it must be taken
+    before reading the log
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def get_pruned_txid():
+    """
+    Returns the boundary of the last pruning, changes of transactions
+    below it might be lost
+    """
+    return ChangeLog.objects.filter(
+        model=ChangeLog._meta.label_lower
+    ).aggregate(txid=Max('txid'))['txid']
+
+
+def prune_change_log(retention=CHANGE_LOG_RETENTION):
+    """
+    Deletes changes older than `retention` and returns their number
+    """
+    with transaction.atomic():
+        boundary = get_sync_token()
+        first_kept_txid = ChangeLog.objects.filter(
+            date_created__gte=timezone.now() - retention
+        ).aggregate(txid=Min('txid'))['txid']
+        if first_kept_txid is not None:
+            boundary = min(boundary, first_kept_txid)
+
+        count, _ = ChangeLog.objects.filter(txid__lt=boundary).delete()
+        # `bulk_create` doesn't send signals, the row isn't a change
+        ChangeLog.objects.bulk_create([ChangeLog(
+            txid=boundary,
+            model=ChangeLog._meta.label_lower,
+            object_pk=0,
+            patient_id=0,
+            action=ChangeLogAction.DELETED)])
+
+    return count
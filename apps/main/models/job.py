@@ -0,0 +1,120 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class JobStatus(object):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+
+
+class Job(models.Model):
+    """
+    Progress of a background operation which may be split between
+    several tasks. Tasks report processed items with `advance`,
+    the job succeeds when `progress` reaches `total`
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Name'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=JobStatus.CHOICES,
+        default=JobStatus.PENDING,
+        verbose_name='Status'
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total items'
+    )
+    progress = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Processed items'
+    )
+    result = JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Result'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Error'
+    )
+    # The user who can poll the job, empty for system jobs
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='jobs',
+        verbose_name='User'
+    )
+    date_created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created on'
+    )
+    date_finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Finished on'
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ('-date_created', )
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.name, self.status)
+
+    def start(self, total, result=None):
+        self.status = JobStatus.RUNNING
+        self.total = total
+        self.result = result or {}
+        self.save(update_fields=['status', 'total', 'result'])
+
+        if not total:
+            self.finish()
+
+    def advance(self, count):
+        """
+        Adds processed items, it's safe to call from concurrent tasks
+        """
+        Job.objects.filter(pk=self.pk).update(
+            progress=F('progress') + count)
+        Job.objects.filter(
+            pk=self.pk, status=JobStatus.RUNNING,
+            progress__gte=F('total')
+        ).update(status=JobStatus.SUCCEEDED, date_finished=timezone.now())
+
+    def update_result(self, result):
+        self.result = result
+        Job.objects.filter(pk=self.pk).update(result=result)
+
+    def finish(self):
+        Job.objects.filter(pk=self.pk).update(
+            status=JobStatus.SUCCEEDED, date_finished=timezone.now())
+
+    def fail(self, error):
+        Job.objects.filter(pk=self.pk).update(
+            status=JobStatus.FAILED, error=str(error),
+            date_finished=timezone.now())
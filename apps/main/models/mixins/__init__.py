@@ -1 +1,2 @@
 from .delayed_save_files import DelayedSaveFilesMixin
+from .renditions import RenditionsMixin
@@ -0,0 +1,59 @@
+from django.db import transaction
+
+
+class RenditionsMixin(object):
+    """
+    Mixin generates renditions of `renditions_field` in background after
+    the file is changed, see `apps.main.tasks.warm_renditions`.
+    If `renditions_ready_field` is set, the boolean field is reset when
+    the file is changed and set by the task
+    """
+    renditions_field = 'photo'
+    renditions_ready_field = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(RenditionsMixin, cls).from_db(db, field_names, values)
+        instance.remember_renditions_source()
+        return instance
+
+    def remember_renditions_source(self):
+        attname = self._meta.get_field(self.renditions_field).attname
+        # Don't touch the deferred field to avoid extra query
+        if attname in self.__dict__:
+            self._renditions_source = getattr(self, attname).name or None
+
+    def save(self, *args, **kwargs):
+        source_known = hasattr(self, '_renditions_source') or not self.pk
+        if source_known and self.renditions_ready_field and \
+                self.get_renditions_source_name() != \
+                getattr(self, '_renditions_source', None):
+            setattr(self, self.renditions_ready_field, False)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = \
+                    list(update_fields) + [self.renditions_ready_field]
+
+        super(RenditionsMixin, self).save(*args, **kwargs)
+
+        if not source_known:
+            return
+
+        # Nested save (e.g. by `DelayedSaveFilesMixin`) may do it first
+        name = self.get_renditions_source_name()
+        if name and name != getattr(self, '_renditions_source', None):
+            self.schedule_renditions(name)
+        self._renditions_source = name
+
+    def get_renditions_source_name(self):
+        return getattr(self, self.renditions_field).name or None
+
+    def schedule_renditions(self, name):
+        from apps.main.tasks import warm_renditions
+
+        label = self._meta.label
+        pk = self.pk
+        field_name = self.renditions_field
+
+        transaction.on_commit(lambda: warm_renditions.delay(
+            label, pk, field_name, name))
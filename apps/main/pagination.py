@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination, LimitOffsetPagination, _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination by `ordering` field with pk as a tie breaker.
+    Unlike LimitOffsetPagination it doesn't count rows and doesn't scan
+    skipped rows, so the cost of a page doesn't depend on its depth.
+    NULL values of the ordering field are considered as the smallest ones.
+
+    Cursor is an opaque token which contains the position of the last row
+    of the previous page.
+    """
+    ordering = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        field, descending = self.get_ordering()
+        if descending:
+            order_by = (F(field).desc(nulls_last=True), '-pk')
+        else:
+            order_by = (F(field).asc(nulls_first=True), 'pk')
+        queryset = queryset.order_by(*order_by)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(field, descending, *position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_ordering(self):
+        assert self.ordering is not None, (
+            'Using keyset pagination requires `ordering` attribute')
+
+        if self.ordering.startswith('-'):
+            return self.ordering[1:], True
+        return self.ordering, False
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_position_filter(self, field, descending, value, pk):
+        lookup = 'lt' if descending else 'gt'
+        pk_filter = Q(**{'pk__{0}'.format(lookup): pk})
+
+        if value is None:
+            if descending:
+                return Q(**{'{0}__isnull'.format(field): True}) & pk_filter
+            return Q(**{'{0}__isnull'.format(field): False}) | \
+                (Q(**{'{0}__isnull'.format(field): True}) & pk_filter)
+
+        result = Q(**{'{0}__{1}'.format(field, lookup): value}) | \
+            (Q(**{field: value}) & pk_filter)
+        if descending:
+            result |= Q(**{'{0}__isnull'.format(field): True})
+        return result
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        field, _ = self.get_ordering()
+        last = self.page[-1]
+
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            self.encode_cursor(getattr(last, field), last.pk))
+
+    def encode_cursor(self, value, pk):
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+
+        return base64.urlsafe_b64encode(
+            json.dumps([value, pk]).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            value, pk = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii')).decode(
+                    'ascii'))
+            return value, int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class OptionalKeysetPagination(KeysetPagination):
+    """
+    Uses keyset pagination only if cursor query param is passed (it might
+    be empty for the first page), otherwise falls back to
+    `fallback_pagination_class` to keep the old contract for old clients.
+    Set `fallback_pagination_class` to None for not paginated lists
+    """
+    fallback_pagination_class = LimitOffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.cursor_query_param not in request.query_params:
+            if self.fallback_pagination_class is None:
+                return None
+            self.fallback = self.fallback_pagination_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        return super(OptionalKeysetPagination, self).paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+
+        return super(OptionalKeysetPagination, self).get_paginated_response(
+            data)
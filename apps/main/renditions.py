@@ -0,0 +1,196 @@
+"""
+Generates `main_set` renditions of an image field with a single decode
+of the source. Names of the renditions are the same as versatileimagefield
+uses, so the renditions are served by the field as before.
+
+Sizes are processed from the largest to the smallest, every rendition
+is made from the full frame reduced just enough for it, so each source
+pixel is resampled only for the first size. JPEG sources are decoded
+by the draft mode right at the largest needed scale (1/2, 1/4 or 1/8).
+"""
+import io
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .storages import clone_storage
+
+
+EXIF_ORIENTATION_KEY = 274
+EXIF_TRANSPOSES = {
+    3: Image.ROTATE_180,
+    6: Image.ROTATE_270,
+    8: Image.ROTATE_90,
+}
+# JPEG based formats which are decoded like JPEG
+JPEG_FORMATS = ('JPEG', 'MPO')
+
+
+class Rendition(object):
+    def __init__(self, field_file, key):
+        self.sizer, size = key.split('__')
+        self.width, self.height = [int(value) for value in size.split('x')]
+        self.name = getattr(field_file, self.sizer)[size].name
+
+    def get_scale(self, width, height):
+        """
+        Returns the scale of the full frame needed for the rendition
+        """
+        scales = (self.width / width, self.height / height)
+        if self.sizer == 'thumbnail':
+            # Fits into the box
+            return min(1, min(scales))
+
+        # Covers the box before cropping
+        return min(1, max(scales))
+
+    def render(self, image):
+        """
+        Returns the rendition from the full frame scaled by `get_scale`
+        """
+        if self.sizer == 'thumbnail':
+            result = image.copy()
+            result.thumbnail((self.width, self.height), Image.ANTIALIAS)
+            return result
+
+        # Center crop with the aspect ratio of the box
+        aspect = self.width / self.height
+        crop_width = min(image.width, int(round(image.height * aspect)))
+        crop_height = min(image.height, int(round(image.width / aspect)))
+        left = (image.width - crop_width) // 2
+        top = (image.height - crop_height) // 2
+        result = image.crop(
+            (left, top, left + crop_width, top + crop_height))
+
+        if result.size != (self.width, self.height):
+            result = result.resize((self.width, self.height), Image.ANTIALIAS)
+        return result
+
+
+def get_renditions(field_file, rendition_key_set='main_set'):
+    return [
+        Rendition(field_file, key)
+        for _, key in settings.VERSATILEIMAGEFIELD_RENDITION_KEY_SETS[
+            rendition_key_set]
+        if key != 'url'
+    ]
+
+
+def get_orientation(image):
+    try:
+        exif = image._getexif() or {}
+    except (AttributeError, IndexError, KeyError, OSError):
+        return None
+
+    return exif.get(EXIF_ORIENTATION_KEY)
+
+
+def decode(fd, renditions):
+    """
+    Decodes the source once at the scale of the largest rendition
+    """
+    image = Image.open(fd)
+    image_format = image.format
+    transpose = EXIF_TRANSPOSES.get(get_orientation(image))
+    swap = transpose in (Image.ROTATE_90, Image.ROTATE_270)
+
+    width, height = image.size
+    if swap:
+        width, height = height, width
+
+    scale = max(
+        rendition.get_scale(width, height) for rendition in renditions)
+    if image_format in JPEG_FORMATS and scale < 1:
+        draft_size = (int(math.ceil(image.width * scale)),
+                      int(math.ceil(image.height * scale)))
+        image.draft('RGB', draft_size)
+
+    image.load()
+    if transpose is not None:
+        image = image.transpose(transpose)
+
+    return image, image_format, (width, height)
+
+
+def get_output_format(image_format):
+    """
+    Formats which Pillow can't write (e.g. MPO of phone cameras)
+    are saved as JPEG
+    """
+    Image.init()
+    if image_format in JPEG_FORMATS or image_format not in Image.SAVE:
+        return 'JPEG'
+
+    return image_format
+
+
+def encode(image, image_format):
+    image_format = get_output_format(image_format)
+    save_kwargs = {}
+    if image_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        save_kwargs = {
+            'quality': settings.VERSATILEIMAGEFIELD_SETTINGS[
+                'jpeg_resize_quality'],
+            'progressive': settings.VERSATILEIMAGEFIELD_SETTINGS[
+                'progressive_jpeg'],
+        }
+
+    result = io.BytesIO()
+    image.save(result, format=image_format, **save_kwargs)
+    return result.getvalue()
+
+
+def generate_renditions(field_file, rendition_key_set='main_set',
+                        max_workers=4):
+    """
+    Creates missing renditions of the field file and returns
+    the number of created renditions
+    """
+    storage = field_file.storage
+    renditions = [
+        rendition
+        for rendition in get_renditions(field_file, rendition_key_set)
+        if not storage.exists(rendition.name)
+    ]
+    if not renditions:
+        return 0
+
+    with storage.open(field_file.name) as fd:
+        image, image_format, (width, height) = decode(fd, renditions)
+
+    renditions.sort(
+        key=lambda rendition: rendition.get_scale(width, height),
+        reverse=True)
+
+    outputs = []
+    for rendition in renditions:
+        scale = rendition.get_scale(width, height)
+        size = (max(int(math.ceil(width * scale)), 1),
+                max(int(math.ceil(height * scale)), 1))
+        # The next sizes are made from this smaller frame
+        if image.width > size[0] and image.height > size[1]:
+            image = image.resize(size, Image.ANTIALIAS)
+
+        outputs.append((
+            rendition.name,
+            encode(rendition.render(image), image_format)))
+
+    # Storage writes are network bound (S3), boto storages can't be
+    # shared between threads
+    local = threading.local()
+
+    def save(output):
+        if not hasattr(local, 'storage'):
+            local.storage = clone_storage(storage)
+        local.storage.save(output[0], ContentFile(output[1]))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(save, outputs))
+
+    return len(outputs)
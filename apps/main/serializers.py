@@ -0,0 +1,11 @@
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ('pk', 'name', 'status', 'total', 'progress', 'result',
+                  'error', 'date_created', 'date_finished', )
+        read_only_fields = fields
@@ -1,2 +1,3 @@
 from .private import private_storage
 from .public import public_storage
+from .clone import clone_storage
@@ -0,0 +1,10 @@
+from django.utils.module_loading import import_string
+
+
+def clone_storage(storage):
+    """
+    Returns a new instance of the storage with the same arguments.
+    Connections of boto storages can't be shared between threads
+    """
+    path, args, kwargs = storage.deconstruct()
+    return import_string(path)(*args, **kwargs)
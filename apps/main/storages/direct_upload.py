@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+from django.core import signing
+from django.urls import reverse
+from storages.backends.s3boto import S3BotoStorage
+
+
+DIRECT_UPLOAD_SALT = 'direct_upload'
+
+
+class S3DirectUpload(object):
+    """
+    Presigned POST to the bucket of the storage, the file doesn't pass
+    through API workers
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def get_upload_form(self, request, name, max_size, expires_in):
+        form = self.storage.connection.build_post_form_args(
+            self.storage.bucket_name,
+            self.storage._normalize_name(self.storage._clean_name(name)),
+            expires_in=expires_in,
+            max_content_length=max_size,
+            http_method='https')
+
+        return OrderedDict([
+            ('url', form['action']),
+            ('fields', OrderedDict(
+                (field['name'], field['value']) for field in form['fields'])),
+        ])
+
+
+class FileSystemDirectUpload(object):
+    """
+    Local stand-in for `S3DirectUpload` with the same form contract.
+    The form is posted to `direct_upload_view` with the signed policy
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def get_upload_form(self, request, name, max_size, expires_in):
+        policy = signing.dumps(
+            {'key': name, 'max_size': max_size, 'expires_in': expires_in},
+            salt=DIRECT_UPLOAD_SALT)
+
+        return OrderedDict([
+            ('url', request.build_absolute_uri(reverse('direct_upload'))),
+            ('fields', OrderedDict([
+                ('key', name),
+                ('policy', policy),
+            ])),
+        ])
+
+
+def get_direct_upload(storage):
+    if isinstance(storage, S3BotoStorage):  # pragma: no cover
+        return S3DirectUpload(storage)
+
+    return FileSystemDirectUpload(storage)
@@ -0,0 +1,35 @@
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+
+from .renditions import generate_renditions
+
+
+@shared_task
+def warm_renditions(model_label, pk, field_name, name):
+    """
+    Generates `main_set` renditions of the file, see `RenditionsMixin`
+    and `apps.main.renditions`.
+    Existing renditions aren't generated again, so the task might be
+    retried. The task is skipped if the file is changed since then,
+    another task is scheduled for the new file
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or getattr(instance, field_name).name != name:
+        return
+
+    generate_renditions(getattr(instance, field_name))
+
+    ready_field = instance.renditions_ready_field
+    if ready_field is None:
+        return
+
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=pk).first()
+        if instance is None or getattr(instance, field_name).name != name:
+            return
+
+        # Signals are sent, so clients see the change
+        setattr(instance, ready_field, True)
+        instance.save(update_fields=[ready_field])
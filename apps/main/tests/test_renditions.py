@@ -0,0 +1,61 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from PIL import Image
+
+from apps.main.tests.mixins import FileTestMixin
+from apps.moles.factories import MoleImageFactory
+from ..renditions import encode, generate_renditions, get_renditions
+
+
+class RenditionsTest(FileTestMixin, TestCase):
+    def get_jpeg_file(self, width, height):
+        result = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(result, format='JPEG')
+        return SimpleUploadedFile('photo.jpg', result.getvalue())
+
+    def get_png_file(self, width, height):
+        result = io.BytesIO()
+        Image.new('RGBA', (width, height), 'red').save(result, format='PNG')
+        return SimpleUploadedFile('photo.png', result.getvalue())
+
+    def test_generate_renditions(self):
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_jpeg_file(1600, 1200))
+
+            self.assertEqual(generate_renditions(mole_image.photo), 3)
+
+            sizes = {}
+            for rendition in get_renditions(mole_image.photo):
+                with mole_image.photo.storage.open(rendition.name) as fd:
+                    sizes[rendition.sizer, rendition.width] = \
+                        Image.open(fd).size
+
+            self.assertEqual(generate_renditions(mole_image.photo), 0)
+
+        self.assertEqual(sizes, {
+            ('thumbnail', 300): (300, 225),
+            ('crop', 400): (400, 400),
+            ('crop', 50): (50, 50),
+        })
+
+    def test_generate_renditions_of_png(self):
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_png_file(800, 600))
+
+            self.assertEqual(generate_renditions(mole_image.photo), 3)
+
+            for rendition in get_renditions(mole_image.photo):
+                with mole_image.photo.storage.open(rendition.name) as fd:
+                    self.assertEqual(Image.open(fd).format, 'PNG')
+
+    def test_encode_not_writable_format_as_jpeg(self):
+        # Pillow opens photos of many phone cameras as MPO
+        # but can't write them
+        image = Image.new('RGB', (10, 10), 'red')
+
+        result = Image.open(io.BytesIO(encode(image, 'MPO')))
+        self.assertEqual(result.format, 'JPEG')
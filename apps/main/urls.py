@@ -0,0 +1,12 @@
+from django.conf.urls import url, include
+from rest_framework import routers
+
+from .viewsets import JobViewSet
+
+
+router = routers.SimpleRouter()
+router.register('job', JobViewSet)
+
+urlpatterns = [
+    url(r'^', include(router.urls)),
+]
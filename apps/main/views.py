@@ -0,0 +1,45 @@
+from django.core import signing
+from rest_framework import response, status, views
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+
+from .storages import private_storage
+from .storages.direct_upload import DIRECT_UPLOAD_SALT
+
+
+class DirectUploadView(views.APIView):
+    """
+    Accepts forms of `FileSystemDirectUpload` when S3 isn't configured
+    (development and tests). Like a presigned POST it's authorized
+    by the signed policy only
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny, )
+
+    def post(self, request):
+        policy = self.get_policy(request.data.get('policy', ''))
+        key = request.data.get('key')
+        file = request.data.get('file')
+
+        if key != policy['key'] or file is None:
+            raise ValidationError('Form does not match the policy')
+        if file.size > policy['max_size']:
+            raise ValidationError('File is too large')
+        if private_storage.exists(key):
+            raise ValidationError('File already exists')
+
+        private_storage.save(key, file)
+
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_policy(self, value):
+        try:
+            # The policy is trusted after the first check
+            policy = signing.loads(value, salt=DIRECT_UPLOAD_SALT)
+            return signing.loads(
+                value, salt=DIRECT_UPLOAD_SALT, max_age=policy['expires_in'])
+        except signing.BadSignature:
+            raise ValidationError('Invalid or expired policy')
+
+
+direct_upload_view = DirectUploadView.as_view()
@@ -1,6 +1,7 @@
 from copy import copy
 from django.core.exceptions import ImproperlyConfigured
 
+from rest_framework import mixins, viewsets
 from rest_framework.decorators import detail_route
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer, ValidationError
@@ -8,6 +9,9 @@ from rest_framework.serializers import Serializer, ValidationError
 from django_fsm import (
     can_proceed, has_transition_perm, FSMFieldMixin, TransitionNotAllowed, )
 
+from .models import Job
+from .serializers import JobSerializer
+
 
 def add_transition_actions(Klass):
     Model = Klass.queryset.model
@@ -51,3 +55,15 @@ def add_transition_actions(Klass):
             methods=['post'],
             serializer_class=serializer_class)(get_fn(f.name)))
     return Klass
+
+
+class JobViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin):
+    """
+    Progress and results of background jobs started by the user
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return super(JobViewSet, self).get_queryset().filter(
+            user=self.request.user)
@@ -0,0 +1,236 @@
+"""
+Backends of the mole classifier, `MOLE_CLASSIFIER_BACKEND` is used.
+
+`RemoteClassifierBackend` sends photo urls to the classifier service.
+Its session keeps connections alive between tasks of a worker, every
+request has connect and read timeouts and failed connections and 5xx
+responses are retried with exponential backoff.
+
+`LocalClassifierBackend` scores photos in a pool of worker processes,
+the `MOLE_CLASSIFIER_MODEL` is loaded once per process.
+"""
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from functools import partial
+
+import requests
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+from PIL import Image, ImageStat
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class ClassifierError(Exception):
+    pass
+
+
+class Prediction(object):
+    def __init__(self, data):
+        self.is_success = data.get('status') == 'success'
+        self.prediction = data.get('prediction', '')
+        self.probability = Decimal(str(data.get('probability', 0)))
+
+
+class MoleClassifierClient(object):
+    def __init__(self, url, batch_url=None, connect_timeout=3.05,
+                 read_timeout=30, retries=3, backoff_factor=0.5):
+        self.url = url
+        self.batch_url = batch_url
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            # Predictions don't change anything, so POST is safe to repeat
+            method_whitelist=frozenset(['POST']))
+        adapter = HTTPAdapter(max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url, payload):
+        try:
+            response = self.session.post(
+                url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ClassifierError(e)
+
+    def predict(self, image_url):
+        return Prediction(self.post(self.url, {'image_url': image_url}))
+
+    def predict_many(self, image_urls):
+        """
+        Takes a dict of image urls by id and returns a dict of predictions
+        by id. All images are sent in one request if the batch endpoint
+        is configured
+        """
+        if not self.batch_url:
+            return self.predict_one_by_one(image_urls)
+
+        data = self.post(self.batch_url, {
+            'images': [
+                {'id': pk, 'image_url': image_url}
+                for pk, image_url in image_urls.items()
+            ],
+        })
+        if data.get('status') != 'success':
+            raise ClassifierError(data)
+
+        return {
+            result['id']: Prediction(result)
+            for result in data['results']
+        }
+
+    def predict_one_by_one(self, image_urls):
+        """
+        Images the classifier failed on get error predictions, so
+        received predictions aren't lost. The error is raised only
+        if nothing is received, then the whole batch can be retried
+        """
+        predictions = {}
+        errors = []
+        for pk, image_url in image_urls.items():
+            try:
+                predictions[pk] = self.predict(image_url)
+            except ClassifierError as e:
+                errors.append(e)
+                predictions[pk] = Prediction({'status': 'error'})
+
+        if errors and len(errors) == len(image_urls):
+            raise errors[0]
+
+        return predictions
+
+
+class RemoteClassifierBackend(object):
+    def __init__(self):
+        self.client = MoleClassifierClient(
+            settings.MOLE_CLASSIFIER_URL,
+            batch_url=settings.MOLE_CLASSIFIER_BATCH_URL,
+            connect_timeout=settings.MOLE_CLASSIFIER_CONNECT_TIMEOUT,
+            read_timeout=settings.MOLE_CLASSIFIER_READ_TIMEOUT,
+            retries=settings.MOLE_CLASSIFIER_RETRIES,
+            backoff_factor=settings.MOLE_CLASSIFIER_BACKOFF_FACTOR)
+
+    def predict_many(self, mole_images):
+        """
+        Returns a dict of predictions by pk of the images
+        """
+        return self.client.predict_many({
+            mole_image.pk: mole_image.photo.url
+            for mole_image in mole_images
+        })
+
+    def close(self):
+        self.client.session.close()
+
+
+class DummyModel(object):
+    """
+    Deterministic model for tests and development,
+    the probability is the mean brightness of the photo
+    """
+    def predict(self, image):
+        brightness = ImageStat.Stat(image.convert('L')).mean[0] / 255
+        return 'Dummy prediction', round(brightness, 3)
+
+
+# Models loaded in the current process by the import path
+_models = {}
+
+
+def score_image(model_path, content):
+    """
+    Runs in a process of the pool
+    """
+    if model_path not in _models:
+        _models[model_path] = import_string(model_path)()
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+        prediction, probability = _models[model_path].predict(image)
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+
+    return {
+        'status': 'success',
+        'prediction': prediction,
+        'probability': probability,
+    }
+
+
+def read_photo(mole_image):
+    with mole_image.photo.storage.open(mole_image.photo.name) as fd:
+        return fd.read()
+
+
+class LocalClassifierBackend(object):
+    def __init__(self):
+        self.model_path = settings.MOLE_CLASSIFIER_MODEL
+        self.max_workers = settings.MOLE_CLASSIFIER_WORKERS
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def predict_many(self, mole_images):
+        # Storage reads are network bound (S3), scoring is CPU bound
+        with ThreadPoolExecutor(max_workers=4) as reader:
+            contents = list(reader.map(read_photo, mole_images))
+
+        try:
+            results = list(self.executor.map(
+                partial(score_image, self.model_path), contents))
+        except BrokenProcessPool as e:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            raise ClassifierError(e)
+
+        return {
+            mole_image.pk: Prediction(result)
+            for mole_image, result in zip(mole_images, results)
+        }
+
+    def close(self):
+        self.executor.shutdown()
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """
+    Returns the backend of the current settings, it's shared by all
+    tasks of the process
+    """
+    global _classifier
+
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = import_string(settings.MOLE_CLASSIFIER_BACKEND)()
+
+        return _classifier
+
+
+@receiver(setting_changed)
+def reset_classifier(setting, **kwargs):
+    global _classifier
+
+    if not setting.startswith('MOLE_CLASSIFIER_'):
+        return
+
+    with _classifier_lock:
+        if _classifier is not None:
+            _classifier.close()
+            _classifier = None
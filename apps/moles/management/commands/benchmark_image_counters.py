@@ -0,0 +1,142 @@
+import random
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Case, When, F
+
+from apps.accounts.models import Patient
+from ...models import AnatomicalSite, Mole, MoleImage, Study
+
+
+def legacy_count(prefix, then, study_pk, **conditions):
+    """
+    The join based counter which was used before `Counters`
+    """
+    when = {'{0}study_id'.format(prefix): study_pk, 'then': F(then)}
+    for lookup, value in conditions.items():
+        when['{0}{1}'.format(prefix, lookup)] = value
+
+    return Count(Case(When(**when), default=None), distinct=True)
+
+
+def annotate_legacy_patient_counters(queryset, study_pk):
+    prefix = 'moles__images__'
+    then = 'moles__images__pk'
+
+    return queryset.annotate(
+        moles_count=legacy_count(prefix, 'moles__pk', study_pk),
+        moles_images_count=legacy_count(prefix, then, study_pk),
+        moles_images_with_clinical_diagnosis_required=legacy_count(
+            prefix, then, study_pk, clinical_diagnosis__exact=''),
+        moles_images_with_pathological_diagnosis_required=legacy_count(
+            prefix, then, study_pk, biopsy=True, path_diagnosis__exact=''),
+        moles_images_biopsy_count=legacy_count(
+            prefix, then, study_pk, biopsy=True),
+        moles_images_approve_required=legacy_count(
+            prefix, then, study_pk, approved__exact=False))
+
+
+def annotate_legacy_mole_counters(queryset, study_pk):
+    prefix = 'images__'
+    then = 'images__pk'
+
+    return queryset.annotate(
+        images_count=legacy_count(prefix, then, study_pk),
+        images_with_clinical_diagnosis_required=legacy_count(
+            prefix, then, study_pk, clinical_diagnosis__exact=''),
+        images_with_pathological_diagnosis_required=legacy_count(
+            prefix, then, study_pk, biopsy=True, path_diagnosis__exact=''),
+        images_biopsy_count=legacy_count(
+            prefix, then, study_pk, biopsy=True),
+        images_approve_required=legacy_count(
+            prefix, then, study_pk, approved__exact=False))
+
+
+class Command(BaseCommand):
+    help = 'Compares image counters subqueries with the join aggregation ' \
+           'on a seeded dataset. Seeded data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--moles', type=int, default=10,
+                            help='Moles per patient')
+        parser.add_argument('--images', type=int, default=5,
+                            help='Images per mole')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, **options):
+        with transaction.atomic():
+            study = self.seed(
+                options['patients'], options['moles'], options['images'])
+            patients = Patient.objects.filter(
+                mrn_hash__startswith='benchmark')
+            moles = Mole.objects.filter(patient__in=patients)
+
+            for study_pk in (None, study.pk):
+                self.compare(
+                    'Patients, study {0}'.format(study_pk),
+                    annotate_legacy_patient_counters(patients, study_pk),
+                    patients.annotate_image_counters(study_pk),
+                    options['repeat'])
+                self.compare(
+                    'Moles, study {0}'.format(study_pk),
+                    annotate_legacy_mole_counters(moles, study_pk),
+                    moles.annotate_image_counters(study_pk),
+                    options['repeat'])
+
+            transaction.set_rollback(True)
+
+    def seed(self, patients_count, moles_count, images_count):
+        anatomical_site = AnatomicalSite.objects.first() or \
+            AnatomicalSite.objects.create(name='Benchmark')
+        study = Study.objects.create(title='Benchmark')
+
+        patients = Patient.objects.bulk_create([
+            Patient(first_name='', last_name='',
+                    mrn_hash='benchmark{0}'.format(index))
+            for index in range(patients_count)
+        ])
+        moles = Mole.objects.bulk_create([
+            Mole(patient=patient, anatomical_site=anatomical_site,
+                 position_info={})
+            for patient in patients
+            for _ in range(moles_count)
+        ])
+        MoleImage.objects.bulk_create([
+            MoleImage(
+                mole=mole,
+                study=random.choice([None, study]),
+                biopsy=random.random() < 0.2,
+                approved=random.random() < 0.5,
+                clinical_diagnosis=random.choice(['', 'benign']))
+            for mole in moles
+            for _ in range(images_count)
+        ], batch_size=1000)
+
+        return study
+
+    def compare(self, title, legacy, counters, repeat):
+        names = sorted(counters.query.annotations['image_counters'].counters)
+        legacy_time, legacy_result = self.measure(legacy, names, repeat)
+        counters_time, counters_result = self.measure(counters, names, repeat)
+
+        self.stdout.write(
+            '{0}: join aggregation {1:.1f} ms, counters subquery '
+            '{2:.1f} ms, results {3}'.format(
+                title, legacy_time * 1000, counters_time * 1000,
+                'match' if legacy_result == counters_result else 'differ'))
+
+    def measure(self, queryset, names, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            objects = list(queryset.all())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        result = {
+            obj.pk: tuple(getattr(obj, name) for name in names)
+            for obj in objects
+        }
+        return best, result
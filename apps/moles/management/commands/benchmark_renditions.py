@@ -0,0 +1,123 @@
+import io
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from PIL import Image
+from versatileimagefield.utils import get_url_from_image_key
+
+from apps.main.renditions import generate_renditions
+from apps.main.storages import private_storage
+from ...models import MoleImage
+
+
+def warm_with_versatileimagefield(field_file):
+    """
+    What `VersatileImageFieldWarmer` does for every image
+    """
+    field_file.create_on_demand = True
+    for _, key in settings.VERSATILEIMAGEFIELD_RENDITION_KEY_SETS['main_set']:
+        get_url_from_image_key(field_file, key)
+
+
+def warm_with_single_decode(field_file):
+    generate_renditions(field_file)
+
+
+ENGINES = (
+    ('versatileimagefield warmer', warm_with_versatileimagefield),
+    ('single decode', warm_with_single_decode),
+)
+
+
+def run_engine(engine, names, pipe):
+    """
+    Runs in a separate process, so the peak RSS belongs to the engine
+    """
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_time = 0
+
+    for name in names:
+        field_file = MoleImage(photo=name).photo
+        start = time.process_time()
+        engine(field_file)
+        cpu_time += time.process_time() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pipe.send((cpu_time / len(names), peak_rss - baseline_rss))
+    pipe.close()
+
+
+class Command(BaseCommand):
+    help = 'Compares CPU time and peak RSS per photo of the single decode ' \
+           'renditions with the versatileimagefield warmer. ' \
+           'Works with the file system storage only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--image', help='Source JPEG, generated if empty')
+        parser.add_argument('--width', type=int, default=4032)
+        parser.add_argument('--height', type=int, default=3024)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, **options):
+        if not isinstance(private_storage, FileSystemStorage):
+            raise CommandError('Benchmark must not write to S3')
+
+        source = self.get_source(options)
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                for title, engine in ENGINES:
+                    cpu_time, peak_rss = self.measure(
+                        engine, title, source, options['repeat'])
+                    self.stdout.write(
+                        '{0}: {1:.1f} ms CPU, {2:.1f} MB peak RSS '
+                        'per photo'.format(
+                            title, cpu_time * 1000, peak_rss / 1024))
+        finally:
+            shutil.rmtree(media_root)
+
+    def get_source(self, options):
+        if options['image']:
+            with open(options['image'], 'rb') as fd:
+                return fd.read()
+
+        image = Image.effect_noise(
+            (options['width'], options['height']), 64).convert('RGB')
+        result = io.BytesIO()
+        image.save(result, format='JPEG', quality=90)
+        return result.getvalue()
+
+    def measure(self, engine, title, source, repeat):
+        # Every run gets a new source, so renditions aren't reused
+        names = [
+            private_storage.save(
+                'benchmark/{0}_{1}.jpg'.format(title.replace(' ', '_'), i),
+                ContentFile(source))
+            for i in range(repeat)
+        ]
+
+        # The child must not share the database connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        parent_pipe, child_pipe = context.Pipe()
+        process = context.Process(
+            target=run_engine, args=(engine, names, child_pipe))
+        process.start()
+        child_pipe.close()
+        try:
+            result = parent_pipe.recv()
+        except EOFError:
+            raise CommandError('{0} failed'.format(title))
+        finally:
+            process.join()
+
+        return result
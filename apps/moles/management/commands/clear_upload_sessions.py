@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from ...models import UploadSession
+from ...models.upload_session import UPLOAD_SESSION_TTL
+
+
+class Command(BaseCommand):
+    help = 'Removes expired upload sessions with their files'
+
+    def handle(self, **options):
+        sessions = UploadSession.objects.filter(
+            date_created__lt=timezone.now() - UPLOAD_SESSION_TTL)
+        count = sessions.count()
+        sessions.delete()
+
+        self.stdout.write('Removed {0} upload sessions'.format(count))
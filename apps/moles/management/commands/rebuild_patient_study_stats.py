@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from ...models import PatientStudyStats
+from ...models.patient_study_stats import rebuild_patient_study_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalculates patient study stats from mole images'
+
+    def handle(self, **options):
+        rebuild_patient_study_stats()
+
+        self.stdout.write('Rebuilt {0} patient study stats'.format(
+            PatientStudyStats.objects.count()))
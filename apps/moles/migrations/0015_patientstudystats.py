@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 09:12
+from __future__ import unicode_literals
+
+from django.core.management import call_command
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def forwards_func(apps, schema_editor):
+    call_command('rebuild_patient_study_stats')
+
+
+def reverse_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_participant'),
+        ('moles', '0014_merge_20180718_0640'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientStudyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_upload', models.DateTimeField(blank=True, null=True, verbose_name='Last upload')),
+                ('moles_count', models.PositiveIntegerField(default=0)),
+                ('moles_images_count', models.PositiveIntegerField(default=0)),
+                ('moles_images_with_clinical_diagnosis_required', models.PositiveIntegerField(default=0)),
+                ('moles_images_with_pathological_diagnosis_required', models.PositiveIntegerField(default=0)),
+                ('moles_images_biopsy_count', models.PositiveIntegerField(default=0)),
+                ('moles_images_approve_required', models.PositiveIntegerField(default=0)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='accounts.Patient', verbose_name='Patient')),
+                ('study', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patients_stats', to='moles.Study', verbose_name='Study')),
+            ],
+            options={
+                'verbose_name': 'Patient study stats',
+                'verbose_name_plural': 'Patient study stats',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='patientstudystats',
+            unique_together=set([('patient', 'study')]),
+        ),
+        # Unique together doesn't work for NULL values
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX moles_patientstudystats_patient_id_no_study '
+            'ON moles_patientstudystats (patient_id) WHERE study_id IS NULL',
+            'DROP INDEX moles_patientstudystats_patient_id_no_study'),
+        migrations.RunPython(forwards_func, reverse_func),
+    ]
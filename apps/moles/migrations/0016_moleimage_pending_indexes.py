@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 14:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moles', '0015_patientstudystats'),
+    ]
+
+    # Predicates must match `MoleImageQuerySet` filters
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX moles_moleimage_path_diagnosis_required '
+            'ON moles_moleimage (mole_id, study_id) '
+            'WHERE biopsy = true AND path_diagnosis = \'\'',
+            'DROP INDEX moles_moleimage_path_diagnosis_required'),
+        migrations.RunSQL(
+            'CREATE INDEX moles_moleimage_clinical_diagnosis_required '
+            'ON moles_moleimage (mole_id, study_id) '
+            'WHERE clinical_diagnosis = \'\'',
+            'DROP INDEX moles_moleimage_clinical_diagnosis_required'),
+        migrations.RunSQL(
+            'CREATE INDEX moles_moleimage_approve_required '
+            'ON moles_moleimage (mole_id, study_id) '
+            'WHERE approved = false',
+            'DROP INDEX moles_moleimage_approve_required'),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 15:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moles', '0016_moleimage_pending_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moleimage',
+            index=models.Index(fields=['mole', '-date_created'],
+                               name='moles_image_mole_created_idx'),
+        ),
+    ]
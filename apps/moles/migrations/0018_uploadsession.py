@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 16:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_patientsearchtoken'),
+        ('moles', '0017_moleimage_mole_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=100, verbose_name='File name')),
+                ('size', models.PositiveIntegerField(verbose_name='Size')),
+                ('offset', models.PositiveIntegerField(default=0, verbose_name='Received bytes')),
+                ('is_completed', models.BooleanField(default=False, verbose_name='Is completed')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Created on')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='accounts.Doctor', verbose_name='Doctor')),
+            ],
+            options={
+                'verbose_name': 'Upload session',
+                'verbose_name_plural': 'Upload sessions',
+            },
+        ),
+    ]
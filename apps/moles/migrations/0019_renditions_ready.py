@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 17:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moles', '0018_uploadsession'),
+    ]
+
+    # Renditions of the existing photos were generated on save
+    operations = [
+        migrations.AddField(
+            model_name='moleimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=True, verbose_name='Photo renditions are generated'),
+        ),
+        migrations.AlterField(
+            model_name='moleimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, verbose_name='Photo renditions are generated'),
+        ),
+        migrations.AddField(
+            model_name='patientanatomicalsite',
+            name='renditions_ready',
+            field=models.BooleanField(default=True, verbose_name='Distant photo renditions are generated'),
+        ),
+        migrations.AlterField(
+            model_name='patientanatomicalsite',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, verbose_name='Distant photo renditions are generated'),
+        ),
+    ]
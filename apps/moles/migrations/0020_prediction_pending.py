@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.1 on 2026-10-18 18:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moles', '0019_renditions_ready'),
+    ]
+
+    # Existing photos were sent to the classifier on save
+    operations = [
+        migrations.AddField(
+            model_name='moleimage',
+            name='prediction_pending',
+            field=models.BooleanField(default=False, verbose_name='Photo is waiting for the classifier'),
+        ),
+        migrations.AlterField(
+            model_name='moleimage',
+            name='prediction_pending',
+            field=models.BooleanField(default=True, verbose_name='Photo is waiting for the classifier'),
+        ),
+        # Only a few images are pending at a time
+        migrations.RunSQL(
+            'CREATE INDEX moles_moleimage_prediction_pending '
+            'ON moles_moleimage (date_created) '
+            'WHERE prediction_pending = true',
+            'DROP INDEX moles_moleimage_prediction_pending'),
+    ]
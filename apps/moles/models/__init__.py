@@ -4,3 +4,5 @@ from .mole import Mole
 from .mole_image import MoleImage
 from .study import Study, ConsentDoc, StudyToPatient
 from .study_invitation import StudyInvitation, StudyInvitationStatus
+from .patient_study_stats import PatientStudyStats
+from .upload_session import UploadSession
@@ -1,4 +1,12 @@
-from django.db import models
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
 from mptt.models import MPTTModel, TreeForeignKey
 
@@ -34,3 +42,105 @@ class AnatomicalSite(MPTTModel):
         self.slug = slugify(self.name)
 
         return super(AnatomicalSite, self).save(*args, **kwargs)
+
+
+TREE_VERSION_KEY = 'versions:anatomical_site_tree'
+# Seconds between checks of the shared version outside of requests,
+# requests check it once at the first use of the tree
+TREE_VERSION_CHECK_INTERVAL = 1
+
+
+class AnatomicalSiteTree(object):
+    """
+    In-memory snapshot of all anatomical sites with precalculated
+    paths from the root, so ancestors are looked up without queries
+    """
+    def __init__(self, version, anatomical_sites):
+        self.version = version
+        self.paths = {}
+        self.children = {}
+
+        # Parents go before children in tree order
+        for anatomical_site in anatomical_sites:
+            self.paths[anatomical_site.slug] = self.paths.get(
+                anatomical_site.parent_id, []) + [anatomical_site]
+            self.children.setdefault(anatomical_site.parent_id, []).append(
+                anatomical_site)
+
+    def get_path(self, slug):
+        """
+        Returns list of the ancestors and the anatomical site itself.
+        Raises KeyError for unknown slug
+        """
+        return self.paths[slug]
+
+    def get_children(self, slug):
+        """
+        Returns children of the anatomical site or roots for None slug
+        """
+        return self.children.get(slug, [])
+
+
+_tree_lock = threading.Lock()
+_tree = None
+_tree_version_checked = None
+
+
+def get_tree_version():
+    version = cache.get(TREE_VERSION_KEY)
+    if version is None:
+        # Another worker may set the version concurrently
+        cache.add(TREE_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TREE_VERSION_KEY)
+
+    return version
+
+
+def get_anatomical_site_tree():
+    """
+    Returns the tree which is loaded once per worker and reloaded
+    only when the shared version is changed
+    """
+    global _tree, _tree_version_checked
+
+    with _tree_lock:
+        now = time.monotonic()
+        if _tree is not None and _tree_version_checked is not None and \
+                now - _tree_version_checked < TREE_VERSION_CHECK_INTERVAL:
+            return _tree
+
+        version = get_tree_version()
+        if _tree is None or _tree.version != version:
+            _tree = AnatomicalSiteTree(
+                version,
+                AnatomicalSite.objects.order_by('tree_id', 'lft'))
+        _tree_version_checked = now
+
+        return _tree
+
+
+def invalidate_anatomical_site_tree():
+    """
+    Drops the tree of the current worker immediately and the trees
+    of other workers after commit
+    """
+    global _tree
+
+    with _tree_lock:
+        _tree = None
+
+    transaction.on_commit(
+        lambda: cache.set(TREE_VERSION_KEY, uuid.uuid4().hex, None))
+
+
+@receiver(request_started)
+def expire_anatomical_site_tree_version_check(sender, **kwargs):
+    global _tree_version_checked
+
+    _tree_version_checked = None
+
+
+@receiver(post_save, sender=AnatomicalSite)
+@receiver(post_delete, sender=AnatomicalSite)
+def invalidate_anatomical_site_tree_on_change(sender, **kwargs):
+    invalidate_anatomical_site_tree()
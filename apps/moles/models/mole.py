@@ -1,108 +1,77 @@
 from django.db import models
-from django.db.models import Max, Count, Case, When, Q, F
-from django.contrib.postgres.fields import JSONField
+from django.db.models import (
+    Count, Prefetch, Subquery, OuterRef, Value)
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.fields import ArrayField, JSONField
 
 from apps.accounts.models import Patient
-from apps.main.models.aggregates import ArrayAgg, ArrayRemove
-from .anatomical_site import AnatomicalSite
+from apps.main.models.aggregates import (
+    ArrayAgg, Counters, CountersQuerySetMixin, FilteredCount)
+from .anatomical_site import AnatomicalSite, get_anatomical_site_tree
 from .patient_anatomical_site import PatientAnatomicalSite
 
 
-class MoleQuerySet(models.QuerySet):
-    def annotate_last_upload(self):
-        return self.annotate(last_upload=Max('images__date_created'))
-
-    def annotate_clinical_diagnosis_required(self, study_pk):
-        when = {
-            'images__clinical_diagnosis__exact': '',
-            'images__study_id': study_pk,
-            'then': F('images__pk')
-        }
-
-        return self.annotate(
-            images_with_clinical_diagnosis_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_pathological_diagnosis_required(self, study_pk):
-        when = {
-            'images__biopsy': True,
-            'images__path_diagnosis__exact': '',
-            'images__study_id': study_pk,
-            'then': F('images__pk')
-        }
-
-        return self.annotate(
-            images_with_pathological_diagnosis_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
+class MoleQuerySet(CountersQuerySetMixin, models.QuerySet):
+    def prefetch_last_image(self, study_pk):
+        """
+        Prefetches the latest image of the study for all moles by one
+        DISTINCT ON query into `prefetched_last_images`
+        """
+        from .mole_image import MoleImage
+
+        return self.prefetch_related(Prefetch(
+            'images',
+            queryset=MoleImage.objects.filter(
+                study_id=study_pk
+            ).select_related(
+                'study'
+            ).order_by(
+                'mole_id', '-date_created', '-pk'
+            ).distinct('mole_id'),
+            to_attr='prefetched_last_images'))
 
-    def annotate_biopsy_count(self, study_pk):
-        when = {
-            'images__biopsy': True,
-            'images__study_id': study_pk,
-            'then': F('images__pk')
-        }
-
-        return self.annotate(
-            images_biopsy_count=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
-
-    def annotate_approve_required(self, study_pk):
-        when = {
-            'images__approved__exact': False,
-            'images__study_id': study_pk,
-            'then': F('images__pk')
-        }
-
-        return self.annotate(
-            images_approve_required=Count(
-                Case(
-                    When(**when),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
+    def annotate_last_upload(self):
+        from .mole_image import MoleImage
+
+        return self.annotate(last_upload=Subquery(
+            MoleImage.objects.filter(
+                mole=OuterRef('pk')
+            ).order_by('-date_created').values('date_created')[:1],
+            output_field=models.DateTimeField()))
+
+    def annotate_image_counters(self, study_pk):
+        """
+        Annotates counters of the study images, all of them are
+        calculated by one correlated subquery
+        """
+        from .mole_image import (
+            MoleImage, PATH_DIAGNOSIS_REQUIRED, CLINICAL_DIAGNOSIS_REQUIRED,
+            APPROVE_REQUIRED, BIOPSY)
+
+        return self.annotate_counters(image_counters=Counters(
+            MoleImage.objects.filter(mole=OuterRef('pk'), study_id=study_pk),
+            'mole',
+            images_count=Count('*'),
+            images_with_clinical_diagnosis_required=FilteredCount(
+                '*', CLINICAL_DIAGNOSIS_REQUIRED),
+            images_with_pathological_diagnosis_required=FilteredCount(
+                '*', PATH_DIAGNOSIS_REQUIRED),
+            images_biopsy_count=FilteredCount('*', BIOPSY),
+            images_approve_required=FilteredCount('*', APPROVE_REQUIRED)))
 
     def annotate_studies(self):
-        return self.annotate(
-            studies=ArrayRemove(
-                ArrayAgg(
-                    'images__study_id',
-                    distinct=True
-                ),
-                None
-            )
-        )
+        from .mole_image import MoleImage
 
-    def annotate_images_count(self, study_pk):
-        return self.annotate(
-            images_count=Count(
-                Case(
-                    When(images__study_id=study_pk,
-                         then=F('images__pk')),
-                    default=None
-                ),
-                distinct=True
-            )
-        )
+        return self.annotate(studies=Coalesce(
+            Subquery(
+                MoleImage.objects.filter(
+                    mole=OuterRef('pk'), study__isnull=False
+                ).order_by().values('mole').annotate(
+                    study_ids=ArrayAgg('study_id', distinct=True)
+                ).values('study_ids'),
+                output_field=ArrayField(models.IntegerField())),
+            Value([]),
+            output_field=ArrayField(models.IntegerField())))
 
 
 class Mole(models.Model):
@@ -136,5 +105,11 @@ class Mole(models.Model):
 
     @property
     def anatomical_sites(self):
-        return list(
-            self.anatomical_site.get_ancestors()) + [self.anatomical_site]
+        try:
+            return get_anatomical_site_tree().get_path(
+                self.anatomical_site_id)
+        except KeyError:
+            # The site is created by another worker and the tree
+            # isn't reloaded yet
+            return list(self.anatomical_site.get_ancestors()) + \
+                [self.anatomical_site]
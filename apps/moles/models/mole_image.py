@@ -2,17 +2,65 @@ from decimal import Decimal
 
 from django.contrib.postgres.fields import JSONField
 from django.db import models, transaction
+from django.db.models import Case, Q, Value, When
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from versatileimagefield.fields import VersatileImageField
 
+from apps.main.models.mixins import RenditionsMixin
 from apps.main.storages import private_storage
 from .mole import Mole
 from .study import Study
 from .upload_paths import mole_image_photo_path
 
 
-class MoleImage(models.Model):
+# Conditions of the "needs attention" images repeat predicates of
+# the partial indexes (see migration 0016), keep them in sync
+PATH_DIAGNOSIS_REQUIRED = Q(biopsy=True, path_diagnosis__exact='')
+CLINICAL_DIAGNOSIS_REQUIRED = Q(clinical_diagnosis__exact='')
+APPROVE_REQUIRED = Q(approved=False)
+BIOPSY = Q(biopsy=True)
+
+
+class MoleImageQuerySet(models.QuerySet):
+    def path_diagnosis_required(self):
+        return self.filter(PATH_DIAGNOSIS_REQUIRED)
+
+    def clinical_diagnosis_required(self):
+        return self.filter(CLINICAL_DIAGNOSIS_REQUIRED)
+
+    def approve_required(self):
+        return self.filter(APPROVE_REQUIRED)
+
+    def prediction_pending(self):
+        return self.filter(prediction_pending=True)
+
+    def update_predictions(self, predictions):
+        """
+        Saves (prediction, probability) pairs by pk with one query,
+        like `bulk_update`. Other fields aren't touched
+        """
+        if not predictions:
+            return 0
+
+        def case(index, output_field):
+            return Case(
+                *[When(pk=pk, then=Value(values[index]))
+                  for pk, values in predictions.items()],
+                output_field=output_field)
+
+        return self.filter(pk__in=predictions).update(
+            prediction=case(0, models.CharField()),
+            prediction_accuracy=case(1, models.DecimalField(
+                max_digits=5, decimal_places=3)),
+            prediction_pending=False)
+
+
+class MoleImage(RenditionsMixin, models.Model):
+    # Fields which affect `PatientStudyStats` counters
+    STATS_FIELDS = ('mole', 'study', 'clinical_diagnosis', 'path_diagnosis',
+                    'biopsy', 'approved', )
+
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
 
@@ -66,6 +114,12 @@ class MoleImage(models.Model):
     approved = models.BooleanField(
         verbose_name='Photo is approved by coordinator',
         default=False)
+    renditions_ready = models.BooleanField(
+        verbose_name='Photo renditions are generated',
+        default=False)
+    prediction_pending = models.BooleanField(
+        verbose_name='Photo is waiting for the classifier',
+        default=True)
     age = models.IntegerField(
         verbose_name="Age when photo was taken",
         blank=True, null=True
@@ -75,22 +129,60 @@ class MoleImage(models.Model):
         verbose_name="Study",
         blank=True, null=True)
 
+    objects = MoleImageQuerySet.as_manager()
+
+    renditions_ready_field = 'renditions_ready'
+
     class Meta:
         verbose_name = 'Mole image'
         verbose_name_plural = 'Mole images'
         ordering = ('-date_created',)
+        indexes = [
+            # Paginated images of the mole and the last upload of the mole
+            models.Index(fields=['mole', '-date_created'],
+                         name='moles_image_mole_created_idx'),
+        ]
 
     def __str__(self):
         return str(self.mole)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(MoleImage, cls).from_db(db, field_names, values)
+        # The image may be moved to a mole of another patient
+        instance._loaded_mole_id = instance.__dict__.get('mole_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .patient_study_stats import refresh_patient_study_stats
+
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super(MoleImage, self).save(*args, **kwargs)
+
+            if update_fields is None or \
+                    set(update_fields) & set(self.STATS_FIELDS):
+                patient_pks = {self.mole.patient_id}
+                loaded_mole_id = getattr(self, '_loaded_mole_id', None)
+                if loaded_mole_id not in (None, self.mole_id):
+                    patient_pks.update(Mole.objects.filter(
+                        pk=loaded_mole_id).values_list(
+                        'patient_id', flat=True))
+
+                # The same order of the locks in concurrent refreshes
+                for patient_pk in sorted(patient_pks):
+                    refresh_patient_study_stats(patient_pk)
+
+        if update_fields is None or 'mole' in update_fields:
+            self._loaded_mole_id = self.mole_id
+
 
 @receiver(post_save, sender=MoleImage)
 def set_up(sender, instance, created, **kwargs):
     """
     Completes MoleImage instance after creation by calling delayed task
     """
-    from ..tasks import get_mole_image_prediction
+    from ..tasks import schedule_mole_image_prediction
 
-    if created:
-        transaction.on_commit(
-            lambda: get_mole_image_prediction.delay(pk=instance.pk))
+    if created and instance.prediction_pending:
+        transaction.on_commit(schedule_mole_image_prediction)
@@ -2,13 +2,14 @@ from django.db import models
 from versatileimagefield.fields import VersatileImageField
 
 from apps.main.storages import private_storage
-from apps.main.models.mixins import DelayedSaveFilesMixin
+from apps.main.models.mixins import DelayedSaveFilesMixin, RenditionsMixin
 from apps.accounts.models import Patient
 from .anatomical_site import AnatomicalSite
 from .upload_paths import distant_photo_path
 
 
-class PatientAnatomicalSite(DelayedSaveFilesMixin, models.Model):
+class PatientAnatomicalSite(RenditionsMixin, DelayedSaveFilesMixin,
+                            models.Model):
     patient = models.ForeignKey(
         Patient,
         on_delete=models.CASCADE,
@@ -28,6 +29,13 @@ class PatientAnatomicalSite(DelayedSaveFilesMixin, models.Model):
         blank=True,
         null=True
     )
+    renditions_ready = models.BooleanField(
+        verbose_name='Distant photo renditions are generated',
+        default=False
+    )
+
+    renditions_field = 'distant_photo'
+    renditions_ready_field = 'renditions_ready'
 
     class Meta:
         verbose_name = 'Patient anatomical site'
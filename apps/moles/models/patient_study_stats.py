@@ -0,0 +1,161 @@
+import threading
+
+from django.db import models, transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from apps.accounts.models import Patient
+from apps.main.models.aggregates import FilteredCount
+from .mole import Mole
+from .mole_image import (
+    MoleImage, PATH_DIAGNOSIS_REQUIRED, CLINICAL_DIAGNOSIS_REQUIRED,
+    APPROVE_REQUIRED, BIOPSY)
+from .study import Study
+
+
+# Pks of moles and patients being deleted by the current thread
+_deleting = threading.local()
+
+
+class PatientStudyStats(models.Model):
+    """
+    Denormalized mole images counters of the patient within the study
+    (or outside of any study if `study` is null).
+    Rows are kept up to date by `refresh_patient_study_stats`
+    """
+    COUNTERS = (
+        'moles_count',
+        'moles_images_count',
+        'moles_images_with_clinical_diagnosis_required',
+        'moles_images_with_pathological_diagnosis_required',
+        'moles_images_biopsy_count',
+        'moles_images_approve_required',
+    )
+
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Patient'
+    )
+    study = models.ForeignKey(
+        Study,
+        on_delete=models.CASCADE,
+        related_name='patients_stats',
+        blank=True, null=True,
+        verbose_name='Study'
+    )
+    last_upload = models.DateTimeField(
+        blank=True, null=True,
+        verbose_name='Last upload'
+    )
+    moles_count = models.PositiveIntegerField(default=0)
+    moles_images_count = models.PositiveIntegerField(default=0)
+    moles_images_with_clinical_diagnosis_required = \
+        models.PositiveIntegerField(default=0)
+    moles_images_with_pathological_diagnosis_required = \
+        models.PositiveIntegerField(default=0)
+    moles_images_biopsy_count = models.PositiveIntegerField(default=0)
+    moles_images_approve_required = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Patient study stats'
+        verbose_name_plural = 'Patient study stats'
+        unique_together = ('patient', 'study', )
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.patient, self.study)
+
+
+def get_patient_counters():
+    """
+    Aggregates of `PatientStudyStats.COUNTERS` over mole images
+    """
+    return {
+        'moles_count': Count('mole_id', distinct=True),
+        'moles_images_count': Count('*'),
+        'moles_images_with_clinical_diagnosis_required': FilteredCount(
+            '*', CLINICAL_DIAGNOSIS_REQUIRED),
+        'moles_images_with_pathological_diagnosis_required': FilteredCount(
+            '*', PATH_DIAGNOSIS_REQUIRED),
+        'moles_images_biopsy_count': FilteredCount('*', BIOPSY),
+        'moles_images_approve_required': FilteredCount(
+            '*', APPROVE_REQUIRED),
+    }
+
+
+def collect_patient_study_stats(images):
+    """
+    Aggregates mole images queryset into `PatientStudyStats` rows
+    """
+    rows = images.order_by().values('mole__patient_id', 'study_id').annotate(
+        last_upload=Max('date_created'),
+        **get_patient_counters())
+
+    return [
+        PatientStudyStats(
+            patient_id=row.pop('mole__patient_id'),
+            **row)
+        for row in rows
+    ]
+
+
+def refresh_patient_study_stats(patient_pk):
+    """
+    Recalculates all stats rows of the patient.
+    The patient row is locked to serialize concurrent refreshes
+    """
+    with transaction.atomic():
+        list(Patient.objects.select_for_update().filter(
+            pk=patient_pk).values_list('pk', flat=True))
+
+        PatientStudyStats.objects.filter(patient_id=patient_pk).delete()
+        PatientStudyStats.objects.bulk_create(collect_patient_study_stats(
+            MoleImage.objects.filter(mole__patient_id=patient_pk)))
+
+
+def rebuild_patient_study_stats():
+    with transaction.atomic():
+        PatientStudyStats.objects.all().delete()
+        PatientStudyStats.objects.bulk_create(
+            collect_patient_study_stats(MoleImage.objects.all()),
+            batch_size=1000)
+
+
+def get_deleting_pks(model):
+    return _deleting.__dict__.setdefault(model, set())
+
+
+@receiver(pre_delete, sender=Mole)
+@receiver(pre_delete, sender=Patient)
+def remember_deleting(sender, instance, **kwargs):
+    # The collector sends all pre_delete signals before deleting
+    # the dependent rows, so images see that their mole is deleted
+    get_deleting_pks(sender).add(instance.pk)
+
+
+@receiver(post_delete, sender=MoleImage)
+def refresh_stats_on_mole_image_delete(sender, instance, **kwargs):
+    # The mole is deleted too, stats will be refreshed by the mole handler
+    if instance.mole_id in get_deleting_pks(Mole):
+        return
+
+    patient_pk = Mole.objects.filter(pk=instance.mole_id).values_list(
+        'patient_id', flat=True).first()
+    if patient_pk is not None:
+        refresh_patient_study_stats(patient_pk)
+
+
+@receiver(post_delete, sender=Mole)
+def refresh_stats_on_mole_delete(sender, instance, **kwargs):
+    get_deleting_pks(Mole).discard(instance.pk)
+
+    # Stats of the deleted patient are deleted by the cascade
+    if instance.patient_id not in get_deleting_pks(Patient):
+        refresh_patient_study_stats(instance.patient_id)
+
+
+@receiver(post_delete, sender=Patient)
+def forget_deleted_patient(sender, instance, **kwargs):
+    get_deleting_pks(Patient).discard(instance.pk)
@@ -1,10 +1,8 @@
-from django.db import models
-from django.utils import timezone
+from django.db import models, transaction
 from django.core.validators import FileExtensionValidator
 from templated_mail.mail import BaseEmailMessage
 
 from apps.accounts.models import Coordinator
-from apps.accounts.models.participant import get_participant_doctor
 from apps.main.models.mixins.thumbnail import ThumbnailMixin
 from apps.main.storages import public_storage
 from apps.moles.models.upload_paths import study_consent_docs_path
@@ -39,24 +37,14 @@ class Study(models.Model):
         return self.title
 
     def invalidate_consents(self):
-        from apps.moles.tasks import send_doctor_consent_changed, \
-            send_participant_consent_changed
-
-        for study_to_patient in StudyToPatient.objects.filter(study=self):
-            if study_to_patient.patient_consent:
-                study_to_patient.patient_consent.date_expired = timezone.now()
-                study_to_patient.patient_consent.save()
-
-                participant = get_participant_doctor(study_to_patient.patient)
-                if participant:
-                    send_participant_consent_changed.apply_async(
-                        countdown=3,
-                        args=[self.pk, participant.pk])
-
-        for doctor_pk in self.doctors.all().values_list('pk', flat=True):
-            send_doctor_consent_changed.apply_async(
-                countdown=3,
-                args=[self.pk, doctor_pk])
+        """
+        Expires consents of the study patients and notifies participants
+        and doctors in the background. Changes during
+        `CONSENT_INVALIDATION_WINDOW` seconds are handled by one job
+        """
+        from apps.moles.tasks import schedule_consent_invalidation
+
+        transaction.on_commit(lambda: schedule_consent_invalidation(self.pk))
 
     class Meta:
         verbose_name = 'Study'
@@ -1,3 +1,6 @@
+import os
+import uuid
+
 from skin.utils import generate_filename
 
 
@@ -42,3 +45,12 @@ def study_consent_docs_path(instance, filename):
     return '/'.join([
         'study_consent_docs', new_filename
     ])
+
+
+def make_path_unique(path):
+    """
+    Adds random suffix to the file name. Files uploaded directly
+    to the storage can't be renamed on collision
+    """
+    root, ext = os.path.splitext(path)
+    return '{0}_{1}{2}'.format(root, uuid.uuid4().hex[:12], ext)
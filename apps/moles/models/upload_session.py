@@ -0,0 +1,170 @@
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from PIL import Image
+
+from apps.accounts.models import Doctor
+
+
+# Bytes read from the request at once, so memory doesn't depend
+# on the chunk size
+READ_SIZE = 64 * 1024
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+# Not completed or not used sessions are removed after this time
+UPLOAD_SESSION_TTL = timedelta(days=1)
+
+
+class ChunkSizeExceeded(Exception):
+    pass
+
+
+def verify_image(fd):
+    """
+    Returns True if the file is a valid image
+    """
+    try:
+        with Image.open(fd) as image:
+            image.verify()
+    except Exception:
+        return False
+
+    return True
+
+
+def get_upload_sessions_root():
+    return settings.UPLOAD_SESSIONS_ROOT or \
+        os.path.join(settings.MEDIA_ROOT, 'upload_sessions')
+
+
+class UploadSession(models.Model):
+    """
+    Resumable upload of a photo in chunks.
+    Chunks are written to a temporary file one after another, after
+    a failure the client continues from `offset`.
+    The completed session is passed instead of the photo to the
+    endpoints which create moles, mole images and distant photos
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name='Doctor'
+    )
+    file_name = models.CharField(
+        max_length=100,
+        verbose_name='File name'
+    )
+    size = models.PositiveIntegerField(
+        verbose_name='Size'
+    )
+    offset = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Received bytes'
+    )
+    is_completed = models.BooleanField(
+        default=False,
+        verbose_name='Is completed'
+    )
+    date_created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created on'
+    )
+
+    class Meta:
+        verbose_name = 'Upload session'
+        verbose_name_plural = 'Upload sessions'
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.doctor, self.file_name)
+
+    @property
+    def path(self):
+        return os.path.join(get_upload_sessions_root(), str(self.pk))
+
+    def receive_chunk(self, stream):
+        """
+        Reads the chunk from the stream into a separate part file and
+        returns its path and size. Nothing is locked meanwhile, so slow
+        uploads don't hold database connections
+        """
+        os.makedirs(get_upload_sessions_root(), exist_ok=True)
+
+        part_path = '{0}.{1}.part'.format(self.path, uuid.uuid4().hex)
+        remaining = self.size - self.offset
+        written = 0
+        try:
+            with open(part_path, 'wb') as fd:
+                while stream is not None:
+                    data = stream.read(READ_SIZE)
+                    if not data:
+                        break
+
+                    written += len(data)
+                    if written > remaining:
+                        raise ChunkSizeExceeded()
+
+                    fd.write(data)
+        except BaseException:
+            os.remove(part_path)
+            raise
+
+        return part_path, written
+
+    def append_chunk(self, part_path, size):
+        """
+        Appends the received chunk at the offset and advances the offset,
+        returns False if another chunk was appended since the session was
+        read. The row is locked by the conditional update only while
+        the local part file is copied. Bytes after the offset left by
+        a broken copy are overwritten
+        """
+        try:
+            with transaction.atomic():
+                updated = UploadSession.objects.filter(
+                    pk=self.pk, offset=self.offset, is_completed=False
+                ).update(offset=self.offset + size)
+                if not updated:
+                    return False
+
+                mode = 'r+b' if os.path.exists(self.path) else 'wb'
+                with open(self.path, mode) as fd, \
+                        open(part_path, 'rb') as part:
+                    fd.seek(self.offset)
+                    fd.truncate()
+                    shutil.copyfileobj(part, fd, READ_SIZE)
+        finally:
+            os.remove(part_path)
+
+        self.offset += size
+        return True
+
+    def is_valid_image(self):
+        with open(self.path, 'rb') as fd:
+            return verify_image(fd)
+
+    def open(self):
+        """
+        Returns the uploaded file, it's passed to a file field as
+        an uploaded photo
+        """
+        return File(open(self.path, 'rb'), name=self.file_name)
+
+
+@receiver(post_delete, sender=UploadSession)
+def remove_upload_session_file(sender, instance, **kwargs):
+    try:
+        os.remove(instance.path)
+    except FileNotFoundError:
+        pass
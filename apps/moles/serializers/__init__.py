@@ -1,11 +1,14 @@
 from .patient_anatomical_site import PatientAnatomicalSiteSerializer
-from .anatomical_site import AnatomicalSiteSerializer
+from .anatomical_site import (
+    AnatomicalSiteSerializer, AnatomicalSiteTreeSerializer)
 from .mole import (
     MoleListSerializer, MoleDetailSerializer, MoleCreateSerializer,
     MoleUpdateSerializer)
 from .mole_image import MoleImageSerializer, MoleImageListSerializer, \
-    MoleImageCreateSerializer, MoleImageUpdateSerializer
+    MoleImageCreateSerializer, MoleImageUpdateSerializer, \
+    MoleImagePresignSerializer, MoleImageRegisterSerializer
 from .study import StudyBaseSerializer, StudyLiteSerializer, \
     StudyListSerializer, ConsentDocSerializer
 from .study_invitation import StudyInvitationBaseSerializer, \
     StudyInvitationSerializer, StudyInvitationForDoctorSerializer
+from .upload_session import UploadSessionSerializer
@@ -7,3 +7,19 @@ class AnatomicalSiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = AnatomicalSite
         fields = ('pk', 'parent', 'name', 'slug',)
+
+
+class AnatomicalSiteTreeSerializer(AnatomicalSiteSerializer):
+    """
+    Serializes the subtree from `AnatomicalSiteTree` passed as `tree`
+    in the context
+    """
+    children = serializers.SerializerMethodField()
+
+    def get_children(self, obj):
+        return AnatomicalSiteTreeSerializer(
+            self.context['tree'].get_children(obj.slug),
+            many=True, context=self.context).data
+
+    class Meta(AnatomicalSiteSerializer.Meta):
+        fields = ('pk', 'name', 'slug', 'children',)
@@ -9,6 +9,7 @@ from ..models import Mole, MoleImage
 from .anatomical_site import AnatomicalSiteSerializer
 from .patient_anatomical_site import PatientAnatomicalSiteSerializer
 from .mole_image import MoleImageListSerializer
+from .upload_session import UploadSessionField, UploadSessionMixin
 from ..models.utils import validate_study_consent_for_patient
 
 
@@ -20,6 +21,23 @@ class MoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Mole
 
+    def get_fields(self):
+        fields = super(MoleSerializer, self).get_fields()
+
+        # Compact mode: clients resolve ancestors using the tree
+        # from `anatomical_site/tree/`
+        if 'anatomical_sites' in fields and self.is_compact():
+            fields.pop('anatomical_sites')
+            fields['anatomical_site'] = serializers.PrimaryKeyRelatedField(
+                read_only=True)
+
+        return fields
+
+    def is_compact(self):
+        request = self.context.get('request')
+        return request is not None and \
+            request.query_params.get('compact') in ('1', 'true')
+
 
 class MoleListSerializer(MoleSerializer):
     last_image = serializers.SerializerMethodField()
@@ -35,12 +53,19 @@ class MoleListSerializer(MoleSerializer):
         read_only=True)
 
     def get_last_image(self, obj):
-        study = self.context.get('study')
-        try:
-            image = obj.images.filter(study=study).latest('date_created')
-            return MoleImageListSerializer(image, context=self.context).data
-        except ObjectDoesNotExist:
+        # See `MoleQuerySet.prefetch_last_image`
+        if hasattr(obj, 'prefetched_last_images'):
+            image = next(iter(obj.prefetched_last_images), None)
+        else:
+            study = self.context.get('study')
+            try:
+                image = obj.images.filter(study=study).latest('date_created')
+            except ObjectDoesNotExist:
+                image = None
+
+        if image is None:
             return None
+        return MoleImageListSerializer(image, context=self.context).data
 
     class Meta(MoleSerializer.Meta):
         fields = ('pk', 'anatomical_sites', 'last_image', 'images_count',
@@ -87,9 +112,12 @@ def validate(self, data):
             "Distant photo anatomical site missmatch mole's anatomical site")
 
 
-class MoleCreateSerializer(MoleSerializer):
+class MoleCreateSerializer(UploadSessionMixin, MoleSerializer):
     photo = VersatileImageFieldSerializer(
-        sizes='main_set', required=True, write_only=True)
+        sizes='main_set', required=False, write_only=True)
+    photo_upload = UploadSessionField(
+        required=False,
+        write_only=True)
     age = serializers.IntegerField(
         required=False,
         allow_null=True)
@@ -100,8 +128,9 @@ class MoleCreateSerializer(MoleSerializer):
 
     class Meta(MoleSerializer.Meta):
         fields = ('anatomical_site', 'patient_anatomical_site',
-                  'position_info', 'photo', 'age', 'study')
+                  'position_info', 'photo', 'photo_upload', 'age', 'study')
 
+    upload_fields = ('photo', )
     validate_position_info = validate_position_info
     validate = validate
 
@@ -1,11 +1,19 @@
 import json
+
+from django.core import signing
+from django.db import transaction
 from rest_framework import serializers
 from versatileimagefield.serializers import VersatileImageFieldSerializer
 from apps.accounts.models import Coordinator
-from apps.moles.serializers.study import StudyLiteSerializer
+from apps.main.storages import private_storage
+from apps.moles.serializers.study import StudiesListSerializer, \
+    StudyLiteSerializer
 
-from ..models import MoleImage
+from ..models import Mole, MoleImage
+from ..models.upload_session import (
+    MAX_UPLOAD_SIZE, UPLOAD_SESSION_TTL, verify_image)
 from ..models.utils import validate_study_consent_for_patient
+from .upload_session import UploadSessionField, UploadSessionMixin
 
 
 class MoleImageSerializer(serializers.ModelSerializer):
@@ -15,11 +23,18 @@ class MoleImageSerializer(serializers.ModelSerializer):
         model = MoleImage
         fields = ('pk', 'date_created', 'date_modified', 'path_diagnosis',
                   'clinical_diagnosis', 'prediction', 'prediction_accuracy',
-                  'photo', 'biopsy', 'biopsy_data', 'approved', 'age', 'study')
+                  'prediction_pending', 'photo', 'renditions_ready', 'biopsy',
+                  'biopsy_data', 'approved', 'age', 'study')
         extra_kwargs = {
             'age': {
                 'read_only': True,
             },
+            'renditions_ready': {
+                'read_only': True,
+            },
+            'prediction_pending': {
+                'read_only': True,
+            },
         }
 
     def validate_biopsy_data(self, biopsy_data):
@@ -47,12 +62,21 @@ class MoleImageListSerializer(MoleImageSerializer):
     class Meta(MoleImageSerializer.Meta):
         fields = ('pk', 'date_created', 'date_modified', 'path_diagnosis',
                   'clinical_diagnosis', 'prediction', 'prediction_accuracy',
-                  'photo', 'biopsy', 'biopsy_data', 'approved', 'age', 'study')
+                  'prediction_pending', 'photo', 'renditions_ready', 'biopsy',
+                  'biopsy_data', 'approved', 'age', 'study')
+        list_serializer_class = StudiesListSerializer
+
 
+class MoleImageCreateSerializer(UploadSessionMixin, MoleImageSerializer):
+    photo = VersatileImageFieldSerializer(sizes='main_set', required=False)
+    photo_upload = UploadSessionField(
+        required=False,
+        write_only=True)
+
+    upload_fields = ('photo', )
 
-class MoleImageCreateSerializer(MoleImageSerializer):
     class Meta(MoleImageSerializer.Meta):
-        fields = ('pk', 'photo', 'age', 'study',)
+        fields = ('pk', 'photo', 'photo_upload', 'age', 'study',)
         extra_kwargs = {
             'age': {
                 'read_only': False,
@@ -64,3 +88,76 @@ class MoleImageUpdateSerializer(MoleImageSerializer):
     class Meta(MoleImageSerializer.Meta):
         fields = ('pk', 'path_diagnosis', 'clinical_diagnosis', 'biopsy',
                   'biopsy_data', 'approved', 'study',)
+
+
+MOLE_IMAGE_UPLOAD_TOKEN_SALT = 'mole_image_upload'
+
+
+class MoleImagePresignSerializer(serializers.Serializer):
+    file_name = serializers.CharField(max_length=100)
+
+
+class MoleImageRegisterSerializer(MoleImageSerializer):
+    """
+    Creates mole image for the photo uploaded directly to the storage,
+    `upload_token` is issued by `presign` action of the mole images
+    """
+    photo = VersatileImageFieldSerializer(sizes='main_set', read_only=True)
+    upload_token = serializers.CharField(write_only=True)
+
+    class Meta(MoleImageSerializer.Meta):
+        fields = ('pk', 'upload_token', 'photo', 'age', 'study',)
+        extra_kwargs = {
+            'age': {
+                'read_only': False,
+            },
+        }
+
+    def validate_upload_token(self, token):
+        try:
+            upload = signing.loads(
+                token, salt=MOLE_IMAGE_UPLOAD_TOKEN_SALT,
+                max_age=UPLOAD_SESSION_TTL)
+        except signing.BadSignature:
+            raise serializers.ValidationError('Invalid or expired token')
+
+        if str(upload['mole']) != str(self.context['view'].kwargs['mole_pk']):
+            raise serializers.ValidationError(
+                'Token is issued for another mole')
+        key = upload['key']
+        if not private_storage.exists(key):
+            raise serializers.ValidationError('Photo is not uploaded')
+        # The token can be used until it expires
+        if MoleImage.objects.filter(photo=key).exists():
+            raise serializers.ValidationError('Photo is already registered')
+
+        if private_storage.size(key) > MAX_UPLOAD_SIZE or \
+                not self.is_valid_image(key):
+            private_storage.delete(key)
+            raise serializers.ValidationError(
+                'Upload a valid image. The file you uploaded was either '
+                'not an image or a corrupted image.')
+
+        return key
+
+    def is_valid_image(self, key):
+        with private_storage.open(key) as fd:
+            return verify_image(fd)
+
+    def create(self, validated_data):
+        # The name of the existing file, so nothing is uploaded on save
+        key = validated_data.pop('upload_token')
+        validated_data['photo'] = key
+
+        with transaction.atomic():
+            # Tokens are issued for the mole, so its lock serializes
+            # concurrent registrations of the same photo
+            list(Mole.objects.select_for_update().filter(
+                pk=validated_data['mole'].pk).values_list('pk', flat=True))
+            if MoleImage.objects.filter(photo=key).exists():
+                raise serializers.ValidationError({
+                    'upload_token': ['Photo is already registered'],
+                })
+
+            return super(MoleImageRegisterSerializer, self).create(
+                validated_data)
@@ -2,17 +2,28 @@ from rest_framework import serializers
 from versatileimagefield.serializers import VersatileImageFieldSerializer
 
 from ..models import PatientAnatomicalSite
+from .upload_session import UploadSessionField, UploadSessionMixin
 
 
-class PatientAnatomicalSiteSerializer(serializers.ModelSerializer):
+class PatientAnatomicalSiteSerializer(UploadSessionMixin,
+                                      serializers.ModelSerializer):
     distant_photo = VersatileImageFieldSerializer(
-        sizes='main_set', required=True)
+        sizes='main_set', required=False)
+    distant_photo_upload = UploadSessionField(
+        required=False,
+        write_only=True)
+
+    upload_fields = ('distant_photo', )
 
     class Meta:
         model = PatientAnatomicalSite
-        fields = ('pk', 'patient', 'anatomical_site', 'distant_photo', )
+        fields = ('pk', 'patient', 'anatomical_site', 'distant_photo',
+                  'distant_photo_upload', 'renditions_ready', )
         extra_kwargs = {
             'patient': {
                 'read_only': True,
             },
+            'renditions_ready': {
+                'read_only': True,
+            },
         }
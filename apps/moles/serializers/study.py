@@ -1,3 +1,4 @@
+from django.db.models import Manager
 from rest_framework import serializers
 
 from apps.accounts.models import Doctor, DoctorToPatient
@@ -21,26 +22,111 @@ class StudyBaseSerializer(serializers.ModelSerializer):
         fields = ('pk', 'title', 'consent_docs')
 
 
+class PatientsConsentsLoader(object):
+    """
+    Request scoped loader of `patients_consents` in the DataLoader style.
+    Ids of the studies of a response are collected with `prime`,
+    consents of all collected studies are fetched with one query when
+    the first study is loaded. Serialized studies are kept here too,
+    so every study is serialized once per request
+    """
+    def __init__(self, doctor):
+        self.doctor = doctor
+        self.is_coordinator = None
+        self.pending = set()
+        self.consents = {}
+        self.representations = {}
+
+    @classmethod
+    def for_request(cls, request):
+        loader = getattr(request, '_patients_consents_loader', None)
+        if loader is None:
+            loader = cls(request.user.doctor_role)
+            request._patients_consents_loader = loader
+
+        return loader
+
+    def prime(self, study_pks):
+        self.pending.update(
+            pk for pk in study_pks
+            if pk is not None and pk not in self.consents)
+
+    def load(self, study_pk):
+        """
+        Returns consents of the doctor patients in the study by patient pk
+        """
+        if study_pk not in self.consents:
+            self.pending.add(study_pk)
+            self.fetch()
+
+        return self.consents[study_pk]
+
+    def fetch(self):
+        study_pks, self.pending = self.pending, set()
+        for study_pk in study_pks:
+            self.consents[study_pk] = {}
+
+        if self.is_coordinator is None:
+            self.is_coordinator = bool(is_coordinator(self.doctor))
+        if self.is_coordinator:
+            return
+
+        study_to_patients = StudyToPatient.objects.filter(
+            study_id__in=study_pks,
+            patient_id__in=DoctorToPatient.objects.filter(
+                doctor=self.doctor).values_list('patient_id', flat=True)
+        ).select_related('patient_consent')
+        for study_to_patient in study_to_patients:
+            self.consents[study_to_patient.study_id][
+                study_to_patient.patient_id] = \
+                study_to_patient.patient_consent
+
+
+class StudiesListSerializer(serializers.ListSerializer):
+    """
+    Primes `PatientsConsentsLoader` with studies of all items. Items are
+    studies or objects with the `study` foreign key
+    """
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+
+        request = self.context.get('request')
+        if request is not None:
+            PatientsConsentsLoader.for_request(request).prime(
+                item.pk if isinstance(item, Study) else item.study_id
+                for item in items)
+
+        return super(StudiesListSerializer, self).to_representation(items)
+
+
 class StudyLiteSerializer(serializers.ModelSerializer):
     patients_consents = serializers.SerializerMethodField()
 
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        if request is None:
+            return super(StudyLiteSerializer, self).to_representation(
+                instance)
+
+        representations = PatientsConsentsLoader.for_request(
+            request).representations
+        key = (type(self), instance.pk)
+        if key not in representations:
+            representations[key] = super(
+                StudyLiteSerializer, self).to_representation(instance)
+
+        return representations[key]
+
     def get_patients_consents(self, obj):
         from apps.accounts.serializers import PatientConsentSerializer
 
-        doctor = self.context['request'].user.doctor_role
-
-        if is_coordinator(doctor):
-            study_to_patients = []
-        else:
-            study_to_patients = StudyToPatient.objects.filter(
-                study=obj,
-                patient_id__in=DoctorToPatient.objects.filter(
-                    doctor=doctor).values_list('patient_id', flat=True))
+        consents = PatientsConsentsLoader.for_request(
+            self.context['request']).load(obj.pk)
 
         result = {}
-        for study_to_patient in study_to_patients:
-            result[study_to_patient.patient_id] = PatientConsentSerializer(
-                study_to_patient.patient_consent).data
+        for patient_pk, patient_consent in consents.items():
+            result[patient_pk] = PatientConsentSerializer(
+                patient_consent).data
 
         return result
 
@@ -48,6 +134,7 @@ class StudyLiteSerializer(serializers.ModelSerializer):
         model = Study
         fields = ('pk', 'title', 'consent_docs', 'author',
                   'patients_consents')
+        list_serializer_class = StudiesListSerializer
 
 
 class StudyListSerializer(StudyLiteSerializer):
@@ -57,6 +144,7 @@ class StudyListSerializer(StudyLiteSerializer):
     class Meta(StudyBaseSerializer.Meta):
         fields = ('pk', 'title', 'doctors', 'patients',
                   'consent_docs', 'patients_consents')
+        list_serializer_class = StudiesListSerializer
 
 
 class AddDoctorSerializer(serializers.Serializer):
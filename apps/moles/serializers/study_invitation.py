@@ -3,7 +3,7 @@ from rest_framework import serializers
 from apps.accounts.models import Doctor
 from apps.accounts.serializers import DoctorWithKeysSerializer, \
     DoctorKeySerializer
-from .study import StudyListSerializer
+from .study import StudiesListSerializer, StudyListSerializer
 from ..models import StudyInvitation
 
 
@@ -33,7 +33,7 @@ class StudyInvitationSerializer(StudyInvitationBaseSerializer):
     study = StudyListSerializer()
 
     class Meta(StudyInvitationBaseSerializer.Meta):
-        pass
+        list_serializer_class = StudiesListSerializer
 
 
 class StudyInvitationForDoctorSerializer(StudyInvitationSerializer):
@@ -0,0 +1,44 @@
+from rest_framework import serializers
+
+from apps.accounts.serializers import (
+    PatientSerializer, PatientConsentSerializer)
+from ..models import StudyToPatient
+from .mole import MoleSerializer
+from .mole_image import MoleImageSerializer
+
+
+class SyncPatientSerializer(PatientSerializer):
+    # Counters depend on the study and are calculated by clients
+    # from the synced moles and images
+    class Meta(PatientSerializer.Meta):
+        fields = ('pk', 'first_name', 'last_name', 'mrn',
+                  'date_of_birth', 'mrn_hash', 'valid_consent',
+                  'sex', 'race', 'photo', 'studies',
+                  'encrypted_key', 'doctors', )
+
+
+class SyncPatientConsentSerializer(PatientConsentSerializer):
+    class Meta(PatientConsentSerializer.Meta):
+        fields = ('pk', 'patient', 'date_created', 'date_expired',
+                  'signature', )
+
+
+class SyncMoleSerializer(MoleSerializer):
+    class Meta(MoleSerializer.Meta):
+        fields = ('pk', 'patient', 'anatomical_site', 'anatomical_sites',
+                  'patient_anatomical_site', 'position_info', )
+
+
+class SyncMoleImageSerializer(MoleImageSerializer):
+    class Meta(MoleImageSerializer.Meta):
+        fields = ('pk', 'mole', 'date_created', 'date_modified',
+                  'path_diagnosis', 'clinical_diagnosis', 'prediction',
+                  'prediction_accuracy', 'prediction_pending', 'photo',
+                  'renditions_ready', 'biopsy', 'biopsy_data', 'approved',
+                  'age', 'study', )
+
+
+class SyncStudyToPatientSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudyToPatient
+        fields = ('pk', 'study', 'patient', 'patient_consent', )
@@ -0,0 +1,79 @@
+import os
+
+from django.db import transaction
+from rest_framework import serializers
+
+from ..models import UploadSession
+from ..models.upload_session import MAX_UPLOAD_SIZE
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ('pk', 'file_name', 'size', 'offset', 'is_completed',)
+        read_only_fields = ('offset', 'is_completed',)
+
+    def validate_file_name(self, file_name):
+        return os.path.basename(file_name)
+
+    def validate_size(self, size):
+        if size > MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                'Ensure the file size is at most {0} bytes'.format(
+                    MAX_UPLOAD_SIZE))
+        return size
+
+
+class UploadSessionField(serializers.PrimaryKeyRelatedField):
+    """
+    Completed upload session of the current doctor
+    """
+    def get_queryset(self):
+        return UploadSession.objects.filter(
+            doctor_id=self.context['request'].user.pk,
+            is_completed=True)
+
+
+class UploadSessionMixin(object):
+    """
+    Allows to pass a completed upload session in `<field>_upload`
+    instead of the file for every field from `upload_fields`.
+    The sessions are removed after the instance is saved and committed
+    """
+    upload_fields = ()
+
+    def to_internal_value(self, data):
+        result = super(UploadSessionMixin, self).to_internal_value(data)
+
+        for field_name in self.upload_fields:
+            if not result.get(field_name) and \
+                    not result.get('{0}_upload'.format(field_name)):
+                raise serializers.ValidationError({
+                    field_name: [self.fields[field_name].error_messages[
+                        'required']],
+                })
+
+        return result
+
+    def save(self, **kwargs):
+        uploads = []
+        for field_name in self.upload_fields:
+            upload = self.validated_data.pop(
+                '{0}_upload'.format(field_name), None)
+            if upload is not None:
+                kwargs[field_name] = upload.open()
+                uploads.append(upload)
+
+        try:
+            instance = super(UploadSessionMixin, self).save(**kwargs)
+        finally:
+            for field_name in self.upload_fields:
+                if field_name in kwargs:
+                    kwargs[field_name].close()
+
+        # Sessions are kept if the instance isn't saved, so the client
+        # can retry with them
+        for upload in uploads:
+            transaction.on_commit(upload.delete)
+
+        return instance
@@ -1,28 +1,12 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from versatileimagefield.image_warmer import VersatileImageFieldWarmer
 
-from .models import MoleImage, PatientAnatomicalSite, Study
-
-
-@receiver(post_save, sender=MoleImage)
-def warm_mole_image_photo(sender, instance, **kwargs):
-    """Prepare photos"""
-    if instance.photo:
-        VersatileImageFieldWarmer(
-            instance_or_queryset=instance,
-            rendition_key_set='main_set',
-            image_attr='photo').warm()
-
-
-@receiver(post_save, sender=PatientAnatomicalSite)
-def warm_patient_anatomical_site_distant_photo(sender, instance, **kwargs):
-    """Prepare photos"""
-    if instance.distant_photo:
-        VersatileImageFieldWarmer(
-            instance_or_queryset=instance,
-            rendition_key_set='main_set',
-            image_attr='distant_photo').warm()
+from apps.accounts.models import Patient, PatientConsent, DoctorToPatient
+from apps.accounts.versions import bump_global_version
+from apps.main.models.change_log import ChangeLogAction, log_change
+from .models import (
+    AnatomicalSite, Mole, MoleImage, PatientAnatomicalSite, Study,
+    StudyToPatient, ConsentDoc, StudyInvitation)
 
 
 def consent_docs_changes(sender, instance, action, **kwargs):
@@ -31,3 +15,70 @@ def consent_docs_changes(sender, instance, action, **kwargs):
 
 
 m2m_changed.connect(consent_docs_changes, sender=Study.consent_docs.through)
+
+
+def get_mole_image_patient_pk(instance):
+    return Mole.objects.filter(pk=instance.mole_id).values_list(
+        'patient_id', flat=True).first()
+
+
+# Models which are delivered by the sync endpoint and the way to find
+# the patient of their instance
+SYNC_MODELS = {
+    Patient: lambda instance: instance.pk,
+    PatientConsent: lambda instance: instance.patient_id,
+    PatientAnatomicalSite: lambda instance: instance.patient_id,
+    Mole: lambda instance: instance.patient_id,
+    MoleImage: get_mole_image_patient_pk,
+    StudyToPatient: lambda instance: instance.patient_id,
+}
+
+
+def log_sync_model_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    log_change(
+        sender, instance.pk, SYNC_MODELS[sender](instance),
+        ChangeLogAction.CREATED if created else ChangeLogAction.UPDATED)
+
+
+def log_sync_model_delete(sender, instance, **kwargs):
+    patient_pk = SYNC_MODELS[sender](instance)
+
+    # The parent is deleted too, its tombstone is enough for clients
+    if patient_pk is not None:
+        log_change(sender, instance.pk, patient_pk, ChangeLogAction.DELETED)
+
+
+for model in SYNC_MODELS:
+    post_save.connect(log_sync_model_save, sender=model)
+    post_delete.connect(log_sync_model_delete, sender=model)
+
+
+@receiver(post_save, sender=DoctorToPatient)
+@receiver(post_delete, sender=DoctorToPatient)
+def log_patient_doctors_change(sender, instance, raw=False, **kwargs):
+    """Doctors and encryption keys are the part of the patient"""
+    if raw:
+        return
+
+    log_change(Patient, instance.patient_id, instance.patient_id,
+               ChangeLogAction.UPDATED)
+
+
+# Study members see all patients of the study, not only visible ones
+@receiver(post_save, sender=Study)
+@receiver(post_save, sender=StudyToPatient)
+@receiver(post_save, sender=ConsentDoc)
+@receiver(post_save, sender=StudyInvitation)
+@receiver(post_save, sender=AnatomicalSite)
+@receiver(post_delete, sender=Study)
+@receiver(post_delete, sender=StudyToPatient)
+@receiver(post_delete, sender=ConsentDoc)
+@receiver(post_delete, sender=StudyInvitation)
+@receiver(post_delete, sender=AnatomicalSite)
+@receiver(m2m_changed, sender=Study.doctors.through)
+@receiver(m2m_changed, sender=Study.consent_docs.through)
+def bump_global_version_on_change(sender, **kwargs):
+    bump_global_version()
@@ -1,37 +1,120 @@
-import requests
+from datetime import timedelta
 
 from celery import shared_task
-from decimal import Decimal
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from apps.accounts.models import Doctor
-from .models import MoleImage, Study
+from apps.accounts.models import Doctor, DoctorToPatient, PatientConsent
+from apps.accounts.versions import bump_patient_viewers_versions
+from apps.main.mail import (
+    deliver_rendered_email, render_email, send_rendered_email)
+from apps.main.models import Job
+from apps.main.models.change_log import ChangeLogAction, log_changes
+from .classifier import ClassifierError, get_classifier
+from .models import MoleImage, Study, StudyToPatient
+from .models.moles_mailer import AddParticipantNotification
 from .models.study import ParticipantNotificationDocConsentUpdate, \
     DoctorNotificationDocConsentUpdate
 
 
+PREDICTION_BATCH_KEY = 'moles:prediction_batch_scheduled'
+# Images which aren't predicted during this time are not sent anymore
+PREDICTION_PENDING_TTL = timedelta(days=1)
+CONSENT_INVALIDATION_KEY = 'moles:consent_invalidation_scheduled:{0}'
+# Recipients of consent change notifications per task
+NOTIFICATIONS_CHUNK_SIZE = 100
+
+
 class GetPredictionError(Exception):
     pass
 
 
+def schedule_mole_image_prediction():
+    """
+    Schedules one `predict_pending_mole_images` for all images
+    created during the batch window
+    """
+    window = settings.MOLE_CLASSIFIER_BATCH_WINDOW
+    # The key outlives the window in case the task is lost
+    if cache.add(PREDICTION_BATCH_KEY, True, window * 10):
+        predict_pending_mole_images.apply_async(countdown=window)
+
+
+def save_predictions(mole_images, predictions):
+    """
+    Saves predictions with one query and returns pks of images
+    the classifier failed on. Failed images aren't sent again
+    """
+    succeeded = {}
+    failed = []
+    for mole_image in mole_images:
+        prediction = predictions.get(mole_image.pk)
+        if prediction is None or not prediction.is_success:
+            failed.append(mole_image.pk)
+        else:
+            succeeded[mole_image.pk] = (
+                prediction.prediction, prediction.probability)
+
+    MoleImage.objects.update_predictions(succeeded)
+    MoleImage.objects.filter(pk__in=failed).update(prediction_pending=False)
+    return failed
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def predict_pending_mole_images(self):
+    # Images created from now on schedule the next batch
+    cache.delete(PREDICTION_BATCH_KEY)
+
+    classifier = get_classifier()
+    min_date_created = timezone.now() - PREDICTION_PENDING_TTL
+    pending = MoleImage.objects.prediction_pending().filter(
+        date_created__gte=min_date_created)
+    # Expired images and images without photo are never sent
+    MoleImage.objects.prediction_pending().filter(
+        Q(photo='') | Q(photo__isnull=True) |
+        Q(date_created__lt=min_date_created)
+    ).update(prediction_pending=False)
+
+    failed = []
+    while True:
+        mole_images = list(
+            pending.order_by('date_created')[
+                :settings.MOLE_CLASSIFIER_BATCH_SIZE])
+        if not mole_images:
+            break
+
+        try:
+            predictions = classifier.predict_many(mole_images)
+        except ClassifierError as e:
+            # Pending images stay in the queue for the retry
+            raise self.retry(exc=e)
+
+        failed += save_predictions(mole_images, predictions)
+
+    if failed:
+        raise GetPredictionError(failed)
+
+
 @shared_task
 def get_mole_image_prediction(pk):
+    """
+    Predicts the single image, it's used by tasks queued
+    before `predict_pending_mole_images`
+    """
     mole_image = MoleImage.objects.get(pk=pk)
 
-    payload = {
-        'image_url': mole_image.photo.url,
-    }
-    url = 'http://52.36.205.204/mole_classifier_url'
-    r = requests.post(url, json=payload)
+    try:
+        predictions = get_classifier().predict_many([mole_image])
+    except ClassifierError as e:
+        raise GetPredictionError(e)
 
-    if r.json()['status'] == 'success':
-        mole_image.prediction = r.json()['prediction']
-        mole_image.prediction_accuracy = Decimal(r.json()['probability'])
-        mole_image.save()
-    else:
-        raise GetPredictionError(r)
+    failed = save_predictions([mole_image], predictions)
+    if failed:
+        raise GetPredictionError(failed)
 
 
 def get_study_context(study):
@@ -43,13 +126,12 @@ def get_study_context(study):
     }
 
 
-@shared_task
-def send_participant_consent_changed(study_pk, participant_pk):
-    study = Study.objects.get(pk=study_pk)
-    participant = Doctor.objects.get(pk=participant_pk)
-
+def get_consent_docs_urls(study):
     consent_docs_urls = []
     for doc in study.consent_docs.all():
+        if not doc.file:
+            continue
+
         url = doc.file.url
         if not url.startswith('http'):  # pragma: no cover
             # no cover, because we don't use S3 in tests, and aways true here
@@ -59,18 +141,133 @@ def send_participant_consent_changed(study_pk, participant_pk):
                 url)
         consent_docs_urls.append(url)
 
-    context = get_study_context(study)
-    context['consent_docs_urls'] = consent_docs_urls
+    return consent_docs_urls
+
 
-    ParticipantNotificationDocConsentUpdate(
-        context=context).send([participant.email])
+def chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def schedule_consent_invalidation(study_pk):
+    """
+    Schedules one `invalidate_study_consents` for all changes of the
+    study consent docs during the debounce window.
+    Returns the job or None if the change joined the scheduled job
+    """
+    window = settings.CONSENT_INVALIDATION_WINDOW
+    # The key outlives the window in case the task is lost
+    if not cache.add(CONSENT_INVALIDATION_KEY.format(study_pk), True,
+                     window * 10):
+        return None
+
+    job = Job.objects.create(name='invalidate_consents')
+    invalidate_study_consents.apply_async(
+        args=[study_pk, str(job.pk)], countdown=window)
+    return job
 
 
 @shared_task
-def send_doctor_consent_changed(study_pk, doctor_pk):
+def invalidate_study_consents(study_pk, job_pk):
+    """
+    Expires consents of the study patients with one update and fans
+    out notifications in chunks, see `Study.invalidate_consents`.
+    Every email template is rendered once
+    """
+    # Changes from now on schedule the next job
+    cache.delete(CONSENT_INVALIDATION_KEY.format(study_pk))
+    job = Job.objects.get(pk=job_pk)
+
+    try:
+        with transaction.atomic():
+            study = Study.objects.select_related(
+                'author__doctor_ptr').get(pk=study_pk)
+            study_to_patients = StudyToPatient.objects.filter(
+                study=study, patient_consent__isnull=False)
+            consents = PatientConsent.objects.filter(
+                pk__in=study_to_patients.values('patient_consent_id'))
+            changed = list(consents.values_list('pk', 'patient_id'))
+            consents.update(date_expired=timezone.now())
+
+            log_changes(PatientConsent, changed, ChangeLogAction.UPDATED)
+            bump_patient_viewers_versions(
+                {patient_pk for _, patient_pk in changed})
+
+            participant_pks = list(DoctorToPatient.objects.filter(
+                patient__in=study_to_patients.values('patient_id'),
+                doctor__participant_role__isnull=False,
+            ).values_list('doctor_id', flat=True).distinct())
+            doctor_pks = list(Study.doctors.through.objects.filter(
+                study=study).values_list('doctor_id', flat=True))
+
+            context = get_study_context(study)
+            participant_email = render_email(
+                ParticipantNotificationDocConsentUpdate,
+                dict(context, consent_docs_urls=get_consent_docs_urls(study))
+            ) if participant_pks else None
+            doctor_email = render_email(
+                DoctorNotificationDocConsentUpdate, context,
+                personal_fields=['user_full_name'])
+
+            job.start(len(participant_pks) + len(doctor_pks),
+                      result={'consents': len(changed)})
+
+            def fan_out():
+                size = NOTIFICATIONS_CHUNK_SIZE
+                for pks in chunks(participant_pks, size):
+                    send_consent_changed.delay(participant_email, pks, job_pk)
+                for pks in chunks(doctor_pks, size):
+                    send_consent_changed.delay(doctor_email, pks, job_pk)
+
+            transaction.on_commit(fan_out)
+    except Exception as e:
+        job.fail(e)
+        raise
+
+
+@shared_task
+def send_consent_changed(rendered_email, doctor_pks, job_pk=None):
+    """
+    Sends the email rendered by `invalidate_study_consents` to the doctors
+    over one connection
+    """
+    doctors = Doctor.objects.filter(pk__in=doctor_pks)
+    send_rendered_email(rendered_email, [
+        (doctor.email, {'user_full_name': doctor.get_full_name()})
+        for doctor in doctors
+    ])
+
+    if job_pk:
+        Job(pk=job_pk).advance(len(doctor_pks))
+
+
+@shared_task
+def send_study_invitations(study_pk, emails, job_pk):
+    """
+    Delivers invitations created by `StudyViewSet.add_doctor`,
+    results by email are saved to the job
+    """
     study = Study.objects.get(pk=study_pk)
-    doctor = Doctor.objects.get(pk=doctor_pk)
+    job = Job.objects.get(pk=job_pk)
+    rendered_email = render_email(AddParticipantNotification, {
+        'study_id': study.pk,
+        'study_title': study.title,
+    })
+
+    job.start(len(emails), result={'delivered': [], 'failed': {}})
+    result = job.result
+    try:
+        for chunk in chunks(emails, NOTIFICATIONS_CHUNK_SIZE):
+            errors = deliver_rendered_email(
+                rendered_email, [(email, {}) for email in chunk])
+            for email, error in errors.items():
+                if error is None:
+                    result['delivered'].append(email)
+                else:
+                    result['failed'][email] = error
 
-    context = get_study_context(study)
-    context.update({'user_full_name': doctor.get_full_name()})
-    DoctorNotificationDocConsentUpdate(context=context).send([doctor.email])
+            job.update_result(result)
+            job.advance(len(chunk))
+    except Exception as e:
+        job.fail(e)
+        raise
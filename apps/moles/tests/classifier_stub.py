@@ -0,0 +1,76 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.test import override_settings
+
+
+class ClassifierStubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers['Content-Length'])
+        payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        server.requests.append((self.path, payload))
+
+        if server.failures:
+            server.failures -= 1
+            self.respond(503, {})
+        elif self.path == '/batch':
+            self.respond(200, {
+                'status': 'success',
+                'results': [
+                    dict(server.result, id=image['id'])
+                    for image in payload['images']
+                ],
+            })
+        else:
+            self.respond(200, server.result)
+
+    def respond(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ClassifierStubMixin(object):
+    """
+    Runs the local mole classifier for every test.
+    `self.classifier.requests` are received (path, payload) pairs,
+    `self.classifier.failures` is the number of next requests
+    answered with 503
+    """
+    classifier_result = {
+        'status': 'success',
+        'probability': 0.567,
+        'prediction': 'Seems benign',
+    }
+    classifier_batch = False
+
+    def setUp(self):
+        super(ClassifierStubMixin, self).setUp()
+
+        self.classifier = HTTPServer(('127.0.0.1', 0), ClassifierStubHandler)
+        self.classifier.requests = []
+        self.classifier.failures = 0
+        self.classifier.result = dict(self.classifier_result)
+
+        thread = threading.Thread(target=self.classifier.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.classifier.server_close)
+        self.addCleanup(self.classifier.shutdown)
+
+        url = 'http://127.0.0.1:{0}'.format(self.classifier.server_port)
+        classifier_settings = override_settings(
+            MOLE_CLASSIFIER_URL=url + '/predict',
+            MOLE_CLASSIFIER_BATCH_URL=(
+                url + '/batch' if self.classifier_batch else None),
+            MOLE_CLASSIFIER_BACKOFF_FACTOR=0)
+        classifier_settings.enable()
+        self.addCleanup(classifier_settings.disable)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import AnatomicalSite
+from ..factories import MoleImageFactory
+from ..models import AnatomicalSite, PatientStudyStats
 from ..management.commands.initialize_anatomical_sites import ANATOMICAL_SITES
 
 
@@ -13,3 +16,19 @@ class CommandsTest(TestCase):
         for name, children in ANATOMICAL_SITES:
             asite = AnatomicalSite.objects.get(name=name)
             self.assertEqual(asite.children.count(), len(children))
+
+    def test_rebuild_patient_study_stats(self):
+        mole_image = MoleImageFactory.create(biopsy=True)
+        MoleImageFactory.create(mole=mole_image.mole)
+        PatientStudyStats.objects.all().delete()
+
+        call_command('rebuild_patient_study_stats', stdout=StringIO())
+
+        stats = PatientStudyStats.objects.get()
+        self.assertEqual(stats.patient_id, mole_image.mole.patient_id)
+        self.assertIsNone(stats.study_id)
+        self.assertEqual(stats.moles_count, 1)
+        self.assertEqual(stats.moles_images_count, 2)
+        self.assertEqual(stats.moles_images_biopsy_count, 1)
+        self.assertEqual(
+            stats.moles_images_with_pathological_diagnosis_required, 1)
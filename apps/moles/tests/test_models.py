@@ -1,32 +1,83 @@
 from datetime import timedelta
+from decimal import Decimal
 
+from django.core import mail
+from django.db import connection
 from django.test import TestCase, TransactionTestCase, mock
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.accounts.factories import DoctorFactory, PatientFactory, \
     PatientConsentFactory, CoordinatorFactory, ParticipantFactory
-from apps.accounts.models import DoctorToPatient
+from apps.accounts.models import DoctorToPatient, Patient, PatientConsent
+from apps.main.models import ChangeLog, ChangeLogAction, Job, JobStatus
 from apps.main.tests import patch
 from apps.main.tests.mixins import FileTestMixin
 from apps.moles.factories.study import StudyFactory, ConsentDocFactory
-from apps.moles.models import StudyToPatient
-from ..factories import MoleImageFactory
-
-
-class MoleImageTest(FileTestMixin, TransactionTestCase):
-    @patch('apps.moles.tasks.requests', new_callable=mock.MagicMock)
-    def test_set_up(self, mock_requests):
-        post_mock = mock.MagicMock()
-        post_mock.json.return_value = {
-            'status': 'success',
-            'probability': 0.567,
-            'prediction': 'Seems benign',
-        }
-        mock_requests.post.return_value = post_mock
+from apps.moles.models import (
+    Mole, MoleImage, StudyToPatient, PatientStudyStats)
+from ..factories import (
+    AnatomicalSiteFactory, MoleImageFactory, MoleFactory)
+from ..models.anatomical_site import get_anatomical_site_tree
+from .classifier_stub import ClassifierStubMixin
+
+
+class MoleImageTest(ClassifierStubMixin, FileTestMixin, TransactionTestCase):
+    def test_set_up(self):
         with self.fake_media():
             MoleImageFactory.create(photo=self.get_sample_image_file())
 
-        self.assertTrue(mock_requests.post.called)
+        self.assertEqual(len(self.classifier.requests), 1)
+
+    def test_renditions_ready_after_commit(self):
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+
+            mole_image.refresh_from_db()
+            self.assertTrue(mole_image.renditions_ready)
+
+    def test_update_predictions(self):
+        with self.fake_media():
+            first_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+            second_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+        MoleImage.objects.update(prediction_pending=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            MoleImage.objects.update_predictions({
+                first_image.pk: ('First', Decimal('0.1')),
+                second_image.pk: ('Second', Decimal('0.25')),
+            })
+        self.assertEqual(len(queries), 1)
+
+        first_image.refresh_from_db()
+        second_image.refresh_from_db()
+        self.assertEqual(first_image.prediction, 'First')
+        self.assertEqual(first_image.prediction_accuracy, Decimal('0.1'))
+        self.assertEqual(second_image.prediction, 'Second')
+        self.assertEqual(second_image.prediction_accuracy, Decimal('0.25'))
+        self.assertFalse(first_image.prediction_pending)
+        self.assertFalse(second_image.prediction_pending)
+
+    @patch('apps.main.tasks.warm_renditions', new_callable=mock.MagicMock)
+    def test_renditions_only_for_changed_photo(self, mock_warm_renditions):
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+            self.assertEqual(mock_warm_renditions.delay.call_count, 1)
+
+            mole_image = MoleImage.objects.get(pk=mole_image.pk)
+            mole_image.clinical_diagnosis = 'benign'
+            mole_image.save()
+            self.assertEqual(mock_warm_renditions.delay.call_count, 1)
+
+            mole_image.photo = self.get_sample_image_file()
+            mole_image.save()
+            self.assertEqual(mock_warm_renditions.delay.call_count, 2)
+            self.assertFalse(
+                MoleImage.objects.get(pk=mole_image.pk).renditions_ready)
 
 
 class StudyTest(FileTestMixin, TestCase):
@@ -58,11 +109,16 @@ class StudyTest(FileTestMixin, TestCase):
         self.assertEqual(self.study.title, 'Changed name')
         self.assertFalse(mock_invalidate_consents.called)
 
-    @patch('apps.moles.models.study.DoctorNotificationDocConsentUpdate.send')
-    @patch('apps.moles.models.study.ParticipantNotificationDocConsentUpdate.send')
-    def test_update_consent_docs(self,
-                                 mock_participant_notification,
-                                 mock_doc_notification):
+    def get_doctor_emails(self):
+        return [message for message in mail.outbox
+                if message.body.startswith('Hello,')]
+
+    def get_participant_emails(self):
+        return [message for message in mail.outbox
+                if not message.body.startswith('Hello,')]
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_update_consent_docs(self, mock_on_commit):
         self.assertTrue(self.study_to_patient.patient_consent.is_valid())
 
         # Make out doctor participant (self.doctor in doctors and in patients)
@@ -81,14 +137,15 @@ class StudyTest(FileTestMixin, TestCase):
             self.study_to_patient.patient_consent.refresh_from_db()
             self.assertFalse(self.study_to_patient.patient_consent.is_valid())
 
-        self.assertTrue(mock_doc_notification.called)
-        self.assertTrue(mock_participant_notification.called)
+        doctor_emails = self.get_doctor_emails()
+        self.assertEqual(len(doctor_emails), 1)
+        self.assertEqual(doctor_emails[0].to, [self.doctor.email])
+        self.assertIn(self.doctor.get_full_name(), doctor_emails[0].body)
+        self.assertNotIn('\x00', doctor_emails[0].body)
+        self.assertEqual(len(self.get_participant_emails()), 1)
 
-    @patch('apps.moles.models.study.DoctorNotificationDocConsentUpdate.send')
-    @patch('apps.moles.models.study.ParticipantNotificationDocConsentUpdate.send')
-    def test_update_consent_docs_without_consent(self,
-                                                 mock_participant_notification,
-                                                 mock_doc_notification):
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_update_consent_docs_without_consent(self, mock_on_commit):
         self.assertTrue(self.study_to_patient.patient_consent.is_valid())
 
         self.study_to_patient.patient_consent = None
@@ -101,20 +158,193 @@ class StudyTest(FileTestMixin, TestCase):
         self.study.consent_docs.add(new_doc)
         self.study.save()
 
-        self.assertTrue(mock_doc_notification.called)
-        self.assertFalse(mock_participant_notification.called)
+        self.assertEqual(len(self.get_doctor_emails()), 1)
+        self.assertEqual(len(self.get_participant_emails()), 0)
 
-    @patch('apps.moles.models.study.DoctorNotificationDocConsentUpdate.send')
-    @patch('apps.moles.models.study.ParticipantNotificationDocConsentUpdate.send')
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
     def test_update_consent_docs_without_participant_doctor(
-            self,
-            mock_participant_notification,
-            mock_doc_notification):
+            self, mock_on_commit):
         self.assertTrue(self.study_to_patient.patient_consent.is_valid())
 
         new_doc = ConsentDocFactory.create()
         self.study.consent_docs.add(new_doc)
         self.study.save()
 
-        self.assertTrue(mock_doc_notification.called)
-        self.assertFalse(mock_participant_notification.called)
+        self.assertEqual(len(self.get_doctor_emails()), 1)
+        self.assertEqual(len(self.get_participant_emails()), 0)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_invalidate_consents_job(self, mock_on_commit):
+        ParticipantFactory.create(doctor_ptr=self.doctor)
+        for _ in range(3):
+            patient = PatientFactory.create()
+            DoctorToPatient.objects.create(doctor=self.doctor, patient=patient)
+            StudyToPatient.objects.create(
+                study=self.study,
+                patient=patient,
+                patient_consent=PatientConsentFactory.create(patient=patient))
+        # Only changes of the job are checked
+        ChangeLog.objects.all().delete()
+
+        self.study.invalidate_consents()
+
+        job = Job.objects.get(name='invalidate_consents')
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {'consents': 4})
+        # The participant of all patients and the study doctor
+        self.assertEqual(job.total, 2)
+        self.assertEqual(job.progress, 2)
+        self.assertEqual(len(self.get_participant_emails()), 1)
+        self.assertEqual(len(self.get_doctor_emails()), 1)
+        self.assertFalse(PatientConsent.objects.valid().exists())
+        self.assertEqual(
+            ChangeLog.objects.filter(
+                model='accounts.patientconsent',
+                action=ChangeLogAction.UPDATED).count(),
+            4)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    @patch('apps.moles.tasks.invalidate_study_consents',
+           new_callable=mock.MagicMock)
+    def test_consent_docs_changes_are_coalesced(
+            self, mock_invalidate_study_consents, mock_on_commit):
+        first_doc = ConsentDocFactory.create()
+        second_doc = ConsentDocFactory.create()
+
+        self.study.consent_docs.add(first_doc)
+        self.study.consent_docs.set([second_doc])
+        self.study.consent_docs.clear()
+
+        self.assertEqual(
+            mock_invalidate_study_consents.apply_async.call_count, 1)
+        self.assertEqual(
+            Job.objects.filter(name='invalidate_consents').count(), 1)
+
+
+class PatientStudyStatsTest(TestCase):
+    def setUp(self):
+        self.mole = MoleFactory.create()
+        self.patient = self.mole.patient
+        self.study = StudyFactory.create()
+
+    def get_stats(self, study=None):
+        return PatientStudyStats.objects.get(patient=self.patient, study=study)
+
+    def test_stats_follow_mole_image_changes(self):
+        mole_image = MoleImageFactory.create(mole=self.mole)
+        MoleImageFactory.create(mole=self.mole, study=self.study)
+
+        stats = self.get_stats()
+        self.assertEqual(stats.moles_count, 1)
+        self.assertEqual(stats.moles_images_count, 1)
+        self.assertEqual(stats.moles_images_approve_required, 1)
+        self.assertEqual(
+            stats.moles_images_with_clinical_diagnosis_required, 1)
+        self.assertEqual(self.get_stats(self.study).moles_images_count, 1)
+
+        mole_image.approved = True
+        mole_image.clinical_diagnosis = 'benign'
+        mole_image.save()
+
+        stats = self.get_stats()
+        self.assertEqual(stats.moles_images_approve_required, 0)
+        self.assertEqual(
+            stats.moles_images_with_clinical_diagnosis_required, 0)
+
+        mole_image.study = self.study
+        mole_image.save()
+
+        self.assertFalse(PatientStudyStats.objects.filter(
+            patient=self.patient, study__isnull=True).exists())
+        self.assertEqual(self.get_stats(self.study).moles_images_count, 2)
+
+    def test_stats_follow_deletion(self):
+        mole_image = MoleImageFactory.create(mole=self.mole)
+        MoleImageFactory.create(mole=self.mole)
+
+        mole_image.delete()
+        self.assertEqual(self.get_stats().moles_images_count, 1)
+
+        self.mole.delete()
+        self.assertFalse(
+            PatientStudyStats.objects.filter(patient=self.patient).exists())
+
+    def test_mole_deletion_refreshes_stats_once(self):
+        for _ in range(3):
+            MoleImageFactory.create(mole=self.mole)
+
+        with patch('apps.moles.models.patient_study_stats.'
+                   'refresh_patient_study_stats') as mock_refresh:
+            self.mole.delete()
+        mock_refresh.assert_called_once_with(self.patient.pk)
+
+    def test_patient_deletion_doesnt_refresh_stats(self):
+        MoleImageFactory.create(mole=self.mole)
+
+        with patch('apps.moles.models.patient_study_stats.'
+                   'refresh_patient_study_stats') as mock_refresh:
+            self.patient.delete()
+        self.assertFalse(mock_refresh.called)
+        self.assertFalse(
+            PatientStudyStats.objects.filter(patient=self.patient).exists())
+
+    def test_stats_follow_mole_image_move_to_another_patient(self):
+        mole_image = MoleImageFactory.create(mole=self.mole)
+        another_mole = MoleFactory.create()
+
+        mole_image = MoleImage.objects.get(pk=mole_image.pk)
+        mole_image.mole = another_mole
+        mole_image.save()
+
+        self.assertFalse(
+            PatientStudyStats.objects.filter(patient=self.patient).exists())
+        self.assertEqual(PatientStudyStats.objects.get(
+            patient=another_mole.patient, study=None).moles_images_count, 1)
+
+    def test_annotate_image_counters_matches_stats(self):
+        MoleImageFactory.create(mole=self.mole, biopsy=True)
+        MoleImageFactory.create(mole=self.mole, approved=True)
+        MoleImageFactory.create(
+            mole=MoleFactory.create(patient=self.patient))
+        MoleImageFactory.create(mole=self.mole, study=self.study)
+
+        for study in (None, self.study):
+            patient = Patient.objects.annotate_image_counters(
+                study and study.pk).get(pk=self.patient.pk)
+            stats = self.get_stats(study)
+            for counter in PatientStudyStats.COUNTERS:
+                self.assertEqual(
+                    getattr(patient, counter), getattr(stats, counter))
+
+        patient = Patient.objects.annotate_image_counters(0).get(
+            pk=self.patient.pk)
+        self.assertEqual(patient.moles_images_count, 0)
+
+
+class AnatomicalSiteTreeTest(TestCase):
+    def setUp(self):
+        self.root = AnatomicalSiteFactory.create()
+        self.child = AnatomicalSiteFactory.create(parent=self.root)
+        self.mole = MoleFactory.create(anatomical_site=self.child)
+
+    def test_anatomical_sites_without_queries(self):
+        get_anatomical_site_tree()
+
+        mole = Mole.objects.get(pk=self.mole.pk)
+        with CaptureQueriesContext(connection) as context:
+            anatomical_sites = mole.anatomical_sites
+
+        self.assertEqual(len(context), 0)
+        self.assertEqual(anatomical_sites, [self.root, self.child])
+
+    def test_tree_is_invalidated_on_change(self):
+        get_anatomical_site_tree()
+        grandchild = AnatomicalSiteFactory.create(parent=self.child)
+
+        self.assertEqual(
+            get_anatomical_site_tree().get_path(grandchild.slug),
+            [self.root, self.child, grandchild])
+
+        grandchild.delete()
+        with self.assertRaises(KeyError):
+            get_anatomical_site_tree().get_path(grandchild.slug)
@@ -1,22 +1,21 @@
-from django.test import TransactionTestCase, mock
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TransactionTestCase, mock, override_settings
+from PIL import Image
+
 from apps.main.tests import patch
 from apps.main.tests.mixins import FileTestMixin
+from ..classifier import DummyModel
 from ..factories import MoleImageFactory
-from ..tasks import GetPredictionError
+from ..models import MoleImage
+from ..tasks import GetPredictionError, predict_pending_mole_images
+from .classifier_stub import ClassifierStubMixin
 
 
-class TasksTest(FileTestMixin, TransactionTestCase):
-    @patch('apps.moles.tasks.requests', new_callable=mock.MagicMock)
-    def test_get_mole_image_prediction_success(self, mock_requests):
-        post_mock = mock.MagicMock()
-        post_mock.json.return_value = {
-            'status': 'success',
-            'probability': 0.567,
-            'prediction': 'Seems benign',
-        }
-        mock_requests.post.return_value = post_mock
-
-        # Task `get_mole_image_prediction` runs automatically on post save
+class TasksTest(ClassifierStubMixin, FileTestMixin, TransactionTestCase):
+    def test_get_mole_image_prediction_success(self):
+        # Task `predict_pending_mole_images` runs automatically on post save
         # signal
         with self.fake_media():
             mole_image = MoleImageFactory.create(
@@ -25,17 +24,133 @@ class TasksTest(FileTestMixin, TransactionTestCase):
         mole_image.refresh_from_db()
         self.assertEqual(mole_image.prediction, 'Seems benign')
         self.assertAlmostEqual(float(mole_image.prediction_accuracy), 0.567)
+        self.assertFalse(mole_image.prediction_pending)
+
+        path, payload = self.classifier.requests[0]
+        self.assertEqual(path, '/predict')
+        self.assertEqual(payload, {'image_url': mole_image.photo.url})
 
-    @patch('apps.moles.tasks.requests', new_callable=mock.MagicMock)
-    def test_get_mole_image_prediction_failed(self, mock_requests):
-        post_mock = mock.MagicMock()
-        post_mock.json.return_value = {
+    def test_get_mole_image_prediction_failed(self):
+        self.classifier.result = {
             'status': 'error',
         }
-        mock_requests.post.return_value = post_mock
 
-        # Task `get_mole_image_prediction` runs automatically on post save
+        # Task `predict_pending_mole_images` runs automatically on post save
         # signal
         with self.fake_media(), self.assertRaises(GetPredictionError):
             MoleImageFactory.create(
                 photo=self.get_sample_image_file())
+
+        # Failed images aren't sent again
+        self.assertFalse(MoleImage.objects.prediction_pending().exists())
+
+    def test_get_mole_image_prediction_retried(self):
+        self.classifier.failures = 2
+
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+
+        mole_image.refresh_from_db()
+        self.assertEqual(mole_image.prediction, 'Seems benign')
+        self.assertEqual(len(self.classifier.requests), 3)
+
+    def test_predict_pending_mole_images_skips_old_images(self):
+        with self.fake_media():
+            mole_image = MoleImageFactory.create(
+                photo=self.get_sample_image_file())
+            MoleImage.objects.filter(pk=mole_image.pk).update(
+                prediction_pending=True,
+                date_created='2017-01-01T00:00:00Z')
+
+            predict_pending_mole_images()
+
+        self.assertEqual(len(self.classifier.requests), 1)
+        # Expired images aren't reported as pending
+        self.assertFalse(MoleImage.objects.prediction_pending().exists())
+
+    def test_predictions_are_kept_if_one_image_failed(self):
+        # All attempts of the first image are answered with 503
+        self.classifier.failures = 4
+
+        with self.fake_media(), self.assertRaises(GetPredictionError), \
+                transaction.atomic():
+            mole_images = [
+                MoleImageFactory.create(photo=self.get_sample_image_file())
+                for _ in range(3)
+            ]
+
+        self.assertEqual(len(self.classifier.requests), 6)
+        for mole_image in mole_images:
+            mole_image.refresh_from_db()
+            self.assertFalse(mole_image.prediction_pending)
+        self.assertEqual(
+            [mole_image.prediction for mole_image in mole_images],
+            ['Unknown', 'Seems benign', 'Seems benign'])
+
+
+class BatchTasksTest(ClassifierStubMixin, FileTestMixin,
+                     TransactionTestCase):
+    classifier_batch = True
+
+    def test_images_of_one_transaction_are_sent_in_one_request(self):
+        with self.fake_media(), transaction.atomic():
+            mole_images = [
+                MoleImageFactory.create(photo=self.get_sample_image_file())
+                for _ in range(3)
+            ]
+
+        self.assertEqual(len(self.classifier.requests), 1)
+        path, payload = self.classifier.requests[0]
+        self.assertEqual(path, '/batch')
+        self.assertSetEqual(
+            {image['id'] for image in payload['images']},
+            {mole_image.pk for mole_image in mole_images})
+
+        for mole_image in mole_images:
+            mole_image.refresh_from_db()
+            self.assertEqual(mole_image.prediction, 'Seems benign')
+            self.assertFalse(mole_image.prediction_pending)
+
+    def test_images_are_sent_by_batch_size(self):
+        with self.settings(MOLE_CLASSIFIER_BATCH_SIZE=2), \
+                self.fake_media(), transaction.atomic():
+            for _ in range(3):
+                MoleImageFactory.create(photo=self.get_sample_image_file())
+
+        self.assertListEqual(
+            [len(payload['images'])
+             for _, payload in self.classifier.requests],
+            [2, 1])
+
+
+@override_settings(
+    MOLE_CLASSIFIER_BACKEND='apps.moles.classifier.LocalClassifierBackend',
+    MOLE_CLASSIFIER_MODEL='apps.moles.classifier.DummyModel',
+    MOLE_CLASSIFIER_WORKERS=1)
+class LocalBackendTasksTest(FileTestMixin, TransactionTestCase):
+    def test_images_are_scored_in_process_pool(self):
+        expected_prediction, expected_probability = DummyModel().predict(
+            Image.open(self.get_sample_image_file()))
+
+        with self.fake_media(), transaction.atomic():
+            mole_images = [
+                MoleImageFactory.create(photo=self.get_sample_image_file())
+                for _ in range(2)
+            ]
+
+        for mole_image in mole_images:
+            mole_image.refresh_from_db()
+            self.assertEqual(mole_image.prediction, expected_prediction)
+            self.assertEqual(mole_image.prediction_accuracy,
+                             Decimal(str(expected_probability)))
+            self.assertFalse(mole_image.prediction_pending)
+
+    # Renditions of the broken photo fail too
+    @patch('apps.main.tasks.warm_renditions', new_callable=mock.MagicMock)
+    def test_broken_photo_failed(self, mock_warm_renditions):
+        with self.fake_media(), self.assertRaises(GetPredictionError):
+            MoleImageFactory.create(
+                photo=self.get_sample_file('photo.png'))
+
+        self.assertFalse(MoleImage.objects.prediction_pending().exists())
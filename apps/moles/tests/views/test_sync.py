@@ -0,0 +1,195 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from apps.accounts.factories import DoctorFactory, PatientFactory
+from apps.accounts.models import DoctorToPatient
+from apps.main.models import ChangeLog, ChangeLogAction
+from ...factories import MoleFactory, MoleImageFactory
+from ...factories.study import StudyFactory
+from ...models import StudyToPatient
+from ..moles_test_case import MolesTestCase
+
+
+class SyncViewTest(MolesTestCase):
+    url = '/api/v1/sync/'
+
+    def get_sync_token(self):
+        resp = self.client.get(self.url)
+        self.assertSuccessResponse(resp)
+        return resp.data['token']
+
+    def test_get_forbidden_for_unauthorized(self):
+        resp = self.client.get(self.url)
+        self.assertUnauthorized(resp)
+
+    def test_get_without_since_returns_only_token(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get(self.url)
+        self.assertSuccessResponse(resp)
+        self.assertIsNotNone(resp.data['token'])
+        self.assertEqual(resp.data['moles'], {'changed': [], 'deleted': []})
+
+    def test_get_invalid_since(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get(self.url, {'since': 'invalid'})
+        self.assertBadRequest(resp)
+
+    def test_get_changes_of_visible_patients(self):
+        self.authenticate_as_doctor()
+        token = self.get_sync_token()
+
+        image = MoleImageFactory.create(mole=self.first_patient_mole)
+        MoleImageFactory.create(mole=self.another_patient_mole)
+        study = StudyFactory.create()
+        membership = StudyToPatient.objects.create(
+            study=study, patient=self.first_patient)
+
+        resp = self.client.get(self.url, {'since': token})
+        self.assertSuccessResponse(resp)
+        data = resp.data
+
+        self.assertEqual(
+            [item['pk'] for item in data['patients']['changed']],
+            [self.first_patient.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['consents']['changed']],
+            [self.first_patient_consent.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['patient_anatomical_sites'][
+                'changed']],
+            [self.first_patient_asite.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['moles']['changed']],
+            [self.first_patient_mole.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['mole_images']['changed']],
+            [image.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['study_memberships']['changed']],
+            [membership.pk])
+
+    def test_get_deleted_objects(self):
+        self.authenticate_as_doctor()
+        token = self.get_sync_token()
+
+        mole = MoleFactory.create(
+            patient=self.first_patient,
+            anatomical_site=self.anatomical_site)
+        image = MoleImageFactory.create(mole=mole)
+        mole_pk, image_pk = mole.pk, image.pk
+        mole.delete()
+
+        resp = self.client.get(self.url, {'since': token})
+        self.assertSuccessResponse(resp)
+        data = resp.data
+
+        self.assertEqual(data['moles']['deleted'], [mole_pk])
+        self.assertNotIn(
+            mole_pk, [item['pk'] for item in data['moles']['changed']])
+        self.assertEqual(data['mole_images']['deleted'], [image_pk])
+
+    def test_get_changes_of_coordinated_doctor_patients(self):
+        coordinator = DoctorFactory.create(coordinator=True)
+        doctor = DoctorFactory.create(
+            my_coordinator=coordinator.coordinator_role)
+        patient = PatientFactory.create(doctor=doctor)
+        self.authenticate_as_doctor(coordinator)
+
+        resp = self.client.get(self.url, {'since': self.get_sync_token()})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(
+            [item['pk'] for item in resp.data['patients']['changed']],
+            [patient.pk])
+
+    def test_doctor_to_patient_change_is_logged_as_patient_update(self):
+        doctor = DoctorFactory.create()
+        self.first_patient.doctortopatient_set.create(doctor=doctor)
+
+        self.assertTrue(ChangeLog.objects.filter(
+            model='accounts.patient',
+            object_pk=self.first_patient.pk,
+            action=ChangeLogAction.UPDATED).exists())
+
+    def forget_previous_changes(self):
+        # All changes of the test are made in one transaction,
+        # so they are newer than any token
+        ChangeLog.objects.update(txid=0)
+
+    def test_gained_patient_is_sent_with_all_objects(self):
+        image = MoleImageFactory.create(mole=self.another_patient_mole)
+        self.forget_previous_changes()
+        self.authenticate_as_doctor()
+        token = self.get_sync_token()
+
+        DoctorToPatient.objects.create(
+            doctor=self.doctor, patient=self.another_patient)
+
+        resp = self.client.get(self.url, {'since': token})
+        self.assertSuccessResponse(resp)
+        data = resp.data
+
+        self.assertEqual(
+            [item['pk'] for item in data['patients']['changed']],
+            [self.another_patient.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['patient_anatomical_sites'][
+                'changed']],
+            [self.another_patient_asite.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['moles']['changed']],
+            [self.another_patient_mole.pk])
+        self.assertEqual(
+            [item['pk'] for item in data['mole_images']['changed']],
+            [image.pk])
+
+    def test_lost_patient_is_deleted_with_all_objects(self):
+        self.forget_previous_changes()
+        self.authenticate_as_doctor()
+        token = self.get_sync_token()
+
+        DoctorToPatient.objects.filter(
+            doctor=self.doctor, patient=self.first_patient).delete()
+
+        resp = self.client.get(self.url, {'since': token})
+        self.assertSuccessResponse(resp)
+        data = resp.data
+
+        self.assertEqual(data['patients']['changed'], [])
+        self.assertEqual(
+            data['patients']['deleted'], [self.first_patient.pk])
+        self.assertEqual(
+            data['consents']['deleted'], [self.first_patient_consent.pk])
+        self.assertEqual(
+            data['patient_anatomical_sites']['deleted'],
+            [self.first_patient_asite.pk])
+        self.assertEqual(
+            data['moles']['deleted'], [self.first_patient_mole.pk])
+
+    def test_prune_change_log(self):
+        ChangeLog.objects.filter(model='moles.mole').update(
+            txid=0, date_created=timezone.now() - timedelta(days=31))
+
+        call_command('prune_change_log', stdout=StringIO())
+
+        self.assertFalse(ChangeLog.objects.filter(
+            model='moles.mole').exists())
+        self.assertTrue(ChangeLog.objects.filter(
+            model='accounts.patient').exists())
+
+    def test_get_pruned_since(self):
+        self.authenticate_as_doctor()
+        token = self.get_sync_token()
+
+        call_command('prune_change_log', stdout=StringIO())
+
+        resp = self.client.get(self.url, {'since': int(token) - 1})
+        self.assertEqual(resp.status_code, 410)
+        self.assertEqual(resp.data['detail'].code, 'sync_token_expired')
+
+        resp = self.client.get(self.url, {'since': token})
+        self.assertSuccessResponse(resp)
@@ -0,0 +1,58 @@
+from apps.main.tests import APITestCase, patch
+from ...factories import AnatomicalSiteFactory
+from ...models import AnatomicalSite
+
+
+class AnatomicalSiteViewSetTest(APITestCase):
+    def setUp(self):
+        super(AnatomicalSiteViewSetTest, self).setUp()
+
+        self.root = AnatomicalSiteFactory.create()
+        self.child = AnatomicalSiteFactory.create(parent=self.root)
+
+    def test_get_tree_success(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/anatomical_site/tree/')
+        self.assertSuccessResponse(resp)
+
+        # Migrations create anatomical sites too
+        self.assertEqual(
+            [item['slug'] for item in resp.data],
+            list(AnatomicalSite.objects.filter(
+                parent=None).values_list('slug', flat=True)))
+        root_data = next(
+            item for item in resp.data if item['slug'] == self.root.slug)
+        self.assertEqual(
+            [item['slug'] for item in root_data['children']],
+            [self.child.slug])
+        self.assertEqual(root_data['children'][0]['children'], [])
+
+    def test_get_tree_not_modified(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/anatomical_site/tree/')
+        etag = resp['ETag']
+
+        resp = self.client.get(
+            '/api/v1/anatomical_site/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_get_tree_modified_after_change(self, mock_on_commit):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get('/api/v1/anatomical_site/tree/')
+        etag = resp['ETag']
+
+        AnatomicalSiteFactory.create(parent=self.child)
+
+        resp = self.client.get(
+            '/api/v1/anatomical_site/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertSuccessResponse(resp)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_get_tree_forbidden_for_unauthorized(self):
+        resp = self.client.get('/api/v1/anatomical_site/tree/')
+        self.assertUnauthorized(resp)
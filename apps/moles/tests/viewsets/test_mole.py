@@ -1,12 +1,15 @@
 import json
 from datetime import timedelta
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.main.tests import patch
 from apps.moles.factories import MoleImageFactory
 from apps.moles.factories.study import StudyFactory
-from ...factories import AnatomicalSiteFactory, PatientAnatomicalSiteFactory
+from ...factories import (
+    AnatomicalSiteFactory, PatientAnatomicalSiteFactory, MoleFactory)
 from ...models import Mole
 from ..moles_test_case import MolesTestCase
 
@@ -31,6 +34,59 @@ class MoleViewSetTest(MolesTestCase):
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['pk'], self.first_patient_mole.pk)
 
+    def test_get_patient_moles_image_counters(self):
+        self.authenticate_as_doctor()
+        study = StudyFactory.create()
+        MoleImageFactory.create(
+            mole=self.first_patient_mole, study=study, approved=True,
+            clinical_diagnosis='diagnosis')
+        MoleImageFactory.create(
+            mole=self.first_patient_mole, study=study, biopsy=True)
+        MoleImageFactory.create(mole=self.first_patient_mole)
+
+        resp = self.client.get(
+            self.get_url(self.first_patient.pk), {'study': study.pk})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(len(resp.data), 1)
+        data = resp.data[0]
+        self.assertEqual(data['images_count'], 2)
+        self.assertEqual(data['images_with_clinical_diagnosis_required'], 1)
+        self.assertEqual(
+            data['images_with_pathological_diagnosis_required'], 1)
+        self.assertEqual(data['images_biopsy_count'], 1)
+        self.assertEqual(data['images_approve_required'], 1)
+
+    def test_get_patient_moles_with_cursor_pagination(self):
+        self.authenticate_as_doctor()
+        mole = MoleFactory.create(
+            patient=self.first_patient,
+            anatomical_site=self.anatomical_site)
+        MoleImageFactory.create(mole=mole)
+
+        resp = self.client.get(
+            self.get_url(self.first_patient.pk), {'cursor': '', 'limit': 1})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(
+            [item['pk'] for item in resp.data['results']], [mole.pk])
+
+        resp = self.client.get(resp.data['next'])
+        self.assertSuccessResponse(resp)
+        self.assertEqual(
+            [item['pk'] for item in resp.data['results']],
+            [self.first_patient_mole.pk])
+        self.assertIsNone(resp.data['next'])
+
+    def test_get_patient_moles_compact(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.get(
+            self.get_url(self.first_patient.pk), {'compact': 'true'})
+        self.assertSuccessResponse(resp)
+
+        self.assertNotIn('anatomical_sites', resp.data[0])
+        self.assertEqual(
+            resp.data[0]['anatomical_site'], self.anatomical_site.slug)
+
     def test_get_patient_moles_with_study(self):
         self.authenticate_as_doctor()
         study = StudyFactory.create()
@@ -50,6 +106,60 @@ class MoleViewSetTest(MolesTestCase):
         self.assertListEqual(data['studies'], [study.pk])
         self.assertEqual(data['images_count'], 2)
 
+    def test_get_patient_moles_without_study(self):
+        self.authenticate_as_doctor()
+        study_mole, mixed_mole = [
+            MoleFactory.create(
+                patient=self.first_patient,
+                anatomical_site=self.anatomical_site)
+            for _ in range(2)]
+        study = StudyFactory.create()
+        MoleImageFactory.create(study=study, mole=study_mole)
+        MoleImageFactory.create(study=study, mole=mixed_mole)
+        MoleImageFactory.create(mole=mixed_mole)
+
+        resp = self.client.get(self.get_url(self.first_patient.pk))
+        self.assertSuccessResponse(resp)
+        # The mole without images is returned too
+        self.assertSetEqual(
+            {item['pk'] for item in resp.data},
+            {self.first_patient_mole.pk, mixed_mole.pk})
+
+    def test_get_patient_moles_last_image(self):
+        self.authenticate_as_doctor()
+        MoleImageFactory.create(mole=self.first_patient_mole)
+        last_image = MoleImageFactory.create(mole=self.first_patient_mole)
+        MoleImageFactory.create(
+            study=StudyFactory.create(),
+            mole=self.first_patient_mole)
+
+        resp = self.client.get(self.get_url(self.first_patient.pk))
+        self.assertSuccessResponse(resp)
+        self.assertEqual(resp.data[0]['last_image']['pk'], last_image.pk)
+
+    def test_get_patient_moles_queries_count_does_not_depend_on_moles(self):
+        self.authenticate_as_doctor()
+        # Warm up the data versions, see `apps.accounts.versions`
+        self.client.get(self.get_url(self.first_patient.pk))
+
+        queries_counts = []
+        for _ in range(2):
+            for _ in range(3):
+                mole = MoleFactory.create(
+                    patient=self.first_patient,
+                    anatomical_site=self.anatomical_site)
+                MoleImageFactory.create(mole=mole)
+
+            with CaptureQueriesContext(connection) as context:
+                resp = self.client.get(self.get_url(self.first_patient.pk))
+            self.assertSuccessResponse(resp)
+            for data in resp.data:
+                if data['pk'] != self.first_patient_mole.pk:
+                    self.assertIsNotNone(data['last_image'])
+            queries_counts.append(len(context))
+
+        self.assertEqual(queries_counts[0], queries_counts[1])
+
     def test_get_patient_moles_forbidden_for_not_own_patient(self):
         self.authenticate_as_doctor()
 
@@ -110,8 +220,8 @@ class MoleViewSetTest(MolesTestCase):
         self.assertSuccessResponse(resp)
         self.assertListEqual(resp.data['studies'], [study.pk])
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_success(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_success(self, mock_schedule):
         self.authenticate_as_doctor()
 
         position_info = {'x': 10, 'y': 10}
@@ -141,8 +251,8 @@ class MoleViewSetTest(MolesTestCase):
             'patients/{0}/skin_images/{1}/{1}_photo'.format(
                 mole.patient.pk, mole.pk)))
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_success_with_patient_anatomical_site(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_success_with_patient_anatomical_site(self, mock_schedule):
         self.authenticate_as_doctor()
 
         patient_anatomical_site = PatientAnatomicalSiteFactory(
@@ -177,8 +287,8 @@ class MoleViewSetTest(MolesTestCase):
             'patients/{0}/skin_images/{1}/{1}_photo'.format(
                 mole.patient.pk, mole.pk)))
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_success_with_study(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_success_with_study(self, mock_schedule):
         study = StudyFactory.create()
         self.authenticate_as_doctor()
 
@@ -205,8 +315,8 @@ class MoleViewSetTest(MolesTestCase):
         self.assertIsNotNone(mole_image.study)
         self.assertEqual(mole_image.study.pk, study.pk)
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_with_study_outdated_consent(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_with_study_outdated_consent(self, mock_schedule):
         study = StudyFactory.create()
         self.authenticate_as_doctor()
 
@@ -1,12 +1,15 @@
 from datetime import timedelta
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from apps.main.storages import private_storage
 from apps.main.tests import patch
-from apps.accounts.factories import CoordinatorFactory
+from apps.accounts.factories import CoordinatorFactory, PatientConsentFactory
 from apps.moles.factories.study import StudyFactory
 from ...factories import MoleImageFactory
-from ...models import MoleImage
+from ...models import MoleImage, StudyToPatient
 from ..moles_test_case import MolesTestCase
 
 
@@ -33,6 +36,63 @@ class MoleImageViewSetTest(MolesTestCase):
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['pk'], first_patient_mole_image.pk)
 
+    def test_get_patient_mole_images_studies_loaded_together(self):
+        self.authenticate_as_doctor()
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+
+        def get_queries_count():
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(url)
+            self.assertSuccessResponse(resp)
+            return len(queries), resp.data
+
+        consent = PatientConsentFactory.create(patient=self.first_patient)
+        study = StudyFactory.create()
+        StudyToPatient.objects.create(
+            study=study, patient=self.first_patient, patient_consent=consent)
+        MoleImageFactory.create(mole=self.first_patient_mole, study=study)
+        # The first request may fill the cache
+        get_queries_count()
+        queries_count, _ = get_queries_count()
+
+        MoleImageFactory.create(mole=self.first_patient_mole, study=study)
+        for _ in range(3):
+            MoleImageFactory.create(
+                mole=self.first_patient_mole, study=StudyFactory.create())
+        self.assertEqual(get_queries_count()[0], queries_count)
+
+        _, data = get_queries_count()
+        studies = {
+            item['study']['pk']: item['study']['patients_consents']
+            for item in data
+        }
+        self.assertEqual(len(studies), 4)
+        self.assertEqual(
+            studies[study.pk][self.first_patient.pk]['pk'], consent.pk)
+
+    def test_get_patient_mole_images_with_cursor_pagination(self):
+        self.authenticate_as_doctor()
+
+        now = timezone.now()
+        old_image = MoleImageFactory.create(mole=self.first_patient_mole)
+        new_image = MoleImageFactory.create(mole=self.first_patient_mole)
+        MoleImage.objects.filter(pk=old_image.pk).update(
+            date_created=now - timedelta(days=1))
+        MoleImage.objects.filter(pk=new_image.pk).update(date_created=now)
+
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+        resp = self.client.get(url, {'cursor': '', 'limit': 1})
+        self.assertSuccessResponse(resp)
+        self.assertEqual(
+            [item['pk'] for item in resp.data['results']], [new_image.pk])
+        self.assertIsNotNone(resp.data['next'])
+
+        resp = self.client.get(resp.data['next'])
+        self.assertSuccessResponse(resp)
+        self.assertEqual(
+            [item['pk'] for item in resp.data['results']], [old_image.pk])
+        self.assertIsNone(resp.data['next'])
+
     def test_get_patient_mole_images_forbidden_for_not_own_patient(self):
         self.authenticate_as_doctor()
 
@@ -45,8 +105,8 @@ class MoleImageViewSetTest(MolesTestCase):
             self.get_url(self.another_patient.pk, self.another_patient_mole.pk))
         self.assertUnauthorized(resp)
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_success(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_success(self, mock_schedule):
         self.authenticate_as_doctor()
 
         mole_image_data = {
@@ -70,6 +130,94 @@ class MoleImageViewSetTest(MolesTestCase):
             'patients/{0}/skin_images/{1}/{1}_photo'.format(
                 mole.patient.pk, mole.pk)))
 
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_with_direct_upload(self, mock_schedule):
+        self.authenticate_as_doctor()
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+
+        with self.fake_media():
+            resp = self.client.post(url + 'presign/', {'file_name': 'a.png'})
+            self.assertSuccessResponse(resp)
+            key = resp.data['fields']['key']
+            self.assertTrue(key.startswith(
+                'patients/{0}/skin_images/{1}/'.format(
+                    self.first_patient.pk, self.first_patient_mole.pk)))
+
+            upload_data = dict(resp.data['fields'])
+            upload_data['file'] = self.get_sample_image_file()
+            self.client.credentials()
+            upload_resp = self.client.post(resp.data['url'], upload_data)
+            self.assertEqual(upload_resp.status_code, 204)
+
+            self.authenticate_as_doctor()
+            resp = self.client.post(url + 'register/', {
+                'upload_token': resp.data['upload_token'],
+                'age': 40,
+            })
+            self.assertSuccessResponse(resp)
+
+        mole_image = MoleImage.objects.get(pk=resp.data['pk'])
+        self.assertEqual(mole_image.mole, self.first_patient_mole)
+        self.assertEqual(mole_image.photo.name, key)
+        self.assertEqual(mole_image.age, 40)
+
+    def direct_upload(self, url, file):
+        resp = self.client.post(url + 'presign/', {'file_name': 'a.png'})
+        self.assertSuccessResponse(resp)
+
+        upload_data = dict(resp.data['fields'])
+        upload_data['file'] = file
+        self.client.credentials()
+        upload_resp = self.client.post(resp.data['url'], upload_data)
+        self.assertEqual(upload_resp.status_code, 204)
+        self.authenticate_as_doctor()
+
+        return resp.data
+
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_register_twice(self, mock_schedule):
+        self.authenticate_as_doctor()
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+
+        with self.fake_media():
+            upload = self.direct_upload(url, self.get_sample_image_file())
+            resp = self.client.post(url + 'register/', {
+                'upload_token': upload['upload_token'],
+            })
+            self.assertSuccessResponse(resp)
+
+            resp = self.client.post(url + 'register/', {
+                'upload_token': upload['upload_token'],
+            })
+        self.assertBadRequest(resp)
+        self.assertEqual(MoleImage.objects.filter(
+            photo=upload['fields']['key']).count(), 1)
+
+    def test_register_not_image(self):
+        self.authenticate_as_doctor()
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+
+        with self.fake_media():
+            upload = self.direct_upload(
+                url, self.get_sample_file('a.png', b'not an image'))
+            resp = self.client.post(url + 'register/', {
+                'upload_token': upload['upload_token'],
+            })
+            self.assertBadRequest(resp)
+            self.assertFalse(
+                private_storage.exists(upload['fields']['key']))
+
+    def test_register_without_upload(self):
+        self.authenticate_as_doctor()
+        url = self.get_url(self.first_patient.pk, self.first_patient_mole.pk)
+
+        with self.fake_media():
+            resp = self.client.post(url + 'presign/', {'file_name': 'a.png'})
+            resp = self.client.post(url + 'register/', {
+                'upload_token': resp.data['upload_token'],
+            })
+        self.assertBadRequest(resp)
+
     def test_create_forbidden_for_patient_without_valid_consent(self):
         self.authenticate_as_doctor()
         self.first_patient_consent.delete()
@@ -77,8 +225,8 @@ class MoleImageViewSetTest(MolesTestCase):
             self.get_url(self.first_patient.pk, self.first_patient_mole.pk))
         self.assertForbidden(resp)
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_with_study(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_with_study(self, mock_schedule):
         self.authenticate_as_doctor()
         study = StudyFactory.create()
 
@@ -97,8 +245,8 @@ class MoleImageViewSetTest(MolesTestCase):
         mole_image = MoleImage.objects.get(pk=data['pk'])
         self.assertEqual(mole_image.study.pk, study.pk)
 
-    @patch('apps.moles.tasks.requests')
-    def test_create_with_study_outdated_consent(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_with_study_outdated_consent(self, mock_schedule):
         self.authenticate_as_doctor()
         study = StudyFactory.create()
 
@@ -117,8 +265,8 @@ class MoleImageViewSetTest(MolesTestCase):
                 mole_image_data)
         self.assertForbidden(resp)
 
-    @patch('apps.moles.tasks.requests')
-    def test_update_success(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_update_success(self, mock_schedule):
         self.authenticate_as_doctor()
 
         yesterday_date = timezone.now() - timedelta(days=1)
@@ -152,8 +300,8 @@ class MoleImageViewSetTest(MolesTestCase):
                          mole_image_data['path_diagnosis'])
         self.assertNotEqual(mole_image.date_modified, yesterday_date)
 
-    @patch('apps.moles.tasks.requests')
-    def test_update_biopsy_data_as_string_success(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_update_biopsy_data_as_string_success(self, mock_schedule):
         self.authenticate_as_doctor()
         mole_image = MoleImageFactory.create(
             mole=self.first_patient_mole)
@@ -169,8 +317,8 @@ class MoleImageViewSetTest(MolesTestCase):
         mole_image.refresh_from_db()
         self.assertDictEqual({'lens': 1}, mole_image.biopsy_data)
 
-    @patch('apps.moles.tasks.requests')
-    def test_update_biopsy_data_as_dict_success(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_update_biopsy_data_as_dict_success(self, mock_schedule):
         self.authenticate_as_doctor()
         mole_image = MoleImageFactory.create(
             mole=self.first_patient_mole)
@@ -187,9 +335,9 @@ class MoleImageViewSetTest(MolesTestCase):
         mole_image.refresh_from_db()
         self.assertDictEqual({'lens': 1}, mole_image.biopsy_data)
 
-    @patch('apps.moles.tasks.requests')
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
     def test_update_allow_for_patient_without_valid_consent(
-            self, mock_requests):
+            self, mock_schedule):
         self.authenticate_as_doctor()
 
         mole_image = MoleImageFactory.create(
@@ -212,8 +360,8 @@ class MoleImageViewSetTest(MolesTestCase):
             first_patient_mole_image.pk))
         self.assertNotAllowed(resp)
 
-    @patch('apps.moles.tasks.requests')
-    def test_that_doctor_cant_change_approved_field(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_that_doctor_cant_change_approved_field(self, mock_schedule):
         mole_image = MoleImageFactory.create(
             approved=False,
             mole=self.first_patient_mole)
@@ -230,8 +378,8 @@ class MoleImageViewSetTest(MolesTestCase):
             mole_image_data)
         self.assertBadRequest(resp)
 
-    @patch('apps.moles.tasks.requests')
-    def test_that_coordinator_can_change_approved_field(self, mock_requests):
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_that_coordinator_can_change_approved_field(self, mock_schedule):
         mole_image = MoleImageFactory.create(
             approved=False,
             mole=self.first_patient_mole)
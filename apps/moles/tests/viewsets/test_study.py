@@ -1,8 +1,12 @@
 from datetime import timedelta
 
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.accounts.models import DoctorToPatient, PatientConsent
+from apps.main.models import JobStatus
 from apps.main.tests import APITestCase, patch
 from apps.accounts.factories import CoordinatorFactory, DoctorFactory, \
     PatientFactory, ParticipantFactory, PatientConsentFactory
@@ -103,6 +107,29 @@ class StudyViewSetTest(APITestCase):
             resp.data[0]['patients_consents'][self.patient.pk]['pk'],
             consent.pk)
 
+    def test_list_queries_dont_depend_on_doctors_count(self):
+        study = StudyFactory.create(author=self.coordinator)
+        study.doctors.add(self.doctor)
+        self.authenticate_as_doctor()
+
+        def get_queries_count():
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get('/api/v1/study/', format='json')
+            self.assertSuccessResponse(resp)
+            return resp, len(queries)
+
+        # Versions of the ETag are cached by the first request
+        get_queries_count()
+        resp, queries_count = get_queries_count()
+        doctor_data = resp.data[0]['doctors'][0]
+        self.assertTrue(doctor_data['is_coordinator'])
+        self.assertFalse(doctor_data['is_participant'])
+
+        study.doctors.add(*DoctorFactory.create_batch(5))
+        resp, more_doctors_queries_count = get_queries_count()
+        self.assertEqual(len(resp.data[0]['doctors']), 6)
+        self.assertEqual(queries_count, more_doctors_queries_count)
+
     def test_list_forbidden(self):
         StudyFactory.create()
         resp = self.client.get('/api/v1/study/', format='json')
@@ -222,6 +249,62 @@ class StudyViewSetTest(APITestCase):
         self.assertSetEqual(set(resp.data['fail_emails']),
                             {doctor.email, self.doctor.email})
 
+    @patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_add_doctor_delivers_invitations_in_job(self, mock_on_commit):
+        study = StudyFactory.create(author=self.coordinator)
+        doctor = DoctorFactory.create(my_coordinator=self.coordinator)
+        self.authenticate_as_doctor()
+        emails = [doctor.email, 'first@test.com', 'second@test.com',
+                  'first@test.com']
+
+        resp = self.client.post(
+            '/api/v1/study/{0}/add_doctor/'.format(study.pk),
+            self.get_post_for_create_doctor(doctor.pk, emails),
+            format='json')
+        self.assertSuccessResponse(resp)
+        self.assertFalse(resp.data['all_success'])
+        self.assertSetEqual(set(resp.data['fail_emails']),
+                            {doctor.email, 'first@test.com'})
+        self.assertSetEqual(
+            {message.to[0] for message in mail.outbox},
+            {'first@test.com', 'second@test.com'})
+
+        resp = self.client.get('/api/v1/job/{0}/'.format(resp.data['job']))
+        self.assertSuccessResponse(resp)
+        self.assertEqual(resp.data['status'], JobStatus.SUCCEEDED)
+        self.assertEqual(resp.data['progress'], 2)
+        self.assertSetEqual(set(resp.data['result']['delivered']),
+                            {'first@test.com', 'second@test.com'})
+        self.assertDictEqual(resp.data['result']['failed'], {})
+
+        self.authenticate_as_doctor(self.other_doctor)
+        resp = self.client.get('/api/v1/job/{0}/'.format(resp.data['pk']))
+        self.assertNotFound(resp)
+
+    def test_add_doctor_queries_dont_depend_on_emails_count(self):
+        study = StudyFactory.create(author=self.coordinator)
+        doctor = DoctorFactory.create(my_coordinator=self.coordinator)
+        self.authenticate_as_doctor()
+
+        def get_queries_count(emails):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post(
+                    '/api/v1/study/{0}/add_doctor/'.format(study.pk),
+                    self.get_post_for_create_doctor(doctor.pk, emails),
+                    format='json')
+            self.assertSuccessResponse(resp)
+            return len(queries)
+
+        # The first request warms up the cache
+        get_queries_count(['warm-up@test.com'])
+
+        queries_counts = [
+            get_queries_count(['{0}-{1}@test.com'.format(count, index)
+                               for index in range(count)])
+            for count in (1, 5, 20)
+        ]
+        self.assertEqual(len(set(queries_counts)), 1, queries_counts)
+
     def test_add_doctor_with_myself(self):
         study = StudyFactory.create(author=self.coordinator)
         self.authenticate_as_doctor()
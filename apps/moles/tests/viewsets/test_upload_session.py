@@ -0,0 +1,164 @@
+import io
+import os
+
+from apps.accounts.factories import DoctorFactory
+from apps.main.tests import patch
+from ...models import MoleImage, UploadSession
+from ..moles_test_case import MolesTestCase
+
+
+class UploadSessionViewSetTest(MolesTestCase):
+    def create_session(self, content):
+        resp = self.client.post('/api/v1/upload/', {
+            'file_name': 'photo.png',
+            'size': len(content),
+        })
+        self.assertSuccessResponse(resp)
+        return resp.data['pk']
+
+    def put_chunk(self, pk, offset, chunk):
+        return self.client.put(
+            '/api/v1/upload/{0}/chunk/?offset={1}'.format(pk, offset),
+            chunk, content_type='application/octet-stream')
+
+    def upload(self, content):
+        pk = self.create_session(content)
+
+        middle = len(content) // 2
+        self.assertSuccessResponse(self.put_chunk(pk, 0, content[:middle]))
+        self.assertSuccessResponse(
+            self.put_chunk(pk, middle, content[middle:]))
+
+        resp = self.client.post('/api/v1/upload/{0}/finalize/'.format(pk))
+        self.assertSuccessResponse(resp)
+        self.assertTrue(resp.data['is_completed'])
+
+        return pk
+
+    def test_upload_chunks(self):
+        self.authenticate_as_doctor()
+        content = self.get_sample_image_file().read()
+
+        with self.fake_media():
+            pk = self.create_session(content)
+
+            resp = self.put_chunk(pk, 0, content[:10])
+            self.assertSuccessResponse(resp)
+            self.assertEqual(resp.data['offset'], 10)
+
+            # Resending the chunk after a lost response
+            resp = self.put_chunk(pk, 0, content[:10])
+            self.assertEqual(resp.status_code, 409)
+            self.assertEqual(resp.data['offset'], 10)
+
+            resp = self.put_chunk(pk, 10, content[10:] + b'*')
+            self.assertBadRequest(resp)
+
+            resp = self.client.post('/api/v1/upload/{0}/finalize/'.format(pk))
+            self.assertBadRequest(resp)
+
+            # Another chunk was appended while this one was received
+            session = UploadSession.objects.get(pk=pk)
+            part = session.receive_chunk(io.BytesIO(content[10:20]))
+            UploadSession.objects.filter(pk=pk).update(offset=20)
+            self.assertFalse(session.append_chunk(*part))
+            self.assertFalse(os.path.exists(part[0]))
+            UploadSession.objects.filter(pk=pk).update(offset=10)
+
+            resp = self.put_chunk(pk, 10, content[10:])
+            self.assertSuccessResponse(resp)
+            self.assertEqual(resp.data['offset'], len(content))
+
+            resp = self.client.post('/api/v1/upload/{0}/finalize/'.format(pk))
+            self.assertSuccessResponse(resp)
+
+            with UploadSession.objects.get(pk=pk).open() as upload:
+                self.assertEqual(upload.read(), content)
+
+    def test_finalize_invalid_image(self):
+        self.authenticate_as_doctor()
+
+        with self.fake_media():
+            pk = self.create_session(b'not an image')
+            self.put_chunk(pk, 0, b'not an image')
+
+            resp = self.client.post('/api/v1/upload/{0}/finalize/'.format(pk))
+        self.assertBadRequest(resp)
+
+    def test_upload_forbidden_for_another_doctor(self):
+        self.authenticate_as_doctor()
+        pk = self.create_session(b'*')
+
+        self.authenticate_as_doctor(DoctorFactory.create(password='password'))
+
+        resp = self.put_chunk(pk, 0, b'*')
+        self.assertNotFound(resp)
+
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_create_mole_image_from_upload(self, mock_schedule):
+        self.authenticate_as_doctor()
+        content = self.get_sample_image_file().read()
+
+        with self.fake_media():
+            pk = self.upload(content)
+
+            resp = self.client.post(
+                '/api/v1/patient/{0}/mole/{1}/image/'.format(
+                    self.first_patient.pk, self.first_patient_mole.pk),
+                {'photo_upload': pk})
+            self.assertSuccessResponse(resp)
+
+            mole_image = MoleImage.objects.get(pk=resp.data['pk'])
+            self.assertEqual(mole_image.photo.read(), content)
+
+    @patch('apps.moles.tasks.schedule_mole_image_prediction')
+    def test_upload_is_kept_if_mole_image_is_not_saved(self, mock_schedule):
+        self.authenticate_as_doctor()
+        content = self.get_sample_image_file().read()
+
+        with self.fake_media():
+            pk = self.upload(content)
+
+            with patch('apps.moles.models.MoleImage.save',
+                       side_effect=IOError):
+                with self.assertRaises(IOError):
+                    self.client.post(
+                        '/api/v1/patient/{0}/mole/{1}/image/'.format(
+                            self.first_patient.pk,
+                            self.first_patient_mole.pk),
+                        {'photo_upload': pk})
+
+            self.assertTrue(UploadSession.objects.filter(pk=pk).exists())
+
+            with patch('django.db.transaction.on_commit',
+                       side_effect=lambda func: func()):
+                resp = self.client.post(
+                    '/api/v1/patient/{0}/mole/{1}/image/'.format(
+                        self.first_patient.pk, self.first_patient_mole.pk),
+                    {'photo_upload': pk})
+            self.assertSuccessResponse(resp)
+            self.assertFalse(UploadSession.objects.filter(pk=pk).exists())
+
+    def test_create_mole_image_without_photo(self):
+        self.authenticate_as_doctor()
+
+        resp = self.client.post(
+            '/api/v1/patient/{0}/mole/{1}/image/'.format(
+                self.first_patient.pk, self.first_patient_mole.pk))
+        self.assertBadRequest(resp)
+        self.assertIn('photo', resp.data)
+
+    def test_create_distant_photo_from_upload(self):
+        self.authenticate_as_doctor()
+        content = self.get_sample_image_file().read()
+
+        with self.fake_media():
+            pk = self.upload(content)
+
+            resp = self.client.post(
+                '/api/v1/patient/{0}/anatomical_site/'.format(
+                    self.first_patient.pk),
+                {'anatomical_site': self.anatomical_site.pk,
+                 'distant_photo_upload': pk})
+            self.assertSuccessResponse(resp)
+            self.assertIsNotNone(resp.data['distant_photo'])
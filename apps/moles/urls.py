@@ -3,6 +3,7 @@ from rest_framework_nested import routers
 
 from apps.accounts.urls import router_for_patients
 from .viewsets import *
+from .views import sync_view
 
 
 patient_router = routers.NestedSimpleRouter(
@@ -21,8 +22,15 @@ study_router.register('study/invites', StudyInvitationViewSet)
 study_router.register('study/invites_doctor', StudyInvitationForDoctorViewSet)
 study_router.register('study', StudyViewSet)
 
+router = routers.SimpleRouter()
+router.register('anatomical_site', AnatomicalSiteViewSet)
+router.register('upload', UploadSessionViewSet)
+
 urlpatterns = [
     url(r'^', include(patient_router.urls)),
     url(r'^', include(mole_router.urls)),
     url(r'^', include(study_router.urls)),
+    url(r'^', include(router.urls)),
+
+    url(r'^sync/$', sync_view),
 ]
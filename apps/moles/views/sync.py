@@ -0,0 +1,156 @@
+from collections import OrderedDict, defaultdict
+
+from django.db.models import Q
+from rest_framework import (
+    exceptions, generics, response, serializers, status)
+
+from apps.accounts.models import (
+    Patient, PatientConsent, PatientVisibility)
+from apps.accounts.permissions import IsDoctor
+from apps.main.models import ChangeLog, ChangeLogAction
+from apps.main.models.change_log import get_pruned_txid, get_sync_token
+from ..models import Mole, MoleImage, PatientAnatomicalSite, StudyToPatient
+from ..serializers import PatientAnatomicalSiteSerializer
+from ..serializers.sync import (
+    SyncPatientSerializer, SyncPatientConsentSerializer, SyncMoleSerializer,
+    SyncMoleImageSerializer, SyncStudyToPatientSerializer)
+
+
+class SyncTokenExpired(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Changes since the token are pruned, ' \
+                     'download everything again'
+    default_code = 'sync_token_expired'
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Returns objects of the visible patients which are created, changed
+    or deleted since the `since` token, and the token for the next call.
+
+    Without `since` only the token is returned: clients take it before
+    the initial download through the regular endpoints.
+    The same object may be returned again by the next call, clients
+    should apply changes idempotently.
+
+    Patients which became visible since the token are returned with all
+    their objects, patients which aren't visible anymore are returned
+    as deleted with all their objects.
+    Tokens older than the pruned part of the log are rejected with
+    410 Gone, clients should download everything again.
+
+    NOTE: patients are deleted only through the admin, their visibility
+    is deleted with them so such patients aren't returned as deleted
+    """
+    permission_classes = (IsDoctor, )
+
+    # Key, model, serializer and the lookup of the patient
+    sections = (
+        ('patients', Patient, SyncPatientSerializer, 'pk'),
+        ('consents', PatientConsent, SyncPatientConsentSerializer,
+         'patient'),
+        ('study_memberships', StudyToPatient, SyncStudyToPatientSerializer,
+         'patient'),
+        ('patient_anatomical_sites', PatientAnatomicalSite,
+         PatientAnatomicalSiteSerializer, 'patient'),
+        ('moles', Mole, SyncMoleSerializer, 'patient'),
+        ('mole_images', MoleImage, SyncMoleImageSerializer, 'mole__patient'),
+    )
+
+    def get_since(self):
+        since = self.request.query_params.get('since')
+        if not since:
+            return None
+
+        try:
+            since = int(since)
+        except ValueError:
+            raise serializers.ValidationError({'since': 'Invalid token'})
+
+        pruned_txid = get_pruned_txid()
+        if pruned_txid is not None and since < pruned_txid:
+            raise SyncTokenExpired()
+
+        return since
+
+    def get_section_queryset(self, model):
+        if model is Patient:
+            return Patient.objects.for_serialization(
+                self.request.user.doctor_role)
+        if model is Mole:
+            return Mole.objects.select_related('anatomical_site')
+        return model.objects.all()
+
+    def get_changes(self, since):
+        """
+        Returns the last action for every changed object keyed by
+        model label and object pk
+        """
+        entries = ChangeLog.objects.filter(
+            patient_id__in=PatientVisibility.objects.filter(
+                viewer_doctor=self.request.user.doctor_role
+            ).values('patient_id'),
+            txid__gte=since
+        ).order_by('id').values_list('model', 'object_pk', 'action')
+
+        changes = defaultdict(dict)
+        for model, object_pk, action in entries:
+            changes[model][object_pk] = action
+
+        return changes
+
+    def get_visibility_changes(self, since):
+        """
+        Returns pks of patients which became visible and pks of patients
+        which aren't visible anymore
+        """
+        doctor = self.request.user.doctor_role
+        patient_pks = set(ChangeLog.objects.filter(
+            model=PatientVisibility._meta.label_lower,
+            object_pk=doctor.pk,
+            txid__gte=since
+        ).values_list('patient_id', flat=True))
+        if not patient_pks:
+            return set(), set()
+
+        gained = set(PatientVisibility.objects.filter(
+            viewer_doctor=doctor,
+            patient_id__in=patient_pks
+        ).values_list('patient_id', flat=True))
+
+        return gained, patient_pks - gained
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_since()
+        # The token must be taken before reading the log
+        data = OrderedDict([('token', str(get_sync_token()))])
+        changes, gained, lost = {}, set(), set()
+        if since is not None:
+            changes = self.get_changes(since)
+            gained, lost = self.get_visibility_changes(since)
+
+        for key, model, serializer_class, patient_lookup in self.sections:
+            actions = changes.get(model._meta.label_lower, {})
+            changed_pks = [pk for pk, action in actions.items()
+                           if action != ChangeLogAction.DELETED]
+            patient_filter = '{0}__in'.format(patient_lookup)
+
+            changed = list(self.get_section_queryset(model).filter(
+                Q(pk__in=changed_pks) | Q(**{patient_filter: gained})
+            )) if changed_pks or gained else []
+            deleted = set(actions) - {obj.pk for obj in changed}
+            if lost:
+                deleted.update(model.objects.filter(
+                    **{patient_filter: lost}).values_list('pk', flat=True))
+
+            data[key] = OrderedDict([
+                ('changed', serializer_class(
+                    changed, many=True,
+                    context=self.get_serializer_context()).data),
+                ('deleted', sorted(deleted)),
+            ])
+
+        return response.Response(data=data, status=status.HTTP_200_OK)
+
+
+sync_view = SyncView.as_view()
@@ -1,6 +1,8 @@
+from .anatomical_site import AnatomicalSiteViewSet
 from .patient_anatomical_site import PatientAnatomicalSiteViewSet
 from .mole import MoleViewSet
 from .mole_image import MoleImageViewSet
 from .study import StudyViewSet, ConsentDocViewSet
 from .study_invitation import StudyInvitationViewSet, \
     StudyInvitationForDoctorViewSet
+from .upload_session import UploadSessionViewSet
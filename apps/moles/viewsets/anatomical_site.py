@@ -0,0 +1,25 @@
+from rest_framework import viewsets, response
+from rest_framework.decorators import list_route
+
+from apps.accounts.viewsets.mixins import ConditionalGetMixin
+from ..models import AnatomicalSite
+from ..models.anatomical_site import get_anatomical_site_tree
+from ..serializers import AnatomicalSiteTreeSerializer
+
+
+class AnatomicalSiteViewSet(ConditionalGetMixin, viewsets.GenericViewSet):
+    queryset = AnatomicalSite.objects.all()
+    serializer_class = AnatomicalSiteTreeSerializer
+
+    def get_version(self, request):
+        # The tree is the same for all users
+        return get_anatomical_site_tree().version
+
+    @list_route(methods=['GET'])
+    def tree(self, request):
+        tree = get_anatomical_site_tree()
+        serializer = self.get_serializer_class()(
+            tree.get_children(None), many=True,
+            context=dict(self.get_serializer_context(), tree=tree))
+
+        return response.Response(serializer.data)
@@ -1,16 +1,29 @@
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from rest_framework import viewsets, mixins, response, status
 
 from apps.accounts.permissions import (
     C, IsDoctorOfPatient, HasPatientValidConsent, AllowAllExceptCreation)
-from apps.accounts.viewsets.mixins import PatientInfoMixin
-from ..models import Mole
+from apps.accounts.viewsets.mixins import (
+    ConditionalGetMixin, PatientInfoMixin)
+from apps.main.pagination import OptionalKeysetPagination
+from ..models import Mole, MoleImage
 from ..serializers import (
     MoleListSerializer, MoleDetailSerializer, MoleCreateSerializer,
     MoleUpdateSerializer)
 
 
-class MoleViewSet(viewsets.GenericViewSet, PatientInfoMixin,
+class MolePagination(OptionalKeysetPagination):
+    """
+    Pass `cursor` query param (empty for the first page) to paginate,
+    old clients still get the whole list
+    """
+    ordering = '-last_upload'
+    fallback_pagination_class = None
+
+
+class MoleViewSet(ConditionalGetMixin, viewsets.GenericViewSet,
+                  PatientInfoMixin,
                   mixins.ListModelMixin, mixins.CreateModelMixin,
                   mixins.RetrieveModelMixin,
                   mixins.UpdateModelMixin):
@@ -20,27 +33,33 @@ class MoleViewSet(viewsets.GenericViewSet, PatientInfoMixin,
         IsDoctorOfPatient,
         C(HasPatientValidConsent) | C(AllowAllExceptCreation)
     )
+    pagination_class = MolePagination
 
     def get_queryset(self):
         study_pk = self.get_study_pk()
 
         result = super(MoleViewSet, self)\
             .get_queryset()\
-            .prefetch_related('images')\
+            .prefetch_last_image(study_pk)\
             .annotate_last_upload()\
-            .annotate_clinical_diagnosis_required(study_pk)\
-            .annotate_pathological_diagnosis_required(study_pk)\
-            .annotate_biopsy_count(study_pk)\
-            .annotate_approve_required(study_pk) \
-            .annotate_images_count(study_pk) \
+            .annotate_image_counters(study_pk)\
             .annotate_studies()\
             .filter(patient=self.get_patient_pk())\
             .order_by('-last_upload')
 
+        # Correlated EXISTS subqueries instead of joins, so there are
+        # no duplicated rows and only images of the mole are looked up
+        images = MoleImage.objects.filter(mole=OuterRef('pk'))
         if study_pk:
-            result = result.filter(images__study_id=study_pk)
+            result = result.annotate(
+                has_study_images=Exists(images.filter(study_id=study_pk))
+            ).filter(has_study_images=True)
         else:
-            result = result.filter(images__study=None)
+            result = result.annotate(
+                has_images_without_study=Exists(
+                    images.filter(study__isnull=True)),
+                has_images=Exists(images)
+            ).filter(Q(has_images_without_study=True) | Q(has_images=False))
 
         return result
 
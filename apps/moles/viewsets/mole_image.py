@@ -1,10 +1,32 @@
-from rest_framework import viewsets, mixins
+from django.core import signing
+from rest_framework import viewsets, mixins, response
+from rest_framework.decorators import list_route
 
 from apps.accounts.permissions import (
     C, IsDoctorOfPatient, HasPatientValidConsent, AllowAllExceptCreation)
+from apps.main.pagination import OptionalKeysetPagination
+from apps.main.storages import private_storage
+from apps.main.storages.direct_upload import get_direct_upload
 from ..models import Mole, MoleImage
+from ..models.upload_paths import mole_image_photo_path, make_path_unique
+from ..models.upload_session import MAX_UPLOAD_SIZE
 from ..serializers import MoleImageListSerializer, MoleImageCreateSerializer, \
-    MoleImageUpdateSerializer
+    MoleImageUpdateSerializer, MoleImagePresignSerializer, \
+    MoleImageRegisterSerializer
+from ..serializers.mole_image import MOLE_IMAGE_UPLOAD_TOKEN_SALT
+
+
+# Seconds the presigned form is valid
+DIRECT_UPLOAD_EXPIRES_IN = 60 * 60
+
+
+class MoleImagePagination(OptionalKeysetPagination):
+    """
+    Pass `cursor` query param (empty for the first page) to paginate,
+    old clients still get the whole list
+    """
+    ordering = '-date_created'
+    fallback_pagination_class = None
 
 
 class MoleImageViewSet(viewsets.GenericViewSet,
@@ -16,6 +38,7 @@ class MoleImageViewSet(viewsets.GenericViewSet,
         IsDoctorOfPatient,
         C(HasPatientValidConsent) | C(AllowAllExceptCreation)
     )
+    pagination_class = MoleImagePagination
 
     def get_mole_pk(self):
         return self.kwargs['mole_pk']
@@ -26,14 +49,47 @@ class MoleImageViewSet(viewsets.GenericViewSet,
     def get_queryset(self):
         qs = super(MoleImageViewSet, self).get_queryset()
 
-        return qs.filter(mole=self.get_mole_pk())
+        return qs.filter(mole=self.get_mole_pk()).select_related(
+            'study').prefetch_related('study__consent_docs')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return MoleImageCreateSerializer
+        elif self.action == 'presign':
+            return MoleImagePresignSerializer
+        elif self.action == 'register':
+            return MoleImageRegisterSerializer
         elif self.action in ['update', 'partial_update']:
             return MoleImageUpdateSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         return serializer.save(mole=self.get_mole())
+
+    @list_route(methods=['POST'])
+    def presign(self, request, **kwargs):
+        """
+        Returns the form to upload the photo directly to the storage
+        and the token to register the uploaded photo
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        mole = self.get_mole()
+        key = make_path_unique(mole_image_photo_path(
+            MoleImage(mole=mole), serializer.validated_data['file_name']))
+
+        result = get_direct_upload(private_storage).get_upload_form(
+            request, key, MAX_UPLOAD_SIZE, DIRECT_UPLOAD_EXPIRES_IN)
+        result['upload_token'] = signing.dumps(
+            {'key': key, 'mole': mole.pk},
+            salt=MOLE_IMAGE_UPLOAD_TOKEN_SALT)
+
+        return response.Response(result)
+
+    @list_route(methods=['POST'])
+    def register(self, request, **kwargs):
+        """
+        Creates the mole image for the photo uploaded by the `presign` form
+        """
+        return self.create(request, **kwargs)
@@ -1,3 +1,5 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
@@ -8,17 +10,20 @@ from apps.accounts.models.participant import is_participant, \
     get_participant_patient
 from apps.accounts.serializers import PatientConsentSerializer
 from apps.moles.models import StudyToPatient
-from apps.moles.models.moles_mailer import AddParticipantNotification
 from apps.moles.serializers.study import AddDoctorSerializer
 from apps.accounts.permissions import IsCoordinator, IsDoctor
 from apps.accounts.permissions.is_coordinator_of_doctor import \
     IsCoordinatorOfDoctor
-from apps.accounts.viewsets.mixins import PatientInfoMixin
-from apps.main.models import FlatBlock
+from apps.accounts.viewsets.mixins import (
+    ConditionalGetMixin, PatientInfoMixin)
+from apps.accounts.versions import bump_global_version
+from apps.main.models import FlatBlock, Job
 from ..models import ConsentDoc, Study, StudyInvitation
+from ..tasks import send_study_invitations
 from ..serializers import (
     ConsentDocSerializer, StudyBaseSerializer, StudyListSerializer,
     StudyInvitationSerializer)
+from .study_invitation import prefetch_invitation_doctors
 
 
 class ConsentDocViewSet(viewsets.GenericViewSet,
@@ -39,13 +44,17 @@ class ConsentDocViewSet(viewsets.GenericViewSet,
         })
 
 
-class StudyViewSet(viewsets.GenericViewSet, PatientInfoMixin,
+class StudyViewSet(ConditionalGetMixin, viewsets.GenericViewSet,
+                   PatientInfoMixin,
                    mixins.CreateModelMixin, mixins.UpdateModelMixin,
                    mixins.ListModelMixin, mixins.RetrieveModelMixin,
                    mixins.DestroyModelMixin):
-    queryset = Study.objects.all().order_by('-pk')
+    queryset = Study.objects.prefetch_related(
+        Prefetch('doctors', queryset=Doctor.objects.with_roles())
+    ).order_by('-pk')
     serializer_class = StudyListSerializer
     permission_classes = (IsDoctor,)
+    depends_on_consents_expiry = True
 
     def get_queryset(self):
         user = self.request.user.doctor_role
@@ -91,7 +100,8 @@ class StudyViewSet(viewsets.GenericViewSet, PatientInfoMixin,
     @detail_route(methods=['GET'])
     def invites(self, request, pk):
         study = self.get_object()
-        instance = study.studyinvitation_set.all()
+        instance = prefetch_invitation_doctors(
+            study.studyinvitation_set.all())
         return Response(
             StudyInvitationSerializer(instance, context={'request': request},
                                       many=True).data)
@@ -106,30 +116,46 @@ class StudyViewSet(viewsets.GenericViewSet, PatientInfoMixin,
         fail_emails = {}
 
         study.doctors.add(doctor_pk)
+
+        # Two queries for all emails
+        participant_by_email = dict(Doctor.objects.filter(
+            email__in=email_list).values_list('email', 'participant_role'))
+        invited_emails = set(StudyInvitation.objects.filter(
+            study=study, email__in=email_list).values_list('email', flat=True))
+
+        new_emails = []
         for email in email_list:
-            check_doctor = Doctor.objects.filter(email=email).first()
-            if check_doctor and not is_participant(check_doctor):
+            if email in participant_by_email and \
+                    participant_by_email[email] is None:
                 fail_emails.update({
                     email: 'user is already doctor or coordinator'
                 })
+            elif email in invited_emails:
+                fail_emails.update({
+                    email: 'user is already participating'
+                })
             else:
-                if StudyInvitation.objects.filter(
-                        email=email, study=study).exists():
-                    fail_emails.update({
-                        email: 'user is already participating'
-                    })
-                else:
-                    StudyInvitation.objects.create(
-                        email=email,
-                        study=study,
-                        doctor_id=doctor_pk)
-                    AddParticipantNotification(
-                        context={'study_id': study.pk,
-                                 'study_title': study.title}).send([email])
+                new_emails.append(email)
+                invited_emails.add(email)
+
+        StudyInvitation.objects.bulk_create([
+            StudyInvitation(email=email, study=study, doctor_id=doctor_pk)
+            for email in new_emails
+        ])
+
+        job = None
+        if new_emails:
+            # `bulk_create` doesn't send signals
+            bump_global_version()
+            job = Job.objects.create(name='study_invitations',
+                                     user=request.user)
+            transaction.on_commit(lambda: send_study_invitations.delay(
+                study.pk, new_emails, str(job.pk)))
 
         return Response({
             'all_success': len(fail_emails) == 0,
-            'fail_emails': fail_emails
+            'fail_emails': fail_emails,
+            'job': str(job.pk) if job else None,
         })
 
     @detail_route(methods=['POST'])
@@ -1,10 +1,10 @@
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import detail_route
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from apps.accounts.models import DoctorToPatient, PatientConsent
+from apps.accounts.models import Doctor, DoctorToPatient, PatientConsent
 from apps.accounts.models.participant import get_participant_patient
 from apps.accounts.permissions import IsDoctorOrCoordinator
 from apps.accounts.permissions.is_partipicant import IsParticipant
@@ -14,9 +14,19 @@ from ..serializers import StudyInvitationBaseSerializer, \
     StudyInvitationSerializer, StudyInvitationForDoctorSerializer
 
 
+def prefetch_invitation_doctors(queryset):
+    """
+    Doctors of `StudyInvitationSerializer` with annotated roles
+    """
+    doctors = Doctor.objects.with_roles()
+    return queryset.prefetch_related(
+        Prefetch('doctor', queryset=doctors),
+        Prefetch('study__doctors', queryset=doctors))
+
+
 class StudyInvitationViewSet(viewsets.GenericViewSet,
                              mixins.ListModelMixin):
-    queryset = StudyInvitation.objects.all()
+    queryset = prefetch_invitation_doctors(StudyInvitation.objects.all())
     serializer_class = StudyInvitationSerializer
     permission_classes = (IsParticipant,)
 
@@ -80,7 +90,7 @@ class StudyInvitationViewSet(viewsets.GenericViewSet,
 
 class StudyInvitationForDoctorViewSet(viewsets.GenericViewSet,
                                       mixins.ListModelMixin):
-    queryset = StudyInvitation.objects.all()
+    queryset = prefetch_invitation_doctors(StudyInvitation.objects.all())
     serializer_class = StudyInvitationForDoctorSerializer
     permission_classes = (IsDoctorOrCoordinator,)
 
@@ -0,0 +1,87 @@
+from django.db import transaction
+from rest_framework import viewsets, mixins, response, status
+from rest_framework.decorators import detail_route
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+
+from apps.accounts.permissions import IsDoctor
+from ..models import UploadSession
+from ..models.upload_session import ChunkSizeExceeded
+from ..serializers import UploadSessionSerializer
+
+
+class UploadSessionViewSet(viewsets.GenericViewSet,
+                           mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin):
+    """
+    Resumable photo uploads: create the session with the file size,
+    PUT chunks to `chunk/?offset=<offset>` one after another and POST
+    to `finalize/`. After a failure GET the session to find out
+    the offset to continue from
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = (IsDoctor, )
+
+    def get_queryset(self):
+        qs = super(UploadSessionViewSet, self).get_queryset()
+
+        return qs.filter(doctor=self.request.user.pk)
+
+    def perform_create(self, serializer):
+        serializer.save(doctor=self.request.user.doctor_role)
+
+    @detail_route(methods=['PUT'])
+    def chunk(self, request, pk):
+        # The body is read outside of a transaction, concurrent writes
+        # are serialized by the conditional update of the offset
+        session = self.get_object()
+
+        if session.is_completed:
+            raise ValidationError('Upload is already finalized')
+
+        try:
+            offset = int(request.query_params['offset'])
+        except (KeyError, ValueError):
+            raise ValidationError({'offset': 'A valid integer is required.'})
+
+        if offset != session.offset:
+            return self.get_conflict_response(session)
+
+        try:
+            part_path, size = session.receive_chunk(request.stream)
+        except ChunkSizeExceeded:
+            raise ValidationError('Chunk exceeds the upload size')
+
+        if not session.append_chunk(part_path, size):
+            session.refresh_from_db()
+            return self.get_conflict_response(session)
+
+        return response.Response(self.get_serializer(session).data)
+
+    def get_conflict_response(self, session):
+        return response.Response(
+            self.get_serializer(session).data,
+            status=status.HTTP_409_CONFLICT)
+
+    @detail_route(methods=['POST'])
+    @transaction.atomic
+    def finalize(self, request, pk):
+        session = get_object_or_404(
+            self.get_queryset().select_for_update(), pk=pk)
+
+        if session.offset != session.size:
+            raise ValidationError(
+                'Upload is not completed, received {0} of {1} bytes'.format(
+                    session.offset, session.size))
+
+        if not session.is_valid_image():
+            raise ValidationError(
+                'Upload a valid image. The file you uploaded was either '
+                'not an image or a corrupted image.')
+
+        session.is_completed = True
+        session.save(update_fields=['is_completed'])
+
+        return response.Response(self.get_serializer(session).data)
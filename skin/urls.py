@@ -4,6 +4,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.views.generic.base import RedirectView
 
+from apps.main.storages import private_storage
+from apps.main.storages.direct_upload import (
+    FileSystemDirectUpload, get_direct_upload)
+from apps.main.views import direct_upload_view
+
 admin.site.site_header = 'Skin Hadleylab administrative interface'
 
 urlpatterns = [
@@ -12,8 +17,16 @@ urlpatterns = [
     url(r'^api/v1/', include('rest_framework.urls')),
     url(r'^api/v1/', include('apps.accounts.urls')),
     url(r'^api/v1/', include('apps.moles.urls')),
+    url(r'^api/v1/', include('apps.main.urls')),
 ]
 
+# Stand-in for S3 presigned POSTs, it's not needed with S3
+if isinstance(get_direct_upload(private_storage), FileSystemDirectUpload):
+    urlpatterns += [
+        url(r'^api/v1/direct_upload/$', direct_upload_view,
+            name='direct_upload'),
+    ]
+
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,